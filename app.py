@@ -1,16 +1,21 @@
-import os
 import json
+import urllib.error
 import streamlit as st
-import time
-from pathlib import Path
 
-from src.config import APP_TITLE, APP_DESCRIPTION
-from src.document_processing.loader import load_pdf_documents, split_documents
-from src.document_processing.processor import enhance_documents
-from src.rag.vectorstore import create_vectorstore, save_vectorstore, load_vectorstore
-from src.rag.retriever import create_retriever, retrieve_documents
-from src.chains.qa_chain import create_custom_qa_chain, extract_sources_from_docs
-from src.utils.helpers import format_response, save_uploaded_file, extract_json_from_response
+from src.config import APP_TITLE, APP_DESCRIPTION, QA_SERVICE_URL, MEMORY_SUMMARIZE, MAX_CHAT_MESSAGES
+from src.rag.vectorstore import load_manifest, supports_deletion
+from src.rag.indexing import index_files, delete_document
+from src.chains.qa_chain import extract_sources_from_docs
+from src.chains.memory import BoundedConversationMemory
+from src.utils.resources import get_retriever, get_index_version, get_llm, stream_answer, publish_vectorstore
+from src.service.client import stream_answer_remote
+from src.utils.helpers import (
+    format_response,
+    format_structured_output,
+    save_uploaded_file,
+    extract_json_from_response,
+    StructuredSectionParser
+)
 
 # Set page configuration
 st.set_page_config(
@@ -24,6 +29,11 @@ st.set_page_config(
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+if "memory" not in st.session_state:
+    # In thin-client mode the app has no LLM of its own, so old turns are just dropped
+    summarizer = get_llm() if MEMORY_SUMMARIZE and not QA_SERVICE_URL else None
+    st.session_state.memory = BoundedConversationMemory(llm=summarizer)
+
 if "vectorstore_ready" not in st.session_state:
     st.session_state.vectorstore_ready = False
 
@@ -33,19 +43,18 @@ if "retriever" not in st.session_state:
 if "uploaded_files" not in st.session_state:
     st.session_state.uploaded_files = []
 
-# Helper function to get or create vectorstore
-def get_or_create_vectorstore():
-    vector_store_path = "vectorstore"
+# Helper function to get the shared retriever (loaded once per process)
+def get_shared_retriever():
+    try:
+        retriever = get_retriever()
+    except Exception as e:
+        st.error(f"Error loading vector store: {str(e)}")
+        return None
     
-    if os.path.exists(vector_store_path) and os.path.isdir(vector_store_path):
-        try:
-            return load_vectorstore(vector_store_path)
-        except Exception as e:
-            st.error(f"Error loading vector store: {str(e)}")
-            return None
-    else:
+    if retriever is None:
         st.info("No vector store found. Please upload PDF documents to create one.")
-        return None
+    
+    return retriever
 
 # App title and description
 st.title(f"🩺 {APP_TITLE}")
@@ -68,30 +77,34 @@ with st.sidebar:
         if process_button:
             with st.spinner("Processing documents..."):
                 file_paths = []
+                file_names = {}
                 for uploaded_file in uploaded_files:
                     file_path = save_uploaded_file(uploaded_file)
                     file_paths.append(file_path)
+                    file_names[file_path] = uploaded_file.name
                     st.session_state.uploaded_files.append({
                         "name": uploaded_file.name,
                         "path": file_path
                     })
                 
-                documents = load_pdf_documents(file_paths)
+                # Only files that are not already indexed are embedded
+                vectorstore, summary = index_files(file_paths, names=file_names)
                 
-                if documents:
-                    document_chunks = split_documents(documents)
-                    enhanced_chunks = enhance_documents(document_chunks)
-                    
-                    vectorstore = create_vectorstore(enhanced_chunks)
-                    save_vectorstore(vectorstore)
-                    
-                    retriever = create_retriever(vectorstore)
-                    st.session_state.retriever = retriever
+                if summary["added"]:
+                    if not QA_SERVICE_URL:
+                        publish_vectorstore(vectorstore)
                     st.session_state.vectorstore_ready = True
                     
-                    st.success(f"Successfully processed {len(documents)} documents ({len(enhanced_chunks)} chunks)")
-                else:
-                    st.error("No documents were successfully loaded. Please check the files and try again.")
+                    st.success(
+                        f"Successfully processed {len(summary['added'])} documents "
+                        f"({summary['chunks']} chunks, {summary['duplicates']} duplicate chunks merged)"
+                    )
+                
+                if summary["skipped"]:
+                    st.info(f"Already indexed, skipped: {', '.join(summary['skipped'])}")
+                
+                if summary["failed"]:
+                    st.error(f"Could not load: {', '.join(summary['failed'])}. Please check the files and try again.")
     
     st.header("⚙️ Settings")
     prompt_type = st.selectbox(
@@ -104,9 +117,31 @@ with st.sidebar:
         }[x]
     )
 
+    manifest = load_manifest()
+    indexed_documents = manifest["documents"]
+    scope_doc_ids = []
+    if indexed_documents:
+        # An empty selection searches every indexed document
+        scope_doc_ids = st.multiselect(
+            "Search only in",
+            list(indexed_documents),
+            format_func=lambda doc_id: indexed_documents[doc_id]["name"]
+        )
+
     st.markdown("<hr/>", unsafe_allow_html=True)
 
-    if st.session_state.uploaded_files:
+    if indexed_documents:
+        st.header("📄 Indexed Documents")
+        for doc_id, entry in list(indexed_documents.items()):
+            # chunk_ids lists only stored chunks; duplicates of other documents' chunks are counted too
+            st.write(f"- {entry['name']} ({entry.get('chunks', len(entry['chunk_ids']))} chunks)")
+            # HNSW indexes cannot remove vectors
+            if supports_deletion(manifest) and st.button("Remove", key=f"remove_{doc_id}"):
+                vectorstore = delete_document(doc_id)
+                if not QA_SERVICE_URL:
+                    publish_vectorstore(vectorstore)
+                st.experimental_rerun()
+    elif st.session_state.uploaded_files:
         st.header("📄 Uploaded Documents")
         for file in st.session_state.uploaded_files:
             st.write(f"- {file['name']}")
@@ -122,13 +157,15 @@ with st.sidebar:
     - Streamlit
     """)
     
-# Initialize vectorstore at startup if not initialized
-if not st.session_state.vectorstore_ready:
-    vectorstore = get_or_create_vectorstore()
-    if vectorstore:
-        retriever = create_retriever(vectorstore)
-        st.session_state.retriever = retriever
-        st.session_state.vectorstore_ready = True
+if QA_SERVICE_URL:
+    # Thin-client mode: the QA service owns the index, the LLM and the caches
+    st.session_state.vectorstore_ready = get_index_version() is not None
+    answer_stream = stream_answer_remote
+else:
+    # Pick up the shared retriever; it is reloaded only when the on-disk index changes
+    st.session_state.retriever = get_shared_retriever()
+    st.session_state.vectorstore_ready = st.session_state.retriever is not None
+    answer_stream = stream_answer
 
 # Display chat history
 st.subheader("💬 Chat History")
@@ -142,36 +179,68 @@ submit_button = st.button("Send")
 
 if submit_button and user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
+    del st.session_state.messages[:-MAX_CHAT_MESSAGES]
     st.markdown(f"**👤 You:** {user_input}")
 
     if not st.session_state.vectorstore_ready:
         st.warning("Please upload and process documents before asking questions.")
     else:
-        with st.spinner("Thinking..."):
-            docs = retrieve_documents(st.session_state.retriever, user_input)
-            qa_chain = create_custom_qa_chain(st.session_state.retriever, prompt_type)
-            response = qa_chain.invoke(user_input)
-            response_text = response.content if hasattr(response, 'content') else str(response)
-
-            if prompt_type == "structured":
-                json_data = extract_json_from_response(response_text)
-                if json_data:
-                    formatted_response = format_response(json.dumps(json_data))
+        answer_placeholder = st.empty()
+        answer_placeholder.markdown("**🤖 Assistant:** _Thinking..._")
+
+        # Render tokens as they arrive; structured sections appear as each one completes
+        docs = []
+        response_text = ""
+        section_parser = StructuredSectionParser() if prompt_type == "structured" else None
+        sections = {}
+
+        chat_history = st.session_state.memory.get_history()
+        try:
+            for event in answer_stream(user_input, prompt_type, chat_history=chat_history, doc_ids=scope_doc_ids or None):
+                if event["type"] == "docs":
+                    docs = event["docs"]
+                    continue
+
+                response_text += event["text"]
+                if section_parser is None:
+                    answer_placeholder.markdown(f"**🤖 Assistant:** {response_text}▌")
                 else:
-                    formatted_response = response_text
+                    completed = section_parser.feed(event["text"])
+                    if completed:
+                        sections.update(completed)
+                        answer_placeholder.markdown(f"**🤖 Assistant:** {format_structured_output(sections)}")
+        except Exception as e:
+            # Service errors (HTTP status, connection refused) in thin-client mode, LLM errors in-process
+            answer_placeholder.empty()
+            if isinstance(e, urllib.error.HTTPError):
+                st.error(f"The QA service at {QA_SERVICE_URL} failed: {str(e)}")
+            elif isinstance(e, urllib.error.URLError):
+                st.error(f"Could not reach the QA service at {QA_SERVICE_URL}: {str(e.reason)}")
             else:
-                formatted_response = response_text
-
-            st.markdown(f"**🤖 Assistant:** {formatted_response}")
-            st.session_state.messages.append({"role": "assistant", "content": formatted_response})
+                st.error(f"Error generating answer: {str(e)}")
+            st.stop()
 
-            st.markdown("#### Sources")
-            sources = extract_sources_from_docs(docs)
-            for i, source in enumerate(sources):
-                st.markdown(f"""
-                **Source {i+1}:** {source.get('source', 'Unknown')} (Page {source.get('page', 'Unknown')})  
-                *Preview:* {source.get('preview', 'No preview available')}
-                """)
+        if prompt_type == "structured":
+            json_data = extract_json_from_response(response_text)
+            if json_data:
+                formatted_response = format_response(json.dumps(json_data))
+            else:
+                formatted_response = response_text
+        else:
+            formatted_response = response_text
+
+        answer_placeholder.markdown(f"**🤖 Assistant:** {formatted_response}")
+        st.session_state.messages.append({"role": "assistant", "content": formatted_response})
+        del st.session_state.messages[:-MAX_CHAT_MESSAGES]
+        st.session_state.memory.add_turn(user_input, formatted_response)
+
+        st.markdown("#### Sources")
+        sources = extract_sources_from_docs(docs)
+        for i, source in enumerate(sources):
+            st.markdown(f"""
+            **Source {i+1}:** {source.get('source', 'Unknown')} (Page {source.get('page', 'Unknown')})  
+            *Preview:* {source.get('preview', 'No preview available')}
+            """)
 
 if not st.session_state.messages:
     st.info("👋 Welcome! Upload diabetes-related PDF documents and ask questions to get started.")
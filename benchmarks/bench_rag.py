@@ -0,0 +1,335 @@
+"""
+Offline benchmark of the RAG hot paths.
+
+Runs PDF parsing, end-to-end ingestion, index building, retrieval and
+answering on synthetic PDFs with local stand-ins for the Gemini models, so
+no network access or API key is needed. Provider cost is simulated with
+configurable latencies.
+
+Usage:
+    python -m benchmarks.bench_rag --files 8 --pages 40 --output results.json
+    python -m benchmarks.bench_rag --baseline results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional
+
+import numpy as np
+
+from src.embeddings import gemini_embeddings
+from src.document_processing.pipeline import StageStats, iter_processed_chunks, batched
+from src.rag.indexing import index_files
+from src.rag.vectorstore import write_to_vectorstore, apply_index_type, save_vectorstore, load_vectorstore
+from src.rag.bm25 import build_keyword_index
+from src.rag.retriever import build_retriever
+from src.chains.context import count_tokens
+from src.chains.qa_chain import create_qa_chain_with_sources, stream_answer_with_sources
+from src.config import INGEST_BATCH_SIZE, FAISS_INDEX_TYPE
+from benchmarks.corpus import make_sentence
+from benchmarks.fakes import FakeEmbeddings, FakeChatModel
+from benchmarks.pdf import make_pdf_corpus
+
+RETRIEVER_TYPES = ["similarity", "mmr", "hybrid", "keyword"]
+
+# Timing metrics compared against a baseline; everything else is informational
+_LOWER_IS_BETTER = ("seconds", "p50_ms", "p99_ms", "mean_ms", "first_token_p50_ms")
+
+def use_embeddings(embeddings) -> None:
+    """
+    Make an embeddings model the shared client used by every code path in src.
+    """
+    gemini_embeddings._embeddings_client = embeddings
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples.
+    
+    Args:
+        samples: Latencies in seconds
+        
+    Returns:
+        Dictionary with count, p50, p99 and mean in milliseconds
+    """
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3)
+    }
+
+def time_calls(func: Callable[[str], Any], queries: List[str], warmup: int = 3) -> Dict[str, float]:
+    for query in queries[:warmup]:
+        func(query)
+    
+    samples = []
+    for query in queries:
+        t0 = time.perf_counter()
+        func(query)
+        samples.append(time.perf_counter() - t0)
+    
+    return latency_stats(samples)
+
+@contextmanager
+def measure_memory(results: Dict[str, Any], trace: bool) -> Iterator[None]:
+    """
+    Record the scenario's peak Python allocations (when tracing) and the process peak RSS.
+    """
+    if trace:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if trace:
+            results["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+            tracemalloc.stop()
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1e6 if sys.platform == "darwin" else 1e3
+        results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 2)
+
+def make_queries(num_queries: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [make_sentence(rng, 4, 12).rstrip(".") + "?" for _ in range(num_queries)]
+
+def bench_parse(paths: List[str], workers: Optional[int]) -> Dict[str, Any]:
+    stats = StageStats()
+    chunks = [chunk for _, range_chunks in iter_processed_chunks(paths, max_workers=workers, stats=stats) for chunk in range_chunks or []]
+    report = stats.report()
+    
+    return {
+        "seconds": report["wall"]["seconds"],
+        "pages_per_second": report["wall"]["items_per_second"],
+        "chunks": len(chunks),
+        "chunk_tokens": sum(count_tokens(chunk.page_content) for chunk in chunks),
+        "stages": report
+    }, chunks
+
+def bench_ingest(paths: List[str], embeddings: FakeEmbeddings) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="bench-ingest-")
+    calls = embeddings.calls
+    try:
+        t0 = time.perf_counter()
+        _, summary = index_files(paths, directory)
+        seconds = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    return {
+        "seconds": round(seconds, 4),
+        "files_per_second": round(len(paths) / seconds, 2),
+        "chunks_per_second": round(summary["chunks"] / seconds, 1),
+        "duplicate_chunks": summary["duplicates"],
+        "embedding_calls": embeddings.calls - calls
+    }
+
+def bench_index_build(chunks: List, index_type: str, directory: str):
+    pairs = [(f"chunk:{i}", chunk) for i, chunk in enumerate(chunks)]
+    
+    t0 = time.perf_counter()
+    vectorstore = write_to_vectorstore(batched(pairs, INGEST_BATCH_SIZE))
+    embed_seconds = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    apply_index_type(vectorstore, index_type)
+    train_seconds = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    save_vectorstore(vectorstore, directory)
+    save_seconds = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    load_vectorstore(directory, read_only=True)
+    load_seconds = time.perf_counter() - t0
+    
+    return {
+        "index_type": index_type,
+        "vectors": vectorstore.index.ntotal,
+        "seconds": round(embed_seconds + train_seconds, 4),
+        "embed_seconds": round(embed_seconds, 4),
+        "train_seconds": round(train_seconds, 4),
+        "save_seconds": round(save_seconds, 4),
+        "load_seconds": round(load_seconds, 4)
+    }, vectorstore
+
+def bench_retrieval(vectorstore, keyword_index, queries: List[str]) -> Dict[str, Any]:
+    results = {}
+    
+    for retriever_type in RETRIEVER_TYPES:
+        retriever = build_retriever(vectorstore, retriever_type, keyword_index)
+        try:
+            results[retriever_type] = time_calls(retriever.get_relevant_documents, queries)
+        finally:
+            if hasattr(retriever, "close"):
+                retriever.close()
+    
+    return results
+
+def bench_answer(vectorstore, keyword_index, queries: List[str], llm: FakeChatModel) -> Dict[str, Any]:
+    retriever = build_retriever(vectorstore, keyword_index=keyword_index)
+    try:
+        chain = create_qa_chain_with_sources(retriever, llm=llm)
+        results = time_calls(chain.invoke, queries)
+        
+        first_tokens = []
+        for query in queries:
+            t0 = time.perf_counter()
+            for event in stream_answer_with_sources(retriever, query, llm=llm):
+                if event["type"] == "token":
+                    first_tokens.append(time.perf_counter() - t0)
+                    break
+        results["first_token_p50_ms"] = latency_stats(first_tokens)["p50_ms"]
+    finally:
+        if hasattr(retriever, "close"):
+            retriever.close()
+    
+    return results
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    embeddings = FakeEmbeddings(latency_ms=args.embed_latency_ms, per_text_ms=args.embed_per_text_ms)
+    llm = FakeChatModel(first_token_ms=args.llm_first_token_ms, tokens_per_second=args.llm_tokens_per_second)
+    use_embeddings(embeddings)
+    
+    workdir = tempfile.mkdtemp(prefix="bench-rag-")
+    scenarios: Dict[str, Any] = {}
+    queries = make_queries(args.queries)
+    
+    try:
+        paths = make_pdf_corpus(os.path.join(workdir, "pdfs"), args.files, args.pages, seed=args.seed)
+        
+        scenarios["parse"] = {}
+        with measure_memory(scenarios["parse"], args.trace_memory):
+            result, chunks = bench_parse(paths, args.workers)
+            scenarios["parse"].update(result)
+        
+        scenarios["ingest"] = {}
+        with measure_memory(scenarios["ingest"], args.trace_memory):
+            scenarios["ingest"].update(bench_ingest(paths, embeddings))
+        
+        scenarios["index_build"] = {}
+        with measure_memory(scenarios["index_build"], args.trace_memory):
+            result, vectorstore = bench_index_build(chunks, args.index_type, os.path.join(workdir, "store"))
+            scenarios["index_build"].update(result)
+        
+        keyword_index = build_keyword_index(vectorstore)
+        
+        scenarios["retrieval"] = {}
+        with measure_memory(scenarios["retrieval"], args.trace_memory):
+            scenarios["retrieval"].update(bench_retrieval(vectorstore, keyword_index, queries))
+        
+        scenarios["answer"] = {}
+        with measure_memory(scenarios["answer"], args.trace_memory):
+            scenarios["answer"].update(bench_answer(vectorstore, keyword_index, queries, llm))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "json")},
+        "scenarios": scenarios
+    }
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Find timing metrics that got slower than a baseline run.
+    
+    Args:
+        results: Current results
+        baseline: Results of an earlier run with the same configuration
+        tolerance: Allowed relative slowdown (0.1 allows 10%)
+        
+    Returns:
+        List of {"metric", "baseline", "current", "ratio"} for each regression
+    """
+    current = _flatten(results["scenarios"])
+    previous = _flatten(baseline["scenarios"])
+    regressions = []
+    
+    for metric, value in current.items():
+        if not metric.endswith(_LOWER_IS_BETTER) or metric.startswith("parse.stages"):
+            continue
+        before = previous.get(metric)
+        if before and value > before * (1 + tolerance):
+            regressions.append({"metric": metric, "baseline": before, "current": value, "ratio": round(value / before, 2)})
+    
+    return regressions
+
+def print_report(results: Dict[str, Any]) -> None:
+    scenarios = results["scenarios"]
+    
+    parse = scenarios["parse"]
+    print(f"parse        {parse['seconds']:>8.2f}s  {parse['pages_per_second']:>8.1f} pages/s  {parse['chunks']} chunks, {parse['chunk_tokens']} tokens")
+    ingest = scenarios["ingest"]
+    print(f"ingest       {ingest['seconds']:>8.2f}s  {ingest['chunks_per_second']:>8.1f} chunks/s  {ingest['embedding_calls']} embedding calls")
+    build = scenarios["index_build"]
+    print(
+        f"index_build  {build['seconds']:>8.2f}s  {build['vectors']} vectors ({build['index_type']}), "
+        f"save {build['save_seconds']:.2f}s, load {build['load_seconds']:.3f}s"
+    )
+    
+    print(f"{'retrieval':<16}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for retriever_type, row in scenarios["retrieval"].items():
+        if isinstance(row, dict):
+            print(f"  {retriever_type:<14}{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['mean_ms']:>10.3f}")
+    answer = scenarios["answer"]
+    print(f"  {'answer':<14}{answer['p50_ms']:>10.3f}{answer['p99_ms']:>10.3f}{answer['mean_ms']:>10.3f}  (first token p50 {answer['first_token_p50_ms']:.3f} ms)")
+    
+    print("peak RSS MB: " + ", ".join(f"{name} {row['peak_rss_mb']}" for name, row in scenarios.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, indexing, retrieval and answering offline")
+    parser.add_argument("--files", type=int, default=8, help="Number of synthetic PDF files")
+    parser.add_argument("--pages", type=int, default=40, help="Pages per PDF file")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per retrieval scenario")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed")
+    parser.add_argument("--workers", type=int, default=None, help="Ingestion worker processes (default: all cores)")
+    parser.add_argument("--index-type", default=FAISS_INDEX_TYPE, help="FAISS index type to build")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Simulated latency per embedding request")
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.0, help="Simulated latency per embedded text")
+    parser.add_argument("--llm-first-token-ms", type=float, default=0.0, help="Simulated time to first generated token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="Simulated generation speed (0 for instant)")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record peak Python allocations (slows timings)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare timings against an earlier JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown against the baseline")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    
+    results = run(args)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for row in regressions:
+            print(f"REGRESSION {row['metric']}: {row['baseline']} -> {row['current']} ({row['ratio']}x)")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic diabetes-literature corpus for benchmarks.
+
+Pages mimic text extracted from PDFs: section headings, Windows line endings,
+ragged whitespace and running page markers.
+"""
+import random
+from typing import List
+
+VOCABULARY = (
+    "glucose insulin metformin HbA1c SGLT2 GLP-1 patient patients dose doses daily mg/dL "
+    "hypoglycemia hyperglycemia retinopathy neuropathy nephropathy diet exercise carbohydrate "
+    "monitoring target treatment therapy risk blood pressure cholesterol weight clinical trial "
+    "the of and to in with for is are may should be on at by from as reduce increase lower "
+    "higher associated recommended compared evidence outcomes adults children pregnancy"
+).split()
+
+HEADINGS = [
+    "INTRODUCTION",
+    "DIAGNOSIS AND CLASSIFICATION",
+    "GLYCEMIC TARGETS",
+    "PHARMACOLOGIC THERAPY",
+    "LIFESTYLE MANAGEMENT",
+    "COMPLICATIONS",
+    "REFERENCES"
+]
+
+def make_sentence(rng: random.Random, min_words: int = 8, max_words: int = 24) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+def make_page(rng: random.Random, page_number: int, total_pages: int, lines: int = 40) -> str:
+    """
+    Generate the extracted text of one PDF page.
+    
+    Args:
+        rng: Random number generator
+        page_number: Page number printed in the page marker
+        total_pages: Total pages printed in the page marker
+        lines: Number of text lines on the page
+        
+    Returns:
+        Page text
+    """
+    out = []
+    for line in range(lines):
+        if line % 15 == 0:
+            section = rng.randint(1, 9)
+            out.append(rng.choice([
+                rng.choice(HEADINGS) + ":",
+                f"{section}.{rng.randint(1, 9)} {rng.choice(VOCABULARY).capitalize()} {rng.choice(VOCABULARY)}",
+                "## " + rng.choice(HEADINGS).title()
+            ]))
+        out.append(make_sentence(rng) + " " * rng.randint(0, 3))
+    out.append(f"Page {page_number} of {total_pages}")
+    
+    return "\r\n".join(out) + "\r\n"
+
+def make_corpus(num_pages: int, seed: int = 0) -> List[str]:
+    """
+    Generate a list of page texts.
+    
+    Args:
+        num_pages: Number of pages
+        seed: Random seed
+        
+    Returns:
+        List of page texts
+    """
+    rng = random.Random(seed)
+    return [make_page(rng, i + 1, num_pages) for i in range(num_pages)]
@@ -0,0 +1,97 @@
+"""
+Deterministic local stand-ins for the Gemini embedding and chat models.
+
+Both simulate network cost with configurable latencies so benchmarks measure
+our own code paths plus a predictable, tunable provider delay.
+"""
+import re
+import time
+import hashlib
+import threading
+from typing import List, Any, Iterator, Optional
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import AIMessage, ChatGeneration, ChatResult
+from langchain.schema.messages import AIMessageChunk
+from langchain.schema.output import ChatGenerationChunk
+
+EMBEDDING_DIMENSION = 768
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def _bucket(word: str, dimension: int) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") % dimension
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embedder with simulated request latency.
+    
+    Each word is hashed to a dimension, so texts sharing vocabulary have
+    similar vectors and retrieval results are meaningful. Every call costs
+    latency_ms plus per_text_ms for each text, like one API request.
+    """
+    
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION, latency_ms: float = 0.0, per_text_ms: float = 0.0):
+        self.model = "fake-embedding"
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.per_text_ms = per_text_ms
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+    
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in _WORD_PATTERN.findall(text.lower()):
+            vector[_bucket(word, self.dimension)] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        time.sleep((self.latency_ms + self.per_text_ms * len(texts)) / 1000)
+        return [self._vector(text) for text in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with a fixed-length, deterministic reply.
+    
+    The first token arrives after first_token_ms and the rest stream at
+    tokens_per_second, approximating a hosted model's generation speed.
+    """
+    
+    first_token_ms: float = 0.0
+    tokens_per_second: float = 0.0
+    answer_tokens: int = 64
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+    
+    def _tokens(self, messages: List) -> List[str]:
+        # Echo words from the prompt so answers vary with the question
+        words = _WORD_PATTERN.findall(str(messages[-1].content))[-self.answer_tokens:] or ["answer"]
+        return [words[i % len(words)] + " " for i in range(self.answer_tokens)]
+    
+    def _iter_tokens(self, messages: List) -> Iterator[str]:
+        time.sleep(self.first_token_ms / 1000)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for i, token in enumerate(self._tokens(messages)):
+            if i and delay:
+                time.sleep(delay)
+            yield token
+    
+    def _generate(self, messages: List, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = "".join(self._iter_tokens(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+    
+    def _stream(self, messages: List, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for token in self._iter_tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,89 @@
+"""
+Minimal PDF writer for synthetic benchmark documents.
+
+Writes uncompressed single-font text pages so the ingestion pipeline can be
+benchmarked on real PDF parsing without a PDF library dependency.
+"""
+import os
+from typing import List
+
+from benchmarks.corpus import make_corpus
+
+FONT_SIZE = 8
+LINE_HEIGHT = 10
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 36
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _content_stream(page_text: str) -> bytes:
+    lines = [line.strip() for line in page_text.splitlines() if line.strip()]
+    ops = [f"BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td"]
+    ops.extend(f"({_escape(line)}) Tj T*" for line in lines)
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1", "replace")
+
+def write_pdf(path: str, pages: List[str]) -> None:
+    """
+    Write page texts as a PDF file.
+    
+    Args:
+        path: Output file path
+        pages: Text of each page, one line of text per line
+    """
+    # Objects 1-3 are the catalog, page tree and font; each page adds a page and a content object
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    
+    for page_text in pages:
+        stream = _content_stream(page_text)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_ref)
+        )
+        page_refs.append(len(objects))
+    
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_pdf_corpus(directory: str, num_files: int, pages_per_file: int, seed: int = 0) -> List[str]:
+    """
+    Write a set of synthetic diabetes-literature PDFs.
+    
+    Args:
+        directory: Directory to write the files to
+        num_files: Number of PDF files
+        pages_per_file: Pages in each file
+        seed: Random seed
+        
+    Returns:
+        Paths of the written files
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    
+    for i in range(num_files):
+        path = os.path.join(directory, f"guideline_{i:03d}.pdf")
+        write_pdf(path, make_corpus(pages_per_file, seed=seed + i))
+        paths.append(path)
+    
+    return paths
@@ -0,0 +1,166 @@
+import time
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from src.utils import metrics
+from src.config import (
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES
+)
+
+class SemanticAnswerCache:
+    """
+    Cache of QA results looked up by question embedding similarity.
+    
+    A new question reuses a stored answer when its embedding is within the
+    cosine-similarity threshold of a cached question asked with the same
+    prompt type. Entries expire after a TTL and are dropped whenever the
+    index version changes.
+    """
+    
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index_version = None
+        # prompt type -> (matrix of normalized question vectors, list of entries)
+        self._entries: Dict[str, Tuple[Optional[np.ndarray], List[Dict[str, Any]]]] = {}
+        
+    def embed_question(self, question: str) -> np.ndarray:
+        """
+        Embed and L2-normalize a question.
+        
+        Args:
+            question: User question
+            
+        Returns:
+            Normalized float32 vector
+        """
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+        
+    def _check_version(self, index_version) -> None:
+        if index_version != self._index_version:
+            self._entries.clear()
+            self._index_version = index_version
+            
+    def lookup(self, question: str, prompt_type: str, index_version=None) -> Tuple[Optional[Dict[str, Any]], np.ndarray]:
+        """
+        Find a cached result for a semantically equivalent question.
+        
+        Args:
+            question: User question
+            prompt_type: Prompt type the answer must have been generated with
+            index_version: Fingerprint of the index the answer must come from
+            
+        Returns:
+            Tuple of (cached result or None, question vector for a later store)
+        """
+        vector = self.embed_question(question)
+        
+        with self._lock:
+            self._check_version(index_version)
+            matrix, entries = self._entries.get(prompt_type, (None, []))
+            
+            if matrix is not None and len(entries):
+                similarities = matrix @ vector
+                now = time.time()
+                expired = np.array([now - entry["created_at"] > self.ttl_seconds for entry in entries])
+                similarities[expired] = -1.0
+                
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    metrics.increment("answer_cache_total", result="hit")
+                    return entries[best]["result"], vector
+                    
+            self.misses += 1
+            metrics.increment("answer_cache_total", result="miss")
+            return None, vector
+            
+    def store(self, prompt_type: str, result: Dict[str, Any], vector: np.ndarray, index_version=None) -> None:
+        """
+        Cache a QA result under its question vector.
+        
+        Args:
+            prompt_type: Prompt type the answer was generated with
+            result: QA chain result
+            vector: Normalized question vector returned by lookup
+            index_version: Fingerprint of the index the answer came from
+        """
+        with self._lock:
+            self._check_version(index_version)
+            matrix, entries = self._entries.get(prompt_type, (None, []))
+            
+            # Drop expired entries and the oldest ones beyond the size limit
+            now = time.time()
+            keep = [i for i, entry in enumerate(entries) if now - entry["created_at"] <= self.ttl_seconds]
+            keep = keep[-(self.max_entries - 1):] if self.max_entries > 1 else []
+            
+            entries = [entries[i] for i in keep] + [{"result": result, "created_at": now}]
+            rows = [matrix[keep]] if matrix is not None and keep else []
+            matrix = np.vstack(rows + [vector[np.newaxis, :]])
+            
+            self._entries[prompt_type] = (matrix, entries)
+            
+    def invalidate(self) -> None:
+        """
+        Drop all cached answers.
+        """
+        with self._lock:
+            self._entries.clear()
+            
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache hit/miss counters.
+        
+        Returns:
+            Dictionary with hits, misses, hit rate and current entry count
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": sum(len(entries) for _, entries in self._entries.values())
+        }
+
+def invoke_with_cache(cache: Optional[SemanticAnswerCache], qa_chain, question: str, prompt_type: str, index_version=None) -> Dict[str, Any]:
+    """
+    Answer a question, serving semantically repeated questions from the cache.
+    
+    Args:
+        cache: Semantic answer cache, or None to always run the chain
+        qa_chain: Chain returning a dict with "docs" and "answer" keys
+        question: User question
+        prompt_type: Prompt type the chain was built with
+        index_version: Fingerprint of the index the chain searches
+        
+    Returns:
+        QA result dict, with "cached" set to whether it came from the cache
+    """
+    if cache is None:
+        return {**qa_chain.invoke(question), "cached": False}
+        
+    cached, vector = cache.lookup(question, prompt_type, index_version)
+    if cached is not None:
+        return {**cached, "question": question, "cached": True}
+        
+    result = qa_chain.invoke(question)
+    cache.store(prompt_type, result, vector, index_version)
+    
+    return {**result, "cached": False}
@@ -0,0 +1,185 @@
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+import tiktoken
+
+from src.config import CONTEXT_TOKEN_BUDGET, CHUNK_OVERLAP
+
+TOKEN_ENCODING = "cl100k_base"
+
+# Rough characters per token, used when the encoding files cannot be loaded
+_CHARS_PER_TOKEN = 4
+
+# Shorter common runs are too likely to be coincidental to count as chunk overlap
+_MIN_OVERLAP_CHARS = 20
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    # tiktoken downloads its BPE files on first use; offline hosts fall back to an estimate
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        print(f"Could not load {TOKEN_ENCODING} encoding, estimating token counts: {str(e)}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in a text.
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text down to at most max_tokens tokens.
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens to keep
+        
+    Returns:
+        Truncated text
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+        
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """
+    Length of the longest suffix of left that is a prefix of right.
+    """
+    tail = left[-max_overlap:]
+    probe = right[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    
+    # Earliest match in the tail gives the longest overlap
+    position = tail.find(probe)
+    while position != -1:
+        if right.startswith(tail[position:]):
+            return len(tail) - position
+        position = tail.find(probe, position + 1)
+    
+    return 0
+
+def _page_key(doc) -> tuple:
+    return (doc.metadata.get("source"), doc.metadata.get("page"))
+
+def _are_consecutive(left, right) -> bool:
+    # Chunks without overlap are adjacent when the indexer numbered them in sequence
+    left_index, right_index = left.metadata.get("chunk_index"), right.metadata.get("chunk_index")
+    return (
+        left_index is not None and right_index == left_index + 1
+        and left.metadata.get("doc_id") == right.metadata.get("doc_id")
+    )
+
+def merge_chunks(docs: List, max_overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """
+    Deduplicate chunks and merge adjacent chunks from the same page.
+    
+    Chunks of one page are put in document order (by start_index when the
+    splitter recorded it) and joined wherever one ends with the text the
+    next begins with, so the splitter's overlap appears only once, or where
+    they are consecutive chunks of the same document. A merged block keeps
+    the best retrieval rank of its chunks.
+    
+    Args:
+        docs: Retrieved documents in relevance order
+        max_overlap: Longest overlap to look for, in characters
+        
+    Returns:
+        List of {"text", "rank", "docs"} blocks in relevance order
+    """
+    pages: Dict[tuple, List] = {}
+    seen = set()
+    
+    for rank, doc in enumerate(docs):
+        text = doc.page_content.strip()
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        pages.setdefault(_page_key(doc), []).append((rank, doc, text))
+    
+    blocks = []
+    for chunks in pages.values():
+        chunks.sort(key=lambda chunk: (chunk[1].metadata.get("start_index", chunk[0]), chunk[0]))
+        
+        current = None
+        for rank, doc, text in chunks:
+            if current is not None:
+                if text in current["text"]:
+                    current["rank"] = min(current["rank"], rank)
+                    current["docs"].append(doc)
+                    continue
+                    
+                overlap = _overlap_length(current["text"], text, max_overlap)
+                if overlap or _are_consecutive(current["docs"][-1], doc):
+                    current["text"] += text[overlap:] if overlap else "\n" + text
+                    current["rank"] = min(current["rank"], rank)
+                    current["docs"].append(doc)
+                    continue
+                    
+                blocks.append(current)
+                
+            current = {"text": text, "rank": rank, "docs": [doc]}
+            
+        if current is not None:
+            blocks.append(current)
+    
+    blocks.sort(key=lambda block: block["rank"])
+    return blocks
+
+def build_context(docs: List, token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET, separator: str = "\n\n") -> Tuple[str, List]:
+    """
+    Assemble the prompt context from retrieved documents within a token budget.
+    
+    Blocks are added in relevance order while they fit; a block that does
+    not fit is skipped so smaller, less relevant ones can still use the
+    remaining budget. If even the most relevant block is too large, it is
+    truncated rather than leaving the context empty.
+    
+    Args:
+        docs: Retrieved documents in relevance order
+        token_budget: Maximum context size in tokens (None for no limit)
+        separator: Text placed between blocks
+    
+    Returns:
+        Tuple of (context string, documents whose text is in the context,
+        in retrieval order)
+    """
+    blocks = merge_chunks(docs)
+    
+    if token_budget is None:
+        selected = blocks
+    else:
+        separator_tokens = count_tokens(separator)
+        remaining = token_budget
+        selected = []
+        
+        for block in blocks:
+            cost = count_tokens(block["text"]) + (separator_tokens if selected else 0)
+            if cost <= remaining:
+                selected.append(block)
+                remaining -= cost
+            elif not selected:
+                selected.append({**block, "text": truncate_to_tokens(block["text"], remaining)})
+                remaining = 0
+            
+            if remaining <= 0:
+                break
+    
+    used = {id(doc) for block in selected for doc in block["docs"]}
+    return separator.join(block["text"] for block in selected), [doc for doc in docs if id(doc) in used]
@@ -0,0 +1,107 @@
+from collections import deque
+from typing import List, Dict, Any, Deque, Optional, Tuple
+
+from langchain.schema import BaseMemory
+from langchain.pydantic_v1 import Field
+
+from src.chains.context import count_tokens, truncate_to_tokens
+from src.config import MEMORY_MAX_TOKENS, MEMORY_SUMMARY_MAX_TOKENS
+
+SUMMARY_PROMPT = """Progressively summarize the conversation between a patient and a diabetes assistant.
+Keep medical details the patient shared and the advice already given. Be concise.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+def format_turn(user: str, assistant: str) -> str:
+    return f"User: {user}\nAssistant: {assistant}"
+
+def _message_text(value) -> str:
+    return value.content if hasattr(value, "content") else str(value)
+
+class BoundedConversationMemory(BaseMemory):
+    """
+    Conversation memory limited to a token budget.
+    
+    Turns are kept in a deque with their token counts, so appending and
+    evicting are O(1) and the history never grows beyond max_tokens. When a
+    summarizer LLM is given, evicted turns are folded into a rolling summary
+    instead of being dropped.
+    """
+    
+    memory_key: str = "chat_history"
+    max_tokens: int = MEMORY_MAX_TOKENS
+    summary_max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS
+    llm: Optional[Any] = None
+    summary: str = ""
+    turns: Deque[Tuple[str, int]] = Field(default_factory=deque)
+    turn_tokens: int = 0
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+    
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {self.memory_key: self.get_history()}
+    
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> None:
+        question = inputs.get("question", next(iter(inputs.values()), ""))
+        answer = outputs.get("answer", next(iter(outputs.values()), ""))
+        self.add_turn(_message_text(question), _message_text(answer))
+    
+    def clear(self) -> None:
+        self.turns.clear()
+        self.turn_tokens = 0
+        self.summary = ""
+    
+    def add_turn(self, user: str, assistant: str) -> None:
+        """
+        Append a question and answer pair, evicting the oldest turns beyond the budget.
+        
+        Args:
+            user: User message
+            assistant: Assistant response
+        """
+        text = format_turn(user, assistant)
+        tokens = count_tokens(text)
+        self.turns.append((text, tokens))
+        self.turn_tokens += tokens
+        
+        evicted = []
+        # The latest turn is always kept, even if it alone exceeds the budget
+        while self.turn_tokens > self.max_tokens and len(self.turns) > 1:
+            old_text, old_tokens = self.turns.popleft()
+            self.turn_tokens -= old_tokens
+            evicted.append(old_text)
+        
+        if evicted and self.llm is not None:
+            self._summarize(evicted)
+    
+    def _summarize(self, lines: List[str]) -> None:
+        prompt = SUMMARY_PROMPT.format(summary=self.summary or "(none)", lines="\n".join(lines))
+        try:
+            summary = _message_text(self.llm.invoke(prompt)).strip()
+        except Exception as e:
+            print(f"Error summarizing conversation history: {str(e)}")
+            return
+        
+        self.summary = truncate_to_tokens(summary, self.summary_max_tokens)
+    
+    def get_history(self) -> str:
+        """
+        Return the summary and the retained turns as prompt text.
+        
+        Returns:
+            Chat history string (empty if there is no history)
+        """
+        parts = [f"Summary of earlier conversation: {self.summary}"] if self.summary else []
+        parts.extend(text for text, _ in self.turns)
+        return "\n".join(parts)
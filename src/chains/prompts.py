@@ -33,6 +33,9 @@ qa_prompt_template = ChatPromptTemplate.from_messages([
 Context information from medical documents:
 {context}
 
+Previous conversation:
+{chat_history}
+
 Patient question: {question}
 
 Please provide a helpful, accurate response."""
@@ -49,8 +52,8 @@ few_shot_prompt_template = FewShotPromptTemplate(
     examples=FEW_SHOT_EXAMPLES,
     example_prompt=example_prompt,
     prefix="""You are a diabetes management AI assistant. Here are some examples of questions and high-quality answers:""",
-    suffix="""Question: {question}\nContext: {context}\n\nAnswer:""",
-    input_variables=["question", "context"]
+    suffix="""Previous conversation:\n{chat_history}\n\nQuestion: {question}\nContext: {context}\n\nAnswer:""",
+    input_variables=["question", "context", "chat_history"]
 )
 
 # Structured output prompt template
@@ -62,6 +65,9 @@ structured_output_prompt = ChatPromptTemplate.from_messages([
 Context information from medical documents:
 {context}
 
+Previous conversation:
+{chat_history}
+
 Patient question: {question}
 
 Please provide a structured response with the following sections:
@@ -75,14 +81,17 @@ Format your response as JSON following this structure:
     )
 ])
 
+# Chains invoked without conversation history get an empty history section
+NO_HISTORY = "(none)"
+
 def get_qa_prompt():
     """Return the base QA prompt template"""
-    return qa_prompt_template
+    return qa_prompt_template.partial(chat_history=NO_HISTORY)
 
 def get_few_shot_prompt():
     """Return the few-shot prompt template"""
-    return few_shot_prompt_template
+    return few_shot_prompt_template.partial(chat_history=NO_HISTORY)
 
 def get_structured_output_prompt():
     """Return the structured output prompt template"""
-    return structured_output_prompt.partial(structured_format=str(STRUCTURED_OUTPUT_FORMAT))
\ No newline at end of file
+    return structured_output_prompt.partial(structured_format=str(STRUCTURED_OUTPUT_FORMAT), chat_history=NO_HISTORY)
\ No newline at end of file
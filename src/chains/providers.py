@@ -0,0 +1,100 @@
+from typing import List, Dict, Any, Callable, Iterator, Optional
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_community.chat_models import ChatOllama
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import AIMessage, ChatGeneration, ChatResult
+from langchain.schema.messages import AIMessageChunk
+from langchain.schema.output import ChatGenerationChunk
+
+from src.config import (
+    GOOGLE_API_KEY,
+    LLM_PROVIDER,
+    GEMINI_GENERATION_MODEL,
+    OLLAMA_MODEL,
+    OLLAMA_BASE_URL,
+    ECHO_MAX_TOKENS
+)
+
+def create_gemini_llm(callbacks: Optional[List] = None) -> BaseChatModel:
+    """
+    Create the Gemini chat model.
+    
+    Args:
+        callbacks: Callback handlers attached to the model
+        
+    Returns:
+        Configured Gemini LLM
+    """
+    return ChatGoogleGenerativeAI(
+        model=GEMINI_GENERATION_MODEL,
+        temperature=0.3,
+        google_api_key=GOOGLE_API_KEY,
+        convert_system_message_to_human=True,
+        callbacks=callbacks
+    )
+
+def create_ollama_llm(callbacks: Optional[List] = None) -> BaseChatModel:
+    """
+    Create a chat model served by a local Ollama server.
+    
+    Args:
+        callbacks: Callback handlers attached to the model
+        
+    Returns:
+        Local LLM
+    """
+    return ChatOllama(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, temperature=0.3, callbacks=callbacks)
+
+class EchoChatModel(BaseChatModel):
+    """
+    Offline chat model that answers with the opening words of the prompt.
+    
+    Makes no network calls and returns deterministic answers, so chains,
+    streaming and the service can run air-gapped and in tests.
+    """
+    
+    max_tokens: int = ECHO_MAX_TOKENS
+    
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+    
+    def _tokens(self, messages: List) -> List[str]:
+        words = str(messages[-1].content).split()[:self.max_tokens]
+        return [word + " " for word in words]
+    
+    def _generate(self, messages: List, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = "".join(self._tokens(messages)).rstrip()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+    
+    def _stream(self, messages: List, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for token in self._tokens(messages):
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+def create_echo_llm(callbacks: Optional[List] = None) -> BaseChatModel:
+    return EchoChatModel(callbacks=callbacks)
+
+LLM_PROVIDERS: Dict[str, Callable[..., BaseChatModel]] = {
+    "gemini": create_gemini_llm,
+    "ollama": create_ollama_llm,
+    "echo": create_echo_llm
+}
+
+def create_llm(provider: str = LLM_PROVIDER, callbacks: Optional[List] = None) -> BaseChatModel:
+    """
+    Create the chat model for a provider.
+    
+    Args:
+        provider: LLM provider name (gemini, ollama or echo)
+        callbacks: Callback handlers attached to the model
+        
+    Returns:
+        Chat model
+    """
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    
+    return LLM_PROVIDERS[provider](callbacks=callbacks)
@@ -1,27 +1,43 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Tuple
 from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema.runnable import RunnablePassthrough, RunnableLambda
+from langchain.schema.runnable import RunnablePassthrough, RunnableLambda, RunnableParallel
 
-from src.chains.prompts import get_qa_prompt, get_few_shot_prompt, get_structured_output_prompt
-from src.config import GOOGLE_API_KEY, GEMINI_GENERATION_MODEL
+from src.chains.context import build_context
+from src.chains.memory import BoundedConversationMemory
+from src.chains.prompts import get_qa_prompt, get_few_shot_prompt, get_structured_output_prompt, NO_HISTORY
+from src.chains.providers import create_llm
+from src.utils import metrics
+from src.config import LLM_PROVIDER, MEMORY_SUMMARIZE
 
-def initialize_llm():
+def initialize_llm(provider: str = LLM_PROVIDER):
     """
-    Initialize the Gemini language model.
+    Initialize the configured language model.
+    
+    Args:
+        provider: LLM provider name (gemini, ollama or echo)
     
     Returns:
-        Configured Gemini LLM
+        Configured LLM
     """
-    llm = ChatGoogleGenerativeAI(
-        model=GEMINI_GENERATION_MODEL,
-        temperature=0.3,
-        google_api_key=GOOGLE_API_KEY,
-        convert_system_message_to_human=True
-    )
+    return create_llm(provider, callbacks=metrics.get_callbacks())
+
+def format_docs_with_sources(docs: List) -> Tuple[str, List]:
+    """
+    Format retrieved documents into a single context string.
+    
+    Overlapping and adjacent chunks are merged and the result is limited
+    to CONTEXT_TOKEN_BUDGET tokens, most relevant first. Documents left out
+    by the budget are not returned, so only sources the model saw are shown
+    and cached.
+    
+    Args:
+        docs: List of retrieved documents
     
-    return llm
+    Returns:
+        Tuple of (formatted context string, documents in the context)
+    """
+    with metrics.span("format_context"):
+        return build_context(docs)
 
 def format_docs(docs: List) -> str:
     """
@@ -29,11 +45,24 @@ def format_docs(docs: List) -> str:
     
     Args:
         docs: List of retrieved documents
-        
+    
     Returns:
         Formatted context string
     """
-    return "\n\n".join([doc.page_content for doc in docs])
+    return format_docs_with_sources(docs)[0]
+
+def _select_context(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace the retrieved documents with the context built from them and the documents it includes.
+    """
+    context, docs = format_docs_with_sources(inputs["docs"])
+    return {**inputs, "context": context, "docs": docs}
+
+def _measured(retriever):
+    """
+    Bind the metrics callbacks to a retriever used inside a chain.
+    """
+    return retriever.with_config(callbacks=metrics.get_callbacks())
 
 def create_qa_chain(retriever):
     """
@@ -47,11 +76,8 @@ def create_qa_chain(retriever):
     """
     llm = initialize_llm()
     
-    # Create a memory buffer to store conversation history
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True
-    )
+    # Token-bounded history; older turns are summarized rather than kept verbatim
+    memory = BoundedConversationMemory(llm=llm if MEMORY_SUMMARIZE else None)
     
     # Create the QA chain
     qa_chain = ConversationalRetrievalChain.from_llm(
@@ -65,36 +91,132 @@ def create_qa_chain(retriever):
     
     return qa_chain
 
-def create_custom_qa_chain(retriever, prompt_type="standard"):
+def get_prompt(prompt_type: str = "standard"):
     """
-    Create a custom QA chain with specified prompt type.
+    Select the prompt template for a response style.
     
     Args:
-        retriever: Document retriever
         prompt_type: Type of prompt to use (standard, few_shot, structured)
         
     Returns:
-        Custom QA chain
+        Prompt template
     """
-    llm = initialize_llm()
-    
-    # Select prompt template based on type
     if prompt_type == "few_shot":
-        prompt = get_few_shot_prompt()
+        return get_few_shot_prompt()
     elif prompt_type == "structured":
-        prompt = get_structured_output_prompt()
+        return get_structured_output_prompt()
     else:  # standard
-        prompt = get_qa_prompt()
+        return get_qa_prompt()
+
+def _history_loader(memory):
+    """
+    Build a runnable that returns the current chat history of a memory.
+    """
+    if memory is None:
+        return RunnableLambda(lambda _: NO_HISTORY)
+    return RunnableLambda(lambda _: memory.load_memory_variables({})[memory.memory_key] or NO_HISTORY)
+
+def create_custom_qa_chain(retriever, prompt_type="standard", llm=None, memory=None):
+    """
+    Create a custom QA chain with specified prompt type.
+    
+    Args:
+        retriever: Document retriever
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        llm: Optional LLM client to reuse (a new one is created if omitted)
+        memory: Optional conversation memory whose history is added to the prompt
+        
+    Returns:
+        Custom QA chain
+    """
+    llm = llm or initialize_llm()
+    prompt = get_prompt(prompt_type)
     
     # Create the custom QA chain
     qa_chain = (
-        {"context": retriever | RunnableLambda(format_docs), "question": RunnablePassthrough()}
+        {
+            "context": _measured(retriever) | RunnableLambda(format_docs),
+            "question": RunnablePassthrough(),
+            "chat_history": _history_loader(memory)
+        }
         | prompt
         | llm
     )
     
     return qa_chain
 
+def create_qa_chain_with_sources(retriever, prompt_type="standard", llm=None, memory=None):
+    """
+    Create a QA chain that returns the answer together with its context documents.
+    
+    The retriever runs exactly once per question; the documents that fit in
+    the prompt context are returned to the caller, so the displayed sources
+    are the ones the model actually saw.
+    
+    Args:
+        retriever: Document retriever
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        llm: Optional LLM client to reuse (a new one is created if omitted)
+        memory: Optional conversation memory whose history is added to the prompt
+        
+    Returns:
+        Chain producing a dict with "question", "docs" and "answer" keys
+    """
+    llm = llm or initialize_llm()
+    prompt = get_prompt(prompt_type)
+    
+    answer_chain = (
+        RunnableLambda(lambda x: {
+            "context": x["context"],
+            "question": x["question"],
+            "chat_history": x["chat_history"]
+        })
+        | prompt
+        | llm
+    )
+    
+    qa_chain = (
+        RunnableParallel(docs=_measured(retriever), question=RunnablePassthrough(), chat_history=_history_loader(memory))
+        | RunnableLambda(_select_context)
+        | RunnableParallel(question=lambda x: x["question"], docs=lambda x: x["docs"], answer=answer_chain)
+    )
+    
+    return qa_chain
+
+def stream_answer_with_sources(
+    retriever,
+    question: str,
+    prompt_type="standard",
+    llm=None,
+    chat_history: str = ""
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream an answer token by token, preceded by its context documents.
+    
+    Args:
+        retriever: Document retriever
+        question: User question
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        llm: Optional LLM client to reuse (a new one is created if omitted)
+        chat_history: Earlier conversation to include in the prompt
+        
+    Yields:
+        A {"type": "docs", "docs": [...]} event with the documents in the
+        context, then {"type": "token", "text": ...} events
+    """
+    llm = llm or initialize_llm()
+    
+    docs = retriever.get_relevant_documents(question, callbacks=metrics.get_callbacks())
+    context, docs = format_docs_with_sources(docs)
+    yield {"type": "docs", "docs": docs}
+    
+    answer_chain = get_prompt(prompt_type) | llm
+    inputs = {"context": context, "question": question, "chat_history": chat_history or NO_HISTORY}
+    for chunk in answer_chain.stream(inputs):
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if text:
+            yield {"type": "token", "text": text}
+
 def extract_sources_from_docs(docs):
     """
     Extract source information from retrieved documents.
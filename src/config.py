@@ -9,15 +9,128 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 # Vector store settings
 VECTOR_STORE_PATH = "vectorstore"
+VECTOR_STORE_LAYOUT = "mmap"  # "mmap" (lazy, memory-mapped) or "pickle" (LangChain save_local)
+
+# FAISS index settings
+FAISS_INDEX_TYPE = "flat"  # flat, ivf_flat, hnsw, ivf_pq or opq_ivf_pq (hnsw does not support deletes)
+FAISS_IVF_NLIST = 1024
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_CONSTRUCTION = 200
+FAISS_PQ_M = 16  # must divide the embedding dimension
+FAISS_PQ_NBITS = 8
+FAISS_NPROBE = 16
+FAISS_EF_SEARCH = 64
+FAISS_TRAIN_SAMPLE_SIZE = 50_000
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Structure-aware chunking settings
+CHUNKER = "structure"  # "structure" (section-aligned, token budget) or "recursive" (CHUNK_SIZE characters)
+CHUNK_TOKENS = 300
+CHUNK_OVERLAP_TOKENS = 30  # Only applied where a paragraph is too long for one chunk
+NEIGHBOR_WINDOW = 0  # Adjacent chunks fetched on each side of a retrieved chunk
+
+# Near-duplicate chunk detection settings
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity of word shingles at which chunks are merged
+DEDUP_SHINGLE_SIZE = 5  # Words per shingle
+DEDUP_NUM_PERM = 64  # MinHash permutations
+DEDUP_BANDS = 16  # LSH bands; DEDUP_NUM_PERM must be a multiple
+DEDUP_MAX_SOURCES = 20  # Duplicate sources listed in a canonical chunk's metadata
+
+# Ingestion settings
+INGEST_MAX_WORKERS = None  # None uses all CPU cores
+INGEST_PAGES_PER_TASK = 16
+INGEST_MAX_IN_FLIGHT = None  # None buffers twice as many page ranges as workers
+INGEST_BATCH_SIZE = 256
+
+# Model provider settings
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")  # gemini, hashing (in-process, offline) or sentence_transformer (local CPU model)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")  # gemini, ollama (local server) or echo (offline, repeats the prompt)
+
 # Gemini model settings
 GEMINI_EMBEDDING_MODEL = "models/embedding-001"
 GEMINI_GENERATION_MODEL = "gemini-1.5-pro"
 
+# Local model settings
+HASHING_EMBEDDING_DIMENSION = 768
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # Requires the sentence-transformers package
+LOCAL_EMBEDDING_BATCH_SIZE = 64
+OLLAMA_MODEL = "llama3"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+ECHO_MAX_TOKENS = 64
+
+# Embedding cache settings
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIR = "embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000
+
+# Batch embedding settings
+EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_MAX_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_RETRY_BASE_DELAY = 1.0
+
 # RAG settings
 TOP_K_RESULTS = 5
+RETRIEVER_TYPE = "similarity"  # similarity, mmr, hybrid or keyword
+CONTEXT_TOKEN_BUDGET = 2000  # Tokens of retrieved context per prompt
+
+# MMR settings
+MMR_FETCH_K = 50  # Candidate pool diversified down to TOP_K_RESULTS
+MMR_LAMBDA = 0.7  # 0 = max diversity, 1 = max relevance
+
+# Keyword (BM25) and hybrid retrieval settings
+BM25_K1 = 1.5
+BM25_B = 0.75
+HYBRID_FETCH_K = 20  # Candidates taken from each ranking before fusion
+HYBRID_RRF_K = 60
+HYBRID_KEYWORD_ONLY_MAX_TERMS = 3  # Short all-known-term queries skip the embedding call (0 disables)
+
+# Re-ranking settings
+RERANK_ENABLED = False
+RERANKER = "lexical"  # "cross_encoder" (local CPU model, requires sentence-transformers) or "lexical" (no model)
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_FETCH_K = 20  # Candidates retrieved for re-ranking
+RERANK_TOP_N = 3  # Chunks kept for the prompt
+RERANK_BATCH_SIZE = 32
+RERANK_CACHE_MAX_ENTRIES = 50_000
+
+# Metadata filter settings
+FILTER_SCAN_MAX = 20_000  # Scopes up to this many chunks are scanned directly instead of searched with an ID selector
+
+# Query micro-batching settings
+RETRIEVAL_MICRO_BATCHING = True
+MICROBATCH_MAX_SIZE = 32
+MICROBATCH_MAX_WAIT_MS = 5
+
+# Conversation memory settings
+MEMORY_MAX_TOKENS = 1500  # Token budget for recent turns in the prompt
+MEMORY_SUMMARIZE = True  # Fold evicted turns into a rolling summary
+MEMORY_SUMMARY_MAX_TOKENS = 300
+MAX_CHAT_MESSAGES = 50  # Messages kept for display in the UI
+
+# Semantic answer cache settings
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+ANSWER_CACHE_MAX_ENTRIES = 1000
+# Cache follow-up questions too. Their answers are keyed by the chat history, so they are only
+# served again within the same conversation state; False caches only first questions
+ANSWER_CACHE_WITH_HISTORY = False
+
+# QA service settings
+QA_SERVICE_URL = os.getenv("QA_SERVICE_URL")  # e.g. http://127.0.0.1:8502; unset runs the pipeline in-process
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8502
+SERVICE_MAX_CONCURRENCY = 32
+SERVICE_REQUEST_TIMEOUT = 120
+SERVICE_THREAD_POOL_SIZE = 16
+
+# Metrics settings
+METRICS_ENABLED = True
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH")  # JSON lines file for span events; unset disables the log
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
 
 # Application settings
 APP_TITLE = "Diabetes Management Assistant"
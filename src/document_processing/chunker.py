@@ -0,0 +1,202 @@
+import re
+from typing import List, Iterable, Iterator, Tuple
+
+from langchain.schema import Document
+
+from src.chains.context import count_tokens
+from src.document_processing.processor import is_header_line
+from src.config import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+
+_LINE_PATTERN = re.compile(r"[^\r\n]*(?:\r\n|\n|\r|$)")
+
+# Two or more cells separated by runs of spaces or tabs, as pypdf lays out table rows
+_TABLE_ROW_PATTERN = re.compile(r"\S(?: {2,}|\t)\S.*?(?: {2,}|\t)\S")
+
+_SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+_ROW_END_PATTERN = re.compile(r"[ \t]*(?:\r\n|\n|\r)\s*")
+
+HEADING, TABLE, TEXT = "heading", "table", "text"
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def split_blocks(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Split page text into headings, tables and paragraphs.
+    
+    Consecutive table rows form one table block and consecutive text lines
+    form one paragraph until a blank line, heading or table interrupts them.
+    
+    Args:
+        text: Raw page text
+        
+    Returns:
+        List of (start, end, kind) character spans
+    """
+    blocks = []
+    current = None
+    
+    for match in _LINE_PATTERN.finditer(text):
+        line = match.group(0)
+        if not line:
+            break
+        
+        stripped = line.strip()
+        if not stripped:
+            kind = None
+        elif is_header_line(stripped):
+            kind = HEADING
+        elif _TABLE_ROW_PATTERN.search(stripped):
+            kind = TABLE
+        else:
+            kind = TEXT
+        
+        if current is not None and (kind != current[2] or kind == HEADING):
+            blocks.append(current)
+            current = None
+        if kind is not None:
+            current = (current[0] if current else match.start(), match.end(), kind)
+    
+    if current is not None:
+        blocks.append(current)
+    
+    return [(*_strip_span(text, start, end), kind) for start, end, kind in blocks]
+
+class StructureAwareChunker:
+    """
+    Token-budgeted chunker that follows the layout of the page.
+    
+    Chunks never cross a heading, so each one stays within a single section,
+    and tables and paragraphs are kept whole whenever they fit the budget.
+    Only a paragraph too long for one chunk is cut, at sentence boundaries,
+    and only those cuts repeat up to overlap_tokens of text.
+    """
+    
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+    
+    def _split_long_block(self, text: str, start: int, end: int, kind: str = TEXT) -> List[Tuple[int, int]]:
+        """
+        Cut a block that exceeds the budget at sentence (or table row) boundaries, with a small overlap.
+        """
+        boundary = _ROW_END_PATTERN if kind == TABLE else _SENTENCE_END_PATTERN
+        sentences = []
+        position = start
+        for match in boundary.finditer(text, start, end):
+            sentences.append((position, match.start()))
+            position = match.end()
+        sentences.append((position, end))
+        
+        # Sentences longer than the budget are cut at word boundaries instead
+        units = []
+        for s_start, s_end in sentences:
+            tokens = count_tokens(text[s_start:s_end])
+            if tokens <= self.chunk_tokens:
+                units.append((s_start, s_end, tokens))
+                continue
+            words = [(m.start(), m.end()) for m in re.finditer(r"\S+", text[s_start:s_end])]
+            per_piece = max(1, len(words) * self.chunk_tokens // tokens)
+            for i in range(0, len(words), per_piece):
+                piece = words[i:i + per_piece]
+                p_start, p_end = s_start + piece[0][0], s_start + piece[-1][1]
+                units.append((p_start, p_end, count_tokens(text[p_start:p_end])))
+        
+        spans = []
+        first = 0
+        while first < len(units):
+            last = first
+            tokens = units[first][2]
+            # One extra token per join covers the whitespace between units
+            while last + 1 < len(units) and tokens + units[last + 1][2] + 1 <= self.chunk_tokens:
+                last += 1
+                tokens += units[last][2] + 1
+            spans.append((units[first][0], units[last][1]))
+            
+            if last + 1 >= len(units):
+                break
+            
+            # Start the next piece with trailing sentences that fit the overlap budget
+            next_first = last + 1
+            overlap = 0
+            while next_first - 1 > first and overlap + units[next_first - 1][2] <= self.overlap_tokens:
+                next_first -= 1
+                overlap += units[next_first][2]
+            first = next_first
+        
+        return spans
+    
+    def split_text(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Compute chunk spans for one page of text.
+        
+        Args:
+            text: Raw page text
+            
+        Returns:
+            List of (start, end) character offsets into text
+        """
+        spans = []
+        current_start = current_end = None
+        current_tokens = 0
+        has_body = False
+        
+        def flush():
+            nonlocal current_start, current_end, current_tokens, has_body
+            if current_start is not None:
+                spans.append((current_start, current_end))
+            current_start = current_end = None
+            current_tokens = 0
+            has_body = False
+        
+        for start, end, kind in split_blocks(text):
+            tokens = count_tokens(text[start:end])
+            
+            # A heading opens a new chunk; consecutive headings stay together
+            if kind == HEADING and has_body:
+                flush()
+            
+            if kind != HEADING and tokens > self.chunk_tokens:
+                # A pending heading is split along with the block so it stays with its first sentences
+                if current_start is not None and not has_body:
+                    start = current_start
+                    current_start = None
+                flush()
+                spans.extend(self._split_long_block(text, start, end, kind))
+                continue
+            
+            if current_start is not None and current_tokens + tokens > self.chunk_tokens:
+                flush()
+            
+            if current_start is None:
+                current_start = start
+            current_end = end
+            current_tokens += tokens
+            has_body = has_body or kind != HEADING
+        
+        flush()
+        return spans
+    
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Split page documents into chunks that record their character offsets.
+        
+        Args:
+            documents: Page documents
+            
+        Returns:
+            Chunk documents with start_index and end_index metadata
+        """
+        return list(self.iter_split_documents(documents))
+    
+    def iter_split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self.split_text(text):
+                metadata = {**doc.metadata, "start_index": start, "end_index": end}
+                yield Document(page_content=text[start:end], metadata=metadata)
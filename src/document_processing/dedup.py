@@ -0,0 +1,398 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+from src.config import (
+    DEDUP_THRESHOLD,
+    DEDUP_SHINGLE_SIZE,
+    DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+    DEDUP_MAX_SOURCES
+)
+
+DEDUP_FILENAME = "dedup.json"
+DEDUP_SIGNATURES_FILENAME = "dedup.signatures.npy"
+
+# Words and single symbols, so comparators, signs and units (<, >, ≥, ±, %) survive normalization
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+_NUMERIC_PATTERN = re.compile(r"\d|[<>≤≥=±%−]")
+
+# Fixed seed so signatures saved with a store stay comparable across runs
+_PERMUTATION_SEED = 1
+
+def _normalized_words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall(text.lower())
+
+def _exact_key(words: List[str]) -> str:
+    return hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).hexdigest()
+
+def _numeric_key(words: List[str]) -> str:
+    # Numbers with the unit after them, comparators and signs, in order
+    tokens = [
+        word for i, word in enumerate(words)
+        if _NUMERIC_PATTERN.search(word) or (i and any(c.isdigit() for c in words[i - 1]))
+    ]
+    return _exact_key(tokens)
+
+def _permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(_PERMUTATION_SEED)
+    # Odd multipliers make the multiply-shift hashes below a universal family
+    multipliers = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64)
+    return multipliers, offsets
+
+def source_reference(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce chunk metadata to the fields that identify where a chunk came from.
+    
+    Args:
+        metadata: Chunk metadata
+        
+    Returns:
+        Dictionary with doc_id, source and page
+    """
+    return {"doc_id": metadata.get("doc_id"), "source": metadata.get("source"), "page": metadata.get("page")}
+
+class ChunkDeduplicator:
+    """
+    Exact and near-duplicate detection for chunks, keeping one canonical copy.
+    
+    Exact duplicates are found by hashing the normalized words of a chunk.
+    Near duplicates are found with MinHash signatures of word shingles,
+    bucketed with locality-sensitive hashing (bands x rows) so a new chunk is
+    only compared against the few canonical chunks sharing a band with it.
+    Near duplicates must also agree on every number, comparator and unit, so
+    chunks stating different thresholds or doses are never merged. Every
+    duplicate is recorded against its canonical chunk, together with its own
+    chunk ID, text and metadata, so it can take over if the canonical chunk's
+    document is deleted.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+        num_perm: int = DEDUP_NUM_PERM,
+        bands: int = DEDUP_BANDS
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.multipliers, self.offsets = _permutations(num_perm)
+        
+        self.exact_keys: Dict[str, str] = {}
+        self.exact: Dict[str, str] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.numeric_keys: Dict[str, str] = {}
+        self.buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self.duplicates: Dict[str, List[Dict[str, Any]]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.exact_keys)
+    
+    def signature(self, words: List[str]) -> Optional[np.ndarray]:
+        """
+        Compute the MinHash signature of a chunk's word shingles.
+        
+        Args:
+            words: Normalized words of the chunk
+            
+        Returns:
+            uint32 signature, or None if the chunk is shorter than one shingle
+        """
+        if len(words) < self.shingle_size:
+            return None
+        
+        size = self.shingle_size
+        shingles = np.fromiter(
+            (zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)),
+            dtype=np.uint64
+        )
+        hashes = (np.outer(shingles, self.multipliers) + self.offsets) >> np.uint64(32)
+        return hashes.min(axis=0).astype(np.uint32)
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+    
+    def _match(self, key: str, signature: Optional[np.ndarray], numeric_key: str) -> Optional[str]:
+        if key in self.exact:
+            return self.exact[key]
+        if signature is None:
+            return None
+        
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self.buckets[band].get(band_key, ()))
+        
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            if self.numeric_keys.get(candidate) != numeric_key:
+                continue
+            # The fraction of equal MinHash values estimates the Jaccard similarity
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        
+        return best
+    
+    def _register(self, chunk_id: str, key: str, signature: Optional[np.ndarray], numeric_key: Optional[str]) -> None:
+        self.exact_keys[chunk_id] = key
+        self.exact.setdefault(key, chunk_id)
+        if numeric_key is not None:
+            self.numeric_keys[chunk_id] = numeric_key
+        if signature is not None:
+            self.signatures[chunk_id] = signature
+            for band, band_key in enumerate(self._band_keys(signature)):
+                self.buckets[band].setdefault(band_key, []).append(chunk_id)
+    
+    def add(self, chunk_id: str, text: str) -> None:
+        """
+        Register a chunk as canonical without checking it for duplicates.
+        
+        Args:
+            chunk_id: Docstore ID of the chunk
+            text: Chunk text
+        """
+        words = _normalized_words(text)
+        self._register(chunk_id, _exact_key(words), self.signature(words), _numeric_key(words))
+    
+    def check(self, chunk_id: str, text: str, metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Check a new chunk against the canonical chunks.
+        
+        Unique chunks are registered as canonical; duplicates are recorded
+        against the canonical chunk they match.
+        
+        Args:
+            chunk_id: Docstore ID the chunk would be stored under
+            text: Chunk text
+            metadata: Chunk metadata
+            
+        Returns:
+            ID of the canonical chunk if the chunk is a duplicate, otherwise None
+        """
+        words = _normalized_words(text)
+        key = _exact_key(words)
+        signature = None if key in self.exact else self.signature(words)
+        numeric_key = _numeric_key(words)
+        
+        canonical_id = self._match(key, signature, numeric_key)
+        if canonical_id is None:
+            self._register(chunk_id, key, signature, numeric_key)
+            return None
+        
+        self.duplicates.setdefault(canonical_id, []).append({"chunk_id": chunk_id, "text": text, "metadata": metadata})
+        return canonical_id
+    
+    def source_metadata(self, chunk_id: str) -> Dict[str, Any]:
+        """
+        Return the duplicate references to store in a canonical chunk's metadata.
+        
+        Args:
+            chunk_id: Docstore ID of the canonical chunk
+            
+        Returns:
+            Dictionary with "duplicate_sources" (at most DEDUP_MAX_SOURCES
+            references) and "duplicate_count"
+        """
+        duplicates = self.duplicates.get(chunk_id, [])
+        return {
+            "duplicate_sources": [source_reference(entry["metadata"]) for entry in duplicates[:DEDUP_MAX_SOURCES]],
+            "duplicate_count": len(duplicates)
+        }
+    
+    def _unregister(self, chunk_id: str) -> None:
+        key = self.exact_keys.pop(chunk_id)
+        if self.exact.get(key) == chunk_id:
+            del self.exact[key]
+        self.numeric_keys.pop(chunk_id, None)
+        
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is not None:
+            for band, band_key in enumerate(self._band_keys(signature)):
+                bucket = self.buckets[band][band_key]
+                bucket.remove(chunk_id)
+                if not bucket:
+                    del self.buckets[band][band_key]
+    
+    def remove_document(self, doc_id: str, chunk_ids: Iterable[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """
+        Forget a document's canonical chunks and its recorded duplicates.
+        
+        Args:
+            doc_id: Document ID being removed
+            chunk_ids: Docstore IDs of the document's stored chunks
+        
+        Returns:
+            Tuple of (mapping of each removed canonical chunk ID to its
+            duplicates from other documents, which have lost their stored
+            copy; IDs of remaining canonical chunks that lost duplicates)
+        """
+        orphaned = {}
+        changed = []
+        
+        for chunk_id in chunk_ids:
+            if chunk_id in self.exact_keys:
+                self._unregister(chunk_id)
+            remaining = [
+                entry for entry in self.duplicates.pop(chunk_id, [])
+                if entry["metadata"].get("doc_id") != doc_id
+            ]
+            if remaining:
+                orphaned[chunk_id] = remaining
+        
+        for canonical_id in list(self.duplicates):
+            entries = [entry for entry in self.duplicates[canonical_id] if entry["metadata"].get("doc_id") != doc_id]
+            if len(entries) == len(self.duplicates[canonical_id]):
+                continue
+            changed.append(canonical_id)
+            if entries:
+                self.duplicates[canonical_id] = entries
+            else:
+                del self.duplicates[canonical_id]
+        
+        return orphaned, changed
+    
+    def promote(self, canonical_id: str, text: str, entries: List[Dict[str, Any]]) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Make the first of a removed canonical chunk's duplicates the new canonical chunk.
+        
+        Args:
+            canonical_id: Docstore ID of the removed canonical chunk
+            text: Text of the removed canonical chunk, used for duplicates
+                recorded before their own text was kept
+            entries: Its remaining duplicates, as returned by remove_document
+        
+        Returns:
+            Tuple of (docstore ID, text, metadata) of the chunk to store
+        """
+        chunk_id, metadata = entries[0]["chunk_id"], dict(entries[0]["metadata"])
+        text = entries[0].get("text", text)
+        self.add(chunk_id, text)
+        if entries[1:]:
+            self.duplicates[chunk_id] = entries[1:]
+        metadata.update(self.source_metadata(chunk_id))
+        return chunk_id, text, metadata
+    
+    def save(self, directory: str) -> None:
+        signature_ids = list(self.signatures)
+        data = {
+            "threshold": self.threshold,
+            "shingle_size": self.shingle_size,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "exact_keys": self.exact_keys,
+            "signature_ids": signature_ids,
+            "numeric_keys": self.numeric_keys,
+            "duplicates": self.duplicates
+        }
+        with open(os.path.join(directory, DEDUP_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        
+        signatures = np.stack([self.signatures[chunk_id] for chunk_id in signature_ids]) if signature_ids else np.zeros((0, self.num_perm), dtype=np.uint32)
+        np.save(os.path.join(directory, DEDUP_SIGNATURES_FILENAME), signatures)
+    
+    @classmethod
+    def load(cls, directory: str) -> "ChunkDeduplicator":
+        with open(os.path.join(directory, DEDUP_FILENAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        signatures = np.load(os.path.join(directory, DEDUP_SIGNATURES_FILENAME))
+        
+        deduplicator = cls(
+            threshold=data["threshold"],
+            shingle_size=data["shingle_size"],
+            num_perm=data["num_perm"],
+            bands=data["bands"]
+        )
+        rows = dict(zip(data["signature_ids"], signatures))
+        numeric_keys = data.get("numeric_keys", {})
+        for chunk_id, key in data["exact_keys"].items():
+            deduplicator._register(chunk_id, key, rows.get(chunk_id), numeric_keys.get(chunk_id))
+        deduplicator.duplicates = data["duplicates"]
+        
+        return deduplicator
+
+def build_deduplicator(vectorstore) -> ChunkDeduplicator:
+    """
+    Register every chunk of a vector store as canonical.
+    
+    Args:
+        vectorstore: FAISS vector store
+        
+    Returns:
+        Chunk deduplicator
+    """
+    deduplicator = ChunkDeduplicator()
+    for position in range(vectorstore.index.ntotal):
+        chunk_id = vectorstore.index_to_docstore_id[position]
+        deduplicator.add(chunk_id, vectorstore.docstore.search(chunk_id).page_content)
+    return deduplicator
+
+def load_deduplicator(directory: str, vectorstore=None) -> Optional[ChunkDeduplicator]:
+    """
+    Load the chunk deduplicator saved with a vector store.
+    
+    Stores saved before deduplication existed have no file; one is built
+    from the vector store's chunks if it is given. Files saved before
+    numbers were compared have their canonical chunks registered again from
+    the vector store, keeping the recorded duplicates.
+    
+    Args:
+        directory: Directory containing the vector store
+        vectorstore: Optional vector store to build a missing deduplicator from
+        
+    Returns:
+        Chunk deduplicator, or None if there is neither a file nor a vector store
+    """
+    if os.path.exists(os.path.join(directory, DEDUP_FILENAME)):
+        deduplicator = ChunkDeduplicator.load(directory)
+        if vectorstore is None or len(deduplicator.numeric_keys) == len(deduplicator):
+            return deduplicator
+        
+        rebuilt = build_deduplicator(vectorstore)
+        rebuilt.duplicates = deduplicator.duplicates
+        return rebuilt
+    
+    if vectorstore is not None:
+        print(f"No deduplication index in {directory}, building one from {vectorstore.index.ntotal} chunks")
+        return build_deduplicator(vectorstore)
+    
+    return None
+
+def deduplicate_documents(documents: List, deduplicator: Optional[ChunkDeduplicator] = None) -> List:
+    """
+    Drop duplicate chunks from a list, keeping the first copy of each.
+    
+    Kept chunks list the sources of their dropped duplicates in their
+    metadata.
+    
+    Args:
+        documents: List of document chunks
+        deduplicator: Optional deduplicator holding earlier chunks
+        
+    Returns:
+        List of canonical chunks in input order
+    """
+    deduplicator = deduplicator if deduplicator is not None else ChunkDeduplicator()
+    kept = {}
+    
+    for position, doc in enumerate(documents):
+        chunk_id = f"chunk-{position}"
+        if deduplicator.check(chunk_id, doc.page_content, doc.metadata) is None:
+            kept[chunk_id] = doc
+    
+    for chunk_id, doc in kept.items():
+        if chunk_id in deduplicator.duplicates:
+            doc.metadata.update(deduplicator.source_metadata(chunk_id))
+    
+    return list(kept.values())
@@ -4,7 +4,8 @@ from typing import List, Dict, Any
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+from src.document_processing.chunker import StructureAwareChunker
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER
 
 def load_pdf_documents(file_paths: List[str]) -> List[Dict[str, Any]]:
     """
@@ -32,22 +33,39 @@ def load_pdf_documents(file_paths: List[str]) -> List[Dict[str, Any]]:
     
     return documents
 
-def split_documents(documents):
+def get_text_splitter(chunker: str = CHUNKER):
     """
-    Split documents into smaller chunks for better processing.
+    Create the text splitter used to chunk documents.
     
     Args:
-        documents: List of document objects
+        chunker: "structure" for the section-aware token chunker, "recursive"
+            for the character splitter
         
     Returns:
-        List of document chunks
+        Configured text splitter
     """
-    text_splitter = RecursiveCharacterTextSplitter(
+    if chunker == "structure":
+        return StructureAwareChunker()
+    
+    return RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
         separators=["\n\n", "\n", ". ", " ", ""],
-        length_function=len
+        length_function=len,
+        add_start_index=True
     )
+
+def split_documents(documents):
+    """
+    Split documents into smaller chunks for better processing.
+    
+    Args:
+        documents: List of document objects
+        
+    Returns:
+        List of document chunks
+    """
+    text_splitter = get_text_splitter()
     
     document_chunks = text_splitter.split_documents(documents)
     print(f"Split {len(documents)} documents into {len(document_chunks)} chunks")
@@ -0,0 +1,217 @@
+import os
+import time
+from itertools import islice
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from pypdf import PdfReader
+from langchain.schema import Document
+
+from src.document_processing.loader import get_text_splitter
+from src.document_processing.processor import enhance_documents, carry_sections
+from src.utils import metrics
+from src.config import INGEST_MAX_WORKERS, INGEST_PAGES_PER_TASK, INGEST_MAX_IN_FLIGHT
+
+class StageStats:
+    """
+    Accumulate item counts and busy time for each ingestion stage.
+    """
+    
+    def __init__(self):
+        self.items = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.started = time.perf_counter()
+        
+    def record(self, stage: str, items: int, seconds: float) -> None:
+        self.items[stage] += items
+        self.seconds[stage] += seconds
+        metrics.record_stage(f"ingest_{stage}", seconds)
+        metrics.increment("ingest_items_total", items, stage=stage)
+        
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize throughput per stage.
+        
+        Stage seconds are summed across workers, so items_per_second is the
+        per-core rate; the "wall" entry gives end-to-end pages per second.
+        
+        Returns:
+            Dictionary of stage name to items, seconds and items per second
+        """
+        report = {}
+        for stage, items in self.items.items():
+            seconds = self.seconds[stage]
+            report[stage] = {
+                "items": items,
+                "seconds": round(seconds, 4),
+                "items_per_second": round(items / seconds, 2) if seconds else 0.0
+            }
+            
+        wall = time.perf_counter() - self.started
+        pages = self.items.get("parse", 0)
+        report["wall"] = {
+            "items": pages,
+            "seconds": round(wall, 4),
+            "items_per_second": round(pages / wall, 2) if wall else 0.0
+        }
+        
+        return report
+        
+    def summary(self) -> str:
+        return ", ".join(
+            f"{stage}: {stats['items']} in {stats['seconds']:.2f}s ({stats['items_per_second']}/s)"
+            for stage, stats in self.report().items()
+        )
+
+def _count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+def _process_page_range(file_path: str, start: int, end: int) -> Tuple[List, Dict[str, Any]]:
+    """
+    Parse, split and clean a range of pages from one PDF (runs in a worker process).
+    """
+    timings = {}
+    
+    t0 = time.perf_counter()
+    reader = PdfReader(file_path)
+    pages = [
+        Document(page_content=reader.pages[i].extract_text(), metadata={"source": file_path, "page": i})
+        for i in range(start, end)
+    ]
+    timings["parse"] = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    chunks = get_text_splitter().split_documents(pages)
+    timings["split"] = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    chunks = enhance_documents(chunks)
+    timings["clean"] = time.perf_counter() - t0
+    
+    return chunks, {"pages": len(pages), "timings": timings}
+
+def _plan_tasks(file_paths: List[str], pages_per_task: int) -> List[Tuple[str, int, int]]:
+    tasks = []
+    
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            continue
+            
+        try:
+            page_count = _count_pages(file_path)
+        except Exception as e:
+            print(f"Error loading document {file_path}: {str(e)}")
+            continue
+            
+        for start in range(0, page_count, pages_per_task):
+            tasks.append((file_path, start, min(start + pages_per_task, page_count)))
+            
+    return tasks
+
+def iter_processed_chunks(
+    file_paths: List[str],
+    max_workers: Optional[int] = INGEST_MAX_WORKERS,
+    pages_per_task: int = INGEST_PAGES_PER_TASK,
+    stats: Optional[StageStats] = None,
+    max_in_flight: Optional[int] = INGEST_MAX_IN_FLIGHT
+) -> Iterator[Tuple[Tuple[str, int], List]]:
+    """
+    Parse, split and clean PDFs in a process pool, streaming results in input order.
+    
+    Each PDF is divided into page ranges so a single large file is spread
+    across workers too. At most max_in_flight page ranges are submitted but
+    not yet consumed, so memory depends on the window size rather than on
+    the corpus size. A page range that fails is still yielded, with None
+    instead of its chunks, so callers can tell the file is incomplete.
+    Section headings are carried across the page ranges of each file.
+    
+    Args:
+        file_paths: List of paths to PDF files
+        max_workers: Number of worker processes (defaults to the CPU count)
+        pages_per_task: Number of pages handled per worker task
+        stats: Optional stats accumulator for per-stage throughput
+        max_in_flight: Maximum number of page ranges buffered at once
+            (defaults to twice the number of workers)
+        
+    Yields:
+        Tuples of ((file path, first page), list of cleaned chunks or None)
+    """
+    stats = stats if stats is not None else StageStats()
+    tasks = _plan_tasks(file_paths, pages_per_task)
+    sections = {}
+    
+    def record(result_info: Dict[str, Any], chunks: List) -> None:
+        timings = result_info["timings"]
+        stats.record("parse", result_info["pages"], timings["parse"])
+        stats.record("split", len(chunks), timings["split"])
+        stats.record("clean", len(chunks), timings["clean"])
+    
+    # Small jobs are not worth the process start-up cost
+    if max_workers == 1 or len(tasks) <= 1:
+        for file_path, start, end in tasks:
+            try:
+                chunks, info = _process_page_range(file_path, start, end)
+            except Exception as e:
+                print(f"Error loading pages {start}+ of {file_path}: {str(e)}")
+                yield (file_path, start), None
+                continue
+            record(info, chunks)
+            yield (file_path, start), carry_sections(chunks, sections)
+        return
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        window = max_in_flight or 2 * (max_workers or os.cpu_count() or 1)
+        pending = {}
+        completed = {}
+        next_submit = 0
+        next_yield = 0
+        
+        while next_yield < len(tasks):
+            while next_submit < len(tasks) and next_submit - next_yield < window:
+                file_path, start, end = tasks[next_submit]
+                pending[executor.submit(_process_page_range, file_path, start, end)] = next_submit
+                next_submit += 1
+            
+            if next_yield not in completed:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    file_path, start, _ = tasks[index]
+                    try:
+                        completed[index] = future.result()
+                    except Exception as e:
+                        print(f"Error loading pages {start}+ of {file_path}: {str(e)}")
+                        completed[index] = None
+            
+            # Release results strictly in task order
+            while next_yield in completed:
+                result = completed.pop(next_yield)
+                file_path, start, _ = tasks[next_yield]
+                next_yield += 1
+                if result is None:
+                    yield (file_path, start), None
+                    continue
+                chunks, info = result
+                record(info, chunks)
+                yield (file_path, start), carry_sections(chunks, sections)
+
+def batched(iterable: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Group an iterable into lists of at most batch_size items.
+    
+    Args:
+        iterable: Items to group
+        batch_size: Maximum number of items per batch
+        
+    Yields:
+        Lists of items
+    """
+    iterator = iter(iterable)
+    
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
\ No newline at end of file
@@ -1,31 +1,96 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+# Page markers such as "Page 3 of 12" or "page 3/12"
+_PAGE_MARKER = r"[Pp]age\s+\d+\s*(?:of|/)\s*\d+\b\s*"
+
+# Every match starts at whitespace (or a marker at the very start), so the
+# engine skips ordinary text quickly; runs of whitespace, \r\n line endings
+# and page markers all collapse to one space in a single substitution.
+_NOISE_PATTERN = re.compile(rf"\s+(?:{_PAGE_MARKER})*|^(?:{_PAGE_MARKER})+")
+
+# Section headers as laid out in extracted PDF text: markdown headings,
+# numbered headings ("2.1 Insulin Therapy") and short all-caps lines,
+# optionally ending in a colon. \r? lets the patterns see \r\n line endings.
+_HEADER_PATTERN = re.compile(
+    r"^[ \t]*(?:"
+    r"#{1,6}[ \t]+(?P<markdown>[^\r\n]{1,120}?)"
+    r"|(?P<numbered>\d{1,2}(?:\.\d{1,2}){0,3}\.?[ \t]+[A-Z][^\r\n.!?]{2,80}?)"
+    r"|(?P<caps>[A-Z][A-Z0-9 ,&()/\-]{2,80}?)"
+    r"):?[ \t]*\r?$",
+    re.MULTILINE
+)
+
+MAX_HEADERS_PER_CHUNK = 10
+MAX_HEADER_WORDS = 8
 
 def clean_text(text: str) -> str:
     """
     Clean and normalize document text.
     
+    Whitespace (including Windows and Unix line breaks) is collapsed to single
+    spaces and page markers are removed, in one pass with a precompiled
+    pattern.
+    
     Args:
         text: Raw text from document
         
     Returns:
         Cleaned text
     """
-    # Remove multiple whitespaces
-    text = re.sub(r'\s+', ' ', text)
+    return _NOISE_PATTERN.sub(" ", text).strip()
+
+def _header_text(match) -> Optional[str]:
+    header = (match.group("markdown") or match.group("numbered") or match.group("caps")).strip()
+    # All-caps matches must contain a real word, not just numerals or initials
+    if match.group("caps") and sum(c.isalpha() for c in header) < 3:
+        return None
+    # Long numbered lines are list items rather than headings
+    if match.group("numbered") and len(header.split()) > MAX_HEADER_WORDS:
+        return None
+    return header
+
+def is_header_line(line: str) -> bool:
+    """
+    Check whether a single line of raw text is a section header.
+    
+    Args:
+        line: One line of text without its line break
+        
+    Returns:
+        True if the line is laid out as a heading
+    """
+    match = _HEADER_PATTERN.match(line)
+    return match is not None and match.end() == len(line) and _header_text(match) is not None
+
+def extract_headers(text: str) -> List[str]:
+    """
+    Detect section headers in raw (not yet normalized) text.
     
-    # Remove page numbers and headers if detectable
-    text = re.sub(r'\b(?:Page|page)\s+\d+\s+(?:of|/)\s+\d+\b', '', text)
+    Args:
+        text: Raw text with its original line breaks
+        
+    Returns:
+        Unique headers in order of appearance
+    """
+    headers = []
     
-    # Normalize line breaks
-    text = text.replace('\r\n', '\n')
+    for match in _HEADER_PATTERN.finditer(text):
+        header = _header_text(match)
+        if header and header not in headers:
+            headers.append(header)
+            if len(headers) == MAX_HEADERS_PER_CHUNK:
+                break
     
-    return text.strip()
+    return headers
 
 def extract_metadata(document) -> Dict[str, Any]:
     """
     Extract and enhance document metadata.
     
+    Must run on the raw text, before clean_text flattens the line
+    structure that header detection relies on.
+    
     Args:
         document: Document object
         
@@ -34,14 +99,9 @@ def extract_metadata(document) -> Dict[str, Any]:
     """
     metadata = document.metadata.copy()
     
-    # Add document section detection if possible
-    text = document.page_content
-    
-    # Try to identify document sections (headers)
-    headers = re.findall(r'^(#+\s+.+)$|^([A-Z][A-Z\s]+):$', text, re.MULTILINE)
+    headers = extract_headers(document.page_content)
     if headers:
-        flattened_headers = [h[0] or h[1] for h in headers if h[0] or h[1]]
-        metadata['detected_headers'] = flattened_headers
+        metadata['detected_headers'] = headers
     
     return metadata
 
@@ -55,18 +115,61 @@ def enhance_documents(documents: List) -> List:
     Returns:
         List of enhanced document objects
     """
-    enhanced_docs = []
+    return list(iter_enhance_documents(documents))
+
+def iter_enhance_documents(documents: Iterable) -> Iterator:
+    """
+    Lazily clean text and enhance metadata for a stream of documents.
     
-    for doc in documents:
-        # Clean the text
-        cleaned_text = clean_text(doc.page_content)
+    Each chunk is tagged with the section it falls in: its own last header,
+    or the last header of an earlier chunk from the same source. Sections
+    are only carried within one call; see carry_sections for documents
+    enhanced in separate batches.
+    
+    Args:
+        documents: Iterable of document objects
         
-        # Extract and enhance metadata
+    Yields:
+        Enhanced document objects
+    """
+    section = {}
+    
+    for doc in documents:
+        # Detect structure while the original line breaks are still present
         enhanced_metadata = extract_metadata(doc)
         
+        # Chunks without a header of their own belong to the last section seen in their source
+        source = enhanced_metadata.get("source")
+        if enhanced_metadata.get("detected_headers"):
+            section[source] = enhanced_metadata["detected_headers"][-1]
+        if source in section:
+            enhanced_metadata["section"] = section[source]
+        
         # Create new document with cleaned text and enhanced metadata
-        doc.page_content = cleaned_text
+        doc.page_content = clean_text(doc.page_content)
         doc.metadata = enhanced_metadata
-        enhanced_docs.append(doc)
+        yield doc
+
+def carry_sections(documents: List, sections: Dict[str, str]) -> List:
+    """
+    Carry section headings over from earlier batches of the same sources.
+    
+    Page ranges are enhanced separately, so the chunks before the first
+    header of a range have no section. Called on the ranges in page order,
+    it tags those chunks with the last section of the preceding range.
+    
+    Args:
+        documents: Enhanced documents of one batch, in order
+        sections: Last section seen per source, updated in place
+        
+    Returns:
+        The same documents
+    """
+    for doc in documents:
+        source = doc.metadata.get("source")
+        if "section" in doc.metadata:
+            sections[source] = doc.metadata["section"]
+        elif source in sections:
+            doc.metadata["section"] = sections[source]
     
-    return enhanced_docs
\ No newline at end of file
+    return documents
\ No newline at end of file
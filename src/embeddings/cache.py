@@ -0,0 +1,229 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from src.embeddings.providers import embed_queries
+from src.utils import metrics
+from src.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so trivially different copies share a cache entry.
+    
+    Args:
+        text: Text to normalize
+        
+    Returns:
+        Normalized text
+    """
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed, content-addressed cache in front of an embeddings model.
+    
+    Vectors are stored as raw float32 bytes in a SQLite file, keyed by a hash of
+    (model name, task type, query or document, normalized text). The least recently used entries
+    are evicted once the cache grows past max_entries. The SQLite file may be
+    shared by several processes, so the entry count and the recency clock
+    are read from the file inside each write transaction.
+    """
+    
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_dir: str = EMBEDDING_CACHE_DIR,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        namespace: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.namespace = namespace or "{}|{}".format(
+            getattr(embeddings, "model", type(embeddings).__name__),
+            getattr(embeddings, "task_type", None) or ""
+        )
+        self.hits = 0
+        self.misses = 0
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, "embeddings.sqlite"),
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+    
+    def _key(self, text: str, query: bool = False) -> bytes:
+        # Providers may embed queries with a different task type than documents
+        namespace = f"{self.namespace}\0query" if query else self.namespace
+        payload = f"{namespace}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).digest()
+    
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        
+        with self._lock:
+            for start in range(0, len(unique_keys), _SQL_BATCH_SIZE):
+                batch = unique_keys[start:start + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            
+            if found:
+                with self._conn:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    clock = self._next_clock()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(clock, key) for key in found]
+                    )
+        
+        return found
+    
+    def _next_clock(self) -> int:
+        # Read within the write transaction, so other processes' uses are ordered too
+        return self._conn.execute("SELECT COALESCE(MAX(last_used), 0) + 1 FROM embeddings").fetchone()[0]
+    
+    def _store(self, entries: Dict[bytes, np.ndarray]) -> None:
+        if not entries:
+            return
+        
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            clock = self._next_clock()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vector.astype(np.float32).tobytes(), clock) for key, vector in entries.items()]
+            )
+            
+            # Counted in the transaction: other processes add entries to the same file
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+    
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def _embed_many(self, texts: List[str], query: bool) -> List[List[float]]:
+        keys = [self._key(text, query) for text in texts]
+        vectors = self._lookup(keys)
+        
+        # Identical texts within one call are embedded only once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        
+        miss_count = sum(1 for key in keys if key in missing)
+        self.hits += len(keys) - miss_count
+        self.misses += miss_count
+        metrics.increment("embedding_cache_total", len(keys) - miss_count, result="hit")
+        metrics.increment("embedding_cache_total", miss_count, result="miss")
+        
+        if missing:
+            if query:
+                new_vectors = embed_queries(self.embeddings, list(missing.values()))
+            else:
+                new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing.keys(), new_vectors)
+            }
+            self._store(computed)
+            vectors.update(computed)
+        
+        return [vectors[key].tolist() for key in keys]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, calling the underlying model only for uncached texts.
+        
+        Args:
+            texts: List of texts to embed
+        
+        Returns:
+            List of embedding vectors
+        """
+        return self._embed_many(texts, query=False)
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries, calling the underlying model only for uncached ones.
+        
+        Args:
+            texts: Query texts
+        
+        Returns:
+            List of embedding vectors
+        """
+        return self._embed_many(texts, query=True)
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, serving it from the cache when possible.
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Embedding vector
+        """
+        key = self._key(text, query=True)
+        cached = self._lookup([key])
+        
+        if key in cached:
+            self.hits += 1
+            metrics.increment("embedding_cache_total", result="hit")
+            return cached[key].tolist()
+        
+        self.misses += 1
+        metrics.increment("embedding_cache_total", result="miss")
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        self._store({key: vector})
+        
+        return vector.tolist()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache hit/miss counters.
+        
+        Returns:
+            Dictionary with hits, misses, hit rate and current entry count
+        """
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._count()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries
+        }
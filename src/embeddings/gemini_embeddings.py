@@ -1,8 +1,24 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-import google.generativeai as genai
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain.schema.embeddings import Embeddings
 
-from src.config import GOOGLE_API_KEY, GEMINI_EMBEDDING_MODEL
+from src.config import (
+    EMBEDDING_PROVIDER,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BASE_DELAY
+)
+from src.embeddings.cache import CachedEmbeddings
+from src.embeddings.providers import create_embeddings, create_gemini_embeddings, embed_queries
+from src.utils import metrics
+
+_embeddings_client = None
+_embeddings_client_lock = threading.Lock()
 
 def initialize_gemini_embeddings():
     """
@@ -11,17 +27,106 @@ def initialize_gemini_embeddings():
     Returns:
         Configured embeddings model
     """
-    # Configure Google Gemini API
-    genai.configure(api_key=GOOGLE_API_KEY)
+    return create_gemini_embeddings()
+
+class InstrumentedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that times and counts every request to the provider.
+    """
+    
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
     
-    # Initialize embeddings
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=GEMINI_EMBEDDING_MODEL,
-        task_type="retrieval_document"
-    )
+    def __getattr__(self, name: str):
+        # Expose the wrapped model's settings (model, task_type) to the cache namespace
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        metrics.increment("embedding_requests_total", kind="documents")
+        metrics.increment("embedding_texts_total", len(texts))
+        with metrics.span("embed_documents"):
+            return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        metrics.increment("embedding_requests_total", kind="query")
+        metrics.increment("embedding_texts_total")
+        with metrics.span("embed_query"):
+            return self.embeddings.embed_query(text)
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        metrics.increment("embedding_requests_total", kind="queries")
+        metrics.increment("embedding_texts_total", len(texts))
+        with metrics.span("embed_queries"):
+            return embed_queries(self.embeddings, texts)
+
+def initialize_embeddings(provider: str = EMBEDDING_PROVIDER):
+    """
+    Initialize the configured provider's embeddings model, wrapped in the
+    on-disk cache when enabled.
+    
+    Args:
+        provider: Embedding provider name (gemini, hashing or sentence_transformer)
+    
+    Returns:
+        Embeddings model
+    """
+    embeddings = create_embeddings(provider)
+    
+    # Instrumented inside the cache, so only real API calls are counted. Always
+    # wrapped: recording checks the registry, so metrics can be enabled later
+    embeddings = InstrumentedEmbeddings(embeddings)
+    
+    if EMBEDDING_CACHE_ENABLED:
+        return CachedEmbeddings(embeddings)
     
     return embeddings
 
+def get_embeddings_client():
+    """
+    Return the shared embeddings client, creating it on first use.
+    
+    Returns:
+        Embeddings model
+    """
+    global _embeddings_client
+    
+    if _embeddings_client is None:
+        with _embeddings_client_lock:
+            if _embeddings_client is None:
+                _embeddings_client = initialize_embeddings()
+    
+    return _embeddings_client
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Check whether an error returned by the embedding API is a throttling error.
+    
+    Args:
+        error: Exception raised by the embeddings model
+        
+    Returns:
+        True if the request should be retried after a backoff
+    """
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "resource has been exhausted" in message
+
+def _embed_batch_with_retry(embeddings, texts: List[str], max_retries: int, base_delay: float) -> List[List[float]]:
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limit_error(e):
+                raise
+            metrics.increment("embedding_retries_total")
+            
+            # Exponential backoff with jitter so throttled workers do not retry in lockstep
+            time.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+
 def get_text_embedding(text: str) -> List[float]:
     """
     Get embedding for a single text.
@@ -32,18 +137,48 @@ def get_text_embedding(text: str) -> List[float]:
     Returns:
         Embedding vector
     """
-    embeddings = initialize_gemini_embeddings()
-    return embeddings.embed_query(text)
+    return get_embeddings_client().embed_query(text)
 
-def batch_embed_texts(texts: List[str]) -> List[List[float]]:
+def batch_embed_texts(
+    texts: List[str],
+    embeddings=None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+    retry_base_delay: float = EMBEDDING_RETRY_BASE_DELAY
+) -> List[List[float]]:
     """
     Batch embed multiple texts.
     
+    Texts are grouped into provider-sized batches that are sent with a bounded
+    number of concurrent requests. Rate-limited batches are retried with
+    exponential backoff. Results are returned in input order.
+    
     Args:
         texts: List of texts to embed
+        embeddings: Embeddings model to use (defaults to the shared client)
+        batch_size: Maximum number of texts per embedding request
+        max_concurrency: Maximum number of in-flight requests
+        max_retries: Maximum number of retries per batch on rate-limit errors
+        retry_base_delay: Initial backoff delay in seconds
         
     Returns:
         List of embedding vectors
     """
-    embeddings = initialize_gemini_embeddings()
-    return [embeddings.embed_query(text) for text in texts]
\ No newline at end of file
+    if not texts:
+        return []
+    
+    embeddings = embeddings or get_embeddings_client()
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    
+    def embed_batch(batch: List[str]) -> List[List[float]]:
+        return _embed_batch_with_retry(embeddings, batch, max_retries, retry_base_delay)
+    
+    if len(batches) == 1 or max_concurrency <= 1:
+        results = [embed_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+            # map() yields results in submission order
+            results = list(executor.map(embed_batch, batches))
+    
+    return [vector for batch_vectors in results for vector in batch_vectors]
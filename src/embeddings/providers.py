@@ -0,0 +1,202 @@
+import re
+import hashlib
+from typing import List, Dict, Callable
+
+import numpy as np
+import google.generativeai as genai
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_google_genai._common import GoogleGenerativeAIError
+from langchain.schema.embeddings import Embeddings
+
+from src.config import (
+    GOOGLE_API_KEY,
+    EMBEDDING_PROVIDER,
+    GEMINI_EMBEDDING_MODEL,
+    HASHING_EMBEDDING_DIMENSION,
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_BATCH_SIZE
+)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several queries through the model's query path.
+    
+    Providers with separate task types (Gemini's retrieval_query and
+    retrieval_document) embed queries differently from documents, so batched
+    queries must not go through embed_documents. Models with an
+    embed_queries method embed them in one request, others one by one.
+    
+    Args:
+        embeddings: Embeddings model
+        texts: Query texts
+    
+    Returns:
+        List of query embedding vectors
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+class GeminiEmbeddings(GoogleGenerativeAIEmbeddings):
+    """
+    Gemini embeddings that can embed several queries in one request.
+    """
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Same task type as embed_query
+        try:
+            result = genai.embed_content(
+                model=self.model,
+                content=texts,
+                task_type=self.task_type or "retrieval_query"
+            )
+        except Exception as e:
+            raise GoogleGenerativeAIError(f"Error embedding content: {e}") from e
+        return result["embedding"]
+
+def create_gemini_embeddings() -> Embeddings:
+    """
+    Create the Gemini embeddings client.
+    
+    The client configures the Gemini SDK itself when it is constructed, so
+    building it once per process is the only setup needed.
+    
+    Returns:
+        Gemini embeddings model
+    """
+    return GeminiEmbeddings(
+        model=GEMINI_EMBEDDING_MODEL,
+        task_type="retrieval_document",
+        google_api_key=GOOGLE_API_KEY
+    )
+
+class HashingEmbeddings(Embeddings):
+    """
+    In-process embedder hashing words and word bigrams into a fixed-size vector.
+    
+    Needs no model files or network access, so it suits air-gapped hosts and
+    offline tests. Texts sharing vocabulary get similar vectors; a signed
+    hash keeps colliding features from only ever adding up.
+    """
+    
+    def __init__(self, dimension: int = HASHING_EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.model = f"hashing-{dimension}"
+    
+    def _features(self, text: str) -> List[int]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = words + [f"{left} {right}" for left, right in zip(words, words[1:])]
+        return [
+            int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            for feature in features
+        ]
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        
+        for row, text in enumerate(texts):
+            hashes = np.asarray(self._features(text), dtype=np.uint64)
+            if not len(hashes):
+                continue
+            # The low bits pick the dimension, the top bit the sign
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes % np.uint64(self.dimension)).astype(np.int64), signs)
+        
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    Local sentence-transformers model run on the CPU.
+    
+    The model is loaded once when the client is created; requires the
+    optional sentence-transformers package.
+    """
+    
+    def __init__(self, model: str = LOCAL_EMBEDDING_MODEL, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The sentence_transformer embedding provider requires the sentence-transformers package"
+            ) from e
+        
+        self.model = model
+        self.batch_size = batch_size
+        self.client = SentenceTransformer(model, device="cpu")
+        self.dimension = self.client.get_sentence_embedding_dimension()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.client.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], Embeddings]] = {
+    "gemini": create_gemini_embeddings,
+    "hashing": HashingEmbeddings,
+    "sentence_transformer": SentenceTransformerEmbeddings
+}
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """
+    Create the embeddings model for a provider.
+    
+    Args:
+        provider: Embedding provider name (gemini, hashing or sentence_transformer)
+        
+    Returns:
+        Embeddings model
+    """
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {provider}")
+    
+    return EMBEDDING_PROVIDERS[provider]()
+
+def get_embedding_model_name(provider: str = EMBEDDING_PROVIDER) -> str:
+    """
+    Return the name of the model a provider embeds with.
+    
+    Args:
+        provider: Embedding provider name
+        
+    Returns:
+        Model name
+    """
+    if provider == "gemini":
+        return GEMINI_EMBEDDING_MODEL
+    if provider == "hashing":
+        return f"hashing-{HASHING_EMBEDDING_DIMENSION}"
+    if provider == "sentence_transformer":
+        return LOCAL_EMBEDDING_MODEL
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+def embedding_signature(provider: str = EMBEDDING_PROVIDER) -> Dict[str, str]:
+    """
+    Describe the embedding space of a provider, as recorded in the index manifest.
+    
+    Vectors from different signatures are not comparable, so an index built
+    under another signature must be re-embedded before it is searched.
+    
+    Args:
+        provider: Embedding provider name
+        
+    Returns:
+        Dictionary with "provider" and "model" keys
+    """
+    return {"provider": provider, "model": get_embedding_model_name(provider)}
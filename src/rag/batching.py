@@ -0,0 +1,150 @@
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import List, Any
+
+import faiss
+import numpy as np
+from langchain.schema import BaseRetriever
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_community.vectorstores import FAISS
+
+from src.embeddings.providers import embed_queries
+from src.utils import metrics
+from src.config import TOP_K_RESULTS, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS
+
+_STOP = object()
+
+MICROBATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+def documents_for_positions(vectorstore: FAISS, positions) -> List:
+    """
+    Look up the documents stored at FAISS index positions.
+    
+    Args:
+        vectorstore: FAISS vector store
+        positions: Index positions (-1 entries are skipped)
+        
+    Returns:
+        List of documents
+    """
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+        for position in positions
+        if position != -1
+    ]
+
+class MicroBatchSearcher:
+    """
+    Coalesce concurrent queries into one embedding call and one FAISS search.
+    
+    Queries submitted within max_wait_ms of each other (up to max_batch_size)
+    are embedded together through the query embedding path and searched as a single stacked matrix; each caller
+    receives its own results through a future.
+    """
+    
+    def __init__(
+        self,
+        vectorstore: FAISS,
+        max_batch_size: int = MICROBATCH_MAX_SIZE,
+        max_wait_ms: float = MICROBATCH_MAX_WAIT_MS
+    ):
+        self.vectorstore = vectorstore
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.queries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batch-searcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, query: str, k: int = TOP_K_RESULTS) -> Future:
+        """
+        Queue a query for the next batch.
+        
+        Args:
+            query: User query
+            k: Number of documents to return
+            
+        Returns:
+            Future resolving to the list of relevant documents
+        """
+        future = Future()
+        self._queue.put((query, k, future))
+        return future
+    
+    def search(self, query: str, k: int = TOP_K_RESULTS) -> List:
+        return self.submit(query, k).result()
+    
+    def close(self) -> None:
+        self._queue.put(_STOP)
+    
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        
+        return batch
+    
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            self._process(self._collect(first))
+    
+    def _process(self, batch: list) -> None:
+        try:
+            queries = [query for query, _, _ in batch]
+            vectors = np.asarray(embed_queries(self.vectorstore.embeddings, queries), dtype=np.float32)
+            if self.vectorstore._normalize_L2:
+                faiss.normalize_L2(vectors)
+            
+            max_k = max(k for _, k, _ in batch)
+            with metrics.span("faiss_search"):
+                _, indices = self.vectorstore.index.search(vectors, max_k)
+            metrics.observe("microbatch_size", len(batch), buckets=MICROBATCH_SIZE_BUCKETS)
+            
+            self.batches += 1
+            self.queries += len(batch)
+            
+            for (_, k, future), row in zip(batch, indices):
+                future.set_result(documents_for_positions(self.vectorstore, row[:k]))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+class MicroBatchRetriever(BaseRetriever):
+    """
+    Retriever that routes queries through a shared MicroBatchSearcher.
+    """
+    
+    searcher: Any
+    k: int = TOP_K_RESULTS
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        return self.searcher.search(query, self.k)
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List:
+        return await asyncio.wrap_future(self.searcher.submit(query, self.k))
+    
+    def close(self) -> None:
+        self.searcher.close()
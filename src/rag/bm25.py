@@ -0,0 +1,332 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+from langchain.schema import BaseRetriever
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain_community.vectorstores import FAISS
+
+from src.rag.vectorstore import search_ids_by_vector
+from src.utils import metrics
+from src.config import (
+    TOP_K_RESULTS,
+    BM25_K1,
+    BM25_B,
+    HYBRID_FETCH_K,
+    HYBRID_RRF_K,
+    HYBRID_KEYWORD_ONLY_MAX_TERMS
+)
+
+BM25_FILENAME = "bm25.json"
+
+# Terms like "HbA1c", "SGLT2" and "500mg" stay whole tokens
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i in is it its of on or "
+    "should so than that the their there these this to was what when which who why will with "
+    "you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase keyword terms, dropping common stopwords.
+    
+    Args:
+        text: Text to tokenize
+        
+    Returns:
+        List of terms
+    """
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if term not in _STOPWORDS]
+
+class BM25Index:
+    """
+    Incrementally updatable inverted index with Okapi BM25 scoring.
+    
+    Each chunk occupies a slot; postings map a term to {slot: term frequency}.
+    Deleted slots are freed and compacted once they make up half of the index.
+    """
+    
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.slots: Dict[str, int] = {}
+        self.total_length = 0
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def __contains__(self, term: str) -> bool:
+        return term in self.postings
+    
+    def add(self, doc_id: str, text: str) -> None:
+        """
+        Index a chunk, replacing any previous text stored under the same ID.
+        
+        Args:
+            doc_id: Docstore ID of the chunk
+            text: Chunk text
+        """
+        if doc_id in self.slots:
+            self.remove([doc_id])
+        
+        terms = Counter(tokenize(text))
+        slot = len(self.doc_ids)
+        length = sum(terms.values())
+        
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(length)
+        self.slots[doc_id] = slot
+        self.total_length += length
+        
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[slot] = frequency
+    
+    def add_documents(self, pairs: Iterable[Tuple[str, Any]]) -> None:
+        """
+        Index a batch of (docstore ID, document) pairs.
+        """
+        for doc_id, doc in pairs:
+            self.add(doc_id, doc.page_content)
+    
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        """
+        Remove chunks from the index.
+        
+        Args:
+            doc_ids: Docstore IDs of the chunks to remove
+        """
+        removed = set()
+        for doc_id in doc_ids:
+            slot = self.slots.pop(doc_id, None)
+            if slot is None:
+                continue
+            self.total_length -= self.doc_lengths[slot]
+            self.doc_ids[slot] = None
+            self.doc_lengths[slot] = 0
+            removed.add(slot)
+        
+        if not removed:
+            return
+        
+        for term in list(self.postings):
+            postings = self.postings[term]
+            for slot in removed.intersection(postings):
+                del postings[slot]
+            if not postings:
+                del self.postings[term]
+        
+        if len(self.slots) * 2 < len(self.doc_ids):
+            self._compact()
+    
+    def _compact(self) -> None:
+        remap = {}
+        doc_ids, doc_lengths = [], []
+        for slot, doc_id in enumerate(self.doc_ids):
+            if doc_id is not None:
+                remap[slot] = len(doc_ids)
+                doc_ids.append(doc_id)
+                doc_lengths.append(self.doc_lengths[slot])
+        
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.slots = {doc_id: slot for slot, doc_id in enumerate(doc_ids)}
+        self.postings = {
+            term: {remap[slot]: frequency for slot, frequency in postings.items()}
+            for term, postings in self.postings.items()
+        }
+    
+    def search(self, query: str, k: int = TOP_K_RESULTS) -> List[Tuple[str, float]]:
+        """
+        Rank chunks by BM25 score for a query.
+        
+        Args:
+            query: Keyword query
+            k: Number of results
+            
+        Returns:
+            List of (docstore ID, score) pairs, best first
+        """
+        num_docs = len(self.slots)
+        if not num_docs:
+            return []
+        
+        lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+        average_length = self.total_length / num_docs or 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            frequencies = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            scores[slots] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[slots])
+        
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        
+        return [(self.doc_ids[slot], float(scores[slot])) for slot in matched]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        if len(self.slots) < len(self.doc_ids):
+            self._compact()
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_lengths": self.doc_lengths,
+            "postings": {
+                term: [list(postings.keys()), list(postings.values())]
+                for term, postings in self.postings.items()
+            }
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.slots = {doc_id: slot for slot, doc_id in enumerate(index.doc_ids)}
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {
+            term: dict(zip(slots, frequencies))
+            for term, (slots, frequencies) in data["postings"].items()
+        }
+        return index
+    
+    def save(self, directory: str) -> None:
+        with open(os.path.join(directory, BM25_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+def build_keyword_index(vectorstore: FAISS) -> BM25Index:
+    """
+    Build a BM25 index over every chunk in a vector store.
+    
+    Args:
+        vectorstore: FAISS vector store
+        
+    Returns:
+        BM25 index
+    """
+    keyword_index = BM25Index()
+    for position in range(vectorstore.index.ntotal):
+        doc_id = vectorstore.index_to_docstore_id[position]
+        keyword_index.add(doc_id, vectorstore.docstore.search(doc_id).page_content)
+    return keyword_index
+
+def load_keyword_index(directory: str, vectorstore: Optional[FAISS] = None) -> Optional[BM25Index]:
+    """
+    Load the BM25 index saved with a vector store.
+    
+    Stores saved before keyword search existed have no index file; one is
+    built from the vector store's chunks if it is given.
+    
+    Args:
+        directory: Directory containing the vector store
+        vectorstore: Optional vector store to build a missing index from
+        
+    Returns:
+        BM25 index, or None if there is neither a file nor a vector store
+    """
+    path = os.path.join(directory, BM25_FILENAME)
+    
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return BM25Index.from_dict(json.load(f))
+    
+    if vectorstore is not None:
+        print(f"No keyword index in {directory}, building one from {vectorstore.index.ntotal} chunks")
+        return build_keyword_index(vectorstore)
+    
+    return None
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = HYBRID_RRF_K) -> List[str]:
+    """
+    Merge ranked ID lists by reciprocal rank fusion.
+    
+    Args:
+        rankings: Ranked lists of docstore IDs, best first
+        k: RRF constant damping the weight of top ranks
+        
+    Returns:
+        Docstore IDs ordered by fused score
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def _documents_for_ids(vectorstore: FAISS, doc_ids: List[str]) -> List:
+    documents = []
+    for doc_id in doc_ids:
+        doc = vectorstore.docstore.search(doc_id)
+        if not isinstance(doc, str):
+            documents.append(doc)
+    return documents
+
+class KeywordRetriever(BaseRetriever):
+    """
+    Retriever that ranks chunks by BM25 alone, without embedding the query.
+    """
+    
+    vectorstore: Any
+    keyword_index: Any
+    k: int = TOP_K_RESULTS
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        with metrics.span("keyword_search"):
+            doc_ids = [doc_id for doc_id, _ in self.keyword_index.search(query, self.k)]
+        return _documents_for_ids(self.vectorstore, doc_ids)
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing BM25 and vector similarity rankings with reciprocal rank fusion.
+    
+    Short queries whose terms all occur in the corpus (drug names, lab
+    abbreviations) are answered from the keyword index alone, skipping the
+    embedding call.
+    """
+    
+    vectorstore: Any
+    keyword_index: Any
+    k: int = TOP_K_RESULTS
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = HYBRID_RRF_K
+    keyword_only_max_terms: int = HYBRID_KEYWORD_ONLY_MAX_TERMS
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def is_keyword_query(self, query: str) -> bool:
+        terms = tokenize(query)
+        return 0 < len(terms) <= self.keyword_only_max_terms and all(term in self.keyword_index for term in terms)
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        with metrics.span("keyword_search"):
+            keyword_ids = [doc_id for doc_id, _ in self.keyword_index.search(query, self.fetch_k)]
+        
+        if self.is_keyword_query(query):
+            return _documents_for_ids(self.vectorstore, keyword_ids[:self.k])
+        
+        query_vector = self.vectorstore.embeddings.embed_query(query)
+        vector_ids = search_ids_by_vector(self.vectorstore, query_vector, self.fetch_k)
+        
+        fused = reciprocal_rank_fusion([vector_ids, keyword_ids], self.rrf_k)
+        return _documents_for_ids(self.vectorstore, fused[:self.k])
@@ -0,0 +1,261 @@
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from src.config import (
+    FAISS_INDEX_TYPE,
+    FAISS_IVF_NLIST,
+    FAISS_HNSW_M,
+    FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_PQ_M,
+    FAISS_PQ_NBITS,
+    FAISS_NPROBE,
+    FAISS_EF_SEARCH,
+    FAISS_TRAIN_SAMPLE_SIZE
+)
+
+INDEX_TYPES = ["flat", "ivf_flat", "hnsw", "ivf_pq", "opq_ivf_pq"]
+
+# FAISS recommends at least this many training points per IVF centroid
+_POINTS_PER_CENTROID = 39
+
+def get_nlist(num_vectors: int, nlist: int = FAISS_IVF_NLIST) -> int:
+    """
+    Choose the number of IVF cells for a corpus size.
+    
+    Args:
+        num_vectors: Number of vectors in the corpus
+        nlist: Configured upper bound on the number of cells
+        
+    Returns:
+        Number of IVF cells
+    """
+    return max(1, min(nlist, int(4 * math.sqrt(num_vectors)), num_vectors // _POINTS_PER_CENTROID))
+
+def min_training_size(index_type: str) -> int:
+    """
+    Return the smallest corpus that the index type can be trained on.
+    
+    Args:
+        index_type: One of INDEX_TYPES
+        
+    Returns:
+        Minimum number of vectors
+    """
+    if index_type in ("ivf_pq", "opq_ivf_pq"):
+        return _POINTS_PER_CENTROID * (2 ** FAISS_PQ_NBITS)
+    if index_type == "ivf_flat":
+        return _POINTS_PER_CENTROID * 16
+    return 0
+
+def get_factory_string(index_type: str, num_vectors: int) -> str:
+    """
+    Build the faiss.index_factory description for an index type.
+    
+    Args:
+        index_type: One of INDEX_TYPES
+        num_vectors: Number of vectors the index is built for
+        
+    Returns:
+        Index factory string
+    """
+    nlist = get_nlist(num_vectors)
+    
+    if index_type == "flat":
+        return "Flat"
+    elif index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    elif index_type == "hnsw":
+        return f"HNSW{FAISS_HNSW_M},Flat"
+    elif index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{FAISS_PQ_M}x{FAISS_PQ_NBITS}"
+    elif index_type == "opq_ivf_pq":
+        return f"OPQ{FAISS_PQ_M},IVF{nlist},PQ{FAISS_PQ_M}x{FAISS_PQ_NBITS}"
+        
+    raise ValueError(f"Unknown FAISS index type: {index_type}. Expected one of {INDEX_TYPES}")
+
+def set_search_params(index: faiss.Index, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH) -> faiss.Index:
+    """
+    Apply search-time parameters to an index.
+    
+    nprobe is the number of IVF cells visited per query and efSearch is the
+    HNSW candidate list size; both trade recall for latency.
+    
+    Args:
+        index: FAISS index
+        nprobe: Number of IVF cells to probe
+        ef_search: HNSW search depth
+        
+    Returns:
+        The same index
+    """
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+        
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+        
+    return index
+
+def build_faiss_index(
+    vectors: np.ndarray,
+    index_type: str = FAISS_INDEX_TYPE,
+    train_sample_size: int = FAISS_TRAIN_SAMPLE_SIZE
+) -> faiss.Index:
+    """
+    Build and populate a FAISS index of the requested type.
+    
+    Trainable indexes are trained on a random sample of the vectors. Corpora
+    too small to train the requested type fall back to a flat index.
+    
+    Args:
+        vectors: Matrix of vectors (num_vectors x dimension)
+        index_type: One of INDEX_TYPES
+        train_sample_size: Maximum number of vectors used for training
+        
+    Returns:
+        Populated FAISS index
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimension = vectors.shape
+    
+    if num_vectors < min_training_size(index_type):
+        print(f"Only {num_vectors} vectors, too few to train a {index_type} index; using flat")
+        index_type = "flat"
+        
+    index = faiss.index_factory(dimension, get_factory_string(index_type, num_vectors))
+    
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+        
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample_size = min(num_vectors, train_sample_size)
+        sample = vectors[rng.choice(num_vectors, sample_size, replace=False)]
+        index.train(sample)
+        
+    index.add(vectors)
+    
+    return set_search_params(index)
+
+def get_index_type(index: faiss.Index) -> str:
+    """
+    Infer which of INDEX_TYPES an index was built as.
+    
+    Args:
+        index: FAISS index
+        
+    Returns:
+        Index type name
+    """
+    if isinstance(index, faiss.IndexPreTransform):
+        return "opq_ivf_pq"
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+        
+    try:
+        ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+    except RuntimeError:
+        return "flat"
+        
+    return "ivf_pq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf_flat"
+
+def ensure_direct_map(index: faiss.Index) -> faiss.Index:
+    """
+    Give an IVF index the position-to-list map needed to reconstruct vectors.
+    
+    The map holds one integer per vector; indexes without inverted lists
+    are returned unchanged.
+    
+    Args:
+        index: FAISS index
+    
+    Returns:
+        The same index
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return index
+    
+    if ivf.direct_map.no():
+        ivf.make_direct_map()
+    
+    return index
+
+def reconstruct_positions(index: faiss.Index, positions: np.ndarray) -> np.ndarray:
+    """
+    Reconstruct the vectors stored at some index positions.
+    
+    Vectors from PQ indexes are approximate reconstructions.
+    
+    Args:
+        index: FAISS index (IVF indexes need ensure_direct_map first)
+        positions: Index positions
+    
+    Returns:
+        Matrix of vectors (len(positions) x dimension)
+    """
+    if len(positions) == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    
+    return index.reconstruct_batch(np.ascontiguousarray(positions, dtype=np.int64))
+
+def get_all_vectors(index: faiss.Index) -> np.ndarray:
+    """
+    Reconstruct every vector stored in an index.
+    
+    Vectors from PQ indexes are approximate reconstructions.
+    
+    Args:
+        index: FAISS index
+    
+    Returns:
+        Matrix of vectors (ntotal x dimension)
+    """
+    ensure_direct_map(index)
+    
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+        
+    return index.reconstruct_n(0, index.ntotal)
+
+def index_memory_per_vector(index: faiss.Index) -> float:
+    """
+    Estimate the resident bytes per vector of an index.
+    
+    Args:
+        index: FAISS index
+        
+    Returns:
+        Serialized index size divided by the number of vectors
+    """
+    if index.ntotal == 0:
+        return 0.0
+        
+    return faiss.serialize_index(index).nbytes / index.ntotal
+
+def rebuild_index(
+    index: faiss.Index,
+    index_type: str = FAISS_INDEX_TYPE,
+    vectors: Optional[np.ndarray] = None
+) -> faiss.Index:
+    """
+    Rebuild an index as a different type, keeping vector positions unchanged.
+    
+    Args:
+        index: Existing FAISS index
+        index_type: One of INDEX_TYPES
+        vectors: Optional original vectors (reconstructed from index if omitted)
+        
+    Returns:
+        New populated FAISS index
+    """
+    if vectors is None:
+        vectors = get_all_vectors(index)
+        
+    return build_faiss_index(vectors, index_type)
@@ -0,0 +1,301 @@
+import os
+import json
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import BaseRetriever
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain_community.vectorstores import FAISS
+
+from src.rag.batching import documents_for_positions
+from src.rag.faiss_index import ensure_direct_map
+from src.utils import metrics
+from src.config import TOP_K_RESULTS, FILTER_SCAN_MAX
+
+FILTERS_FILENAME = "filters.json"
+PAGES_FILENAME = "filters.pages.npy"
+
+def to_ranges(positions: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Compress sorted index positions into half-open [start, end) runs.
+    
+    Args:
+        positions: Sorted, unique index positions
+        
+    Returns:
+        List of (start, end) ranges
+    """
+    if len(positions) == 0:
+        return []
+    
+    breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(positions)]))
+    return [(int(positions[s]), int(positions[e - 1]) + 1) for s, e in zip(starts, ends)]
+
+def from_ranges(ranges: Iterable[Tuple[int, int]]) -> np.ndarray:
+    """
+    Expand [start, end) ranges into an array of index positions.
+    """
+    ranges = list(ranges)
+    if not ranges:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges])
+
+class MetadataFilterIndex:
+    """
+    Index positions of chunks grouped by document, source file and header.
+    
+    Chunks of one document are added together, so each document maps to a
+    few position ranges. A deduplicated chunk is also listed under the
+    documents and sources of its duplicates. Pages are kept as an array
+    aligned with index positions so page ranges can be applied with a
+    vectorized comparison.
+    """
+    
+    def __init__(
+        self,
+        documents: Dict[str, List[Tuple[int, int]]],
+        sources: Dict[str, List[Tuple[int, int]]],
+        headers: Dict[str, List[Tuple[int, int]]],
+        pages: np.ndarray
+    ):
+        self.documents = documents
+        self.sources = sources
+        self.headers = headers
+        self.pages = pages
+    
+    def __len__(self) -> int:
+        return len(self.pages)
+    
+    @classmethod
+    def build(cls, vectorstore: FAISS, deduplicator=None) -> "MetadataFilterIndex":
+        """
+        Build the filter index from the metadata of every chunk in a vector store.
+        
+        Args:
+            vectorstore: FAISS vector store
+            deduplicator: Optional chunk deduplicator listing every duplicate
+                of each chunk (otherwise the duplicate_sources kept in the
+                chunk metadata are used)
+            
+        Returns:
+            Metadata filter index
+        """
+        num_chunks = vectorstore.index.ntotal
+        groups = {"documents": {}, "sources": {}, "headers": {}}
+        pages = np.full(num_chunks, -1, dtype=np.int32)
+        
+        for position in range(num_chunks):
+            chunk_id = vectorstore.index_to_docstore_id[position]
+            metadata = vectorstore.docstore.search(chunk_id).metadata
+            if deduplicator is not None:
+                duplicates = [entry["metadata"] for entry in deduplicator.duplicates.get(chunk_id, [])]
+            else:
+                duplicates = metadata.get("duplicate_sources", [])
+            
+            sources = {str(reference.get("source", "")) for reference in [metadata] + duplicates}
+            doc_ids = {reference.get("doc_id") or str(reference.get("source", "")) for reference in [metadata] + duplicates}
+            for doc_id in doc_ids:
+                groups["documents"].setdefault(doc_id, []).append(position)
+            for source in sources:
+                groups["sources"].setdefault(source, []).append(position)
+            headers = set(metadata.get("detected_headers", []))
+            if metadata.get("section"):
+                headers.add(metadata["section"])
+            for header in headers:
+                groups["headers"].setdefault(header, []).append(position)
+            
+            page = metadata.get("page")
+            if isinstance(page, int):
+                pages[position] = page
+        
+        ranges = {
+            name: {key: to_ranges(np.asarray(positions, dtype=np.int64)) for key, positions in group.items()}
+            for name, group in groups.items()
+        }
+        return cls(ranges["documents"], ranges["sources"], ranges["headers"], pages)
+    
+    def save(self, directory: str) -> None:
+        with open(os.path.join(directory, FILTERS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents, "sources": self.sources, "headers": self.headers}, f)
+        np.save(os.path.join(directory, PAGES_FILENAME), self.pages)
+    
+    @classmethod
+    def load(cls, directory: str) -> "MetadataFilterIndex":
+        with open(os.path.join(directory, FILTERS_FILENAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        
+        def as_tuples(group):
+            return {key: [tuple(r) for r in ranges] for key, ranges in group.items()}
+        
+        pages = np.load(os.path.join(directory, PAGES_FILENAME))
+        return cls(as_tuples(data["documents"]), as_tuples(data["sources"]), as_tuples(data["headers"]), pages)
+    
+    def _union(self, group: Dict[str, List[Tuple[int, int]]], keys: Iterable[str]) -> np.ndarray:
+        ranges = [r for key in keys for r in group.get(key, [])]
+        return np.unique(from_ranges(ranges))
+    
+    def select(
+        self,
+        doc_ids: Optional[List[str]] = None,
+        sources: Optional[List[str]] = None,
+        page_range: Optional[Tuple[int, int]] = None,
+        headers: Optional[List[str]] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Resolve a metadata filter to the index positions it allows.
+        
+        Criteria are combined with AND; values within one criterion with OR.
+        
+        Args:
+            doc_ids: Document IDs (content hashes) to search
+            sources: Source file paths to search
+            page_range: Inclusive (first, last) page numbers
+            headers: Detected section headers to search
+            
+        Returns:
+            Sorted array of allowed positions, or None if no filter was given
+        """
+        positions = None
+        
+        for group, keys in ((self.documents, doc_ids), (self.sources, sources), (self.headers, headers)):
+            if keys:
+                allowed = self._union(group, keys)
+                positions = allowed if positions is None else np.intersect1d(positions, allowed, assume_unique=True)
+        
+        if page_range is not None:
+            first, last = page_range
+            if positions is None:
+                positions = np.arange(len(self.pages), dtype=np.int64)
+            page_numbers = self.pages[positions]
+            positions = positions[(page_numbers >= first) & (page_numbers <= last)]
+        
+        return positions
+
+def load_filter_index(directory: str, vectorstore: Optional[FAISS] = None) -> Optional[MetadataFilterIndex]:
+    """
+    Load the filter index saved with a vector store.
+    
+    Stores saved before filtering existed are indexed from the vector
+    store's chunks if it is given.
+    
+    Args:
+        directory: Directory containing the vector store
+        vectorstore: Optional vector store to build a missing index from
+        
+    Returns:
+        Metadata filter index, or None if there is neither a file nor a vector store
+    """
+    if os.path.exists(os.path.join(directory, FILTERS_FILENAME)):
+        return MetadataFilterIndex.load(directory)
+    
+    if vectorstore is not None:
+        return MetadataFilterIndex.build(vectorstore)
+    
+    return None
+
+def _scan_subset(index: faiss.Index, query: np.ndarray, positions: np.ndarray, k: int) -> np.ndarray:
+    """
+    Exact search over a subset of positions, reading the vectors range by range.
+    
+    IVF indexes need a direct map, which is built with the retriever rather
+    than here: building it mutates the index under concurrent searches.
+    """
+    vectors = np.vstack([index.reconstruct_n(start, end - start) for start, end in to_ranges(positions)])
+    
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        distances = -(vectors @ query)
+    else:
+        distances = ((vectors - query) ** 2).sum(axis=1)
+    
+    if len(distances) > k:
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best], kind="stable")]
+    else:
+        best = np.argsort(distances, kind="stable")
+    
+    return positions[best]
+
+def _search_parameters(index: faiss.Index, selector) -> faiss.SearchParameters:
+    # Search parameters replace the index's own settings, so carry those over
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    
+    try:
+        nprobe = faiss.extract_index_ivf(index).nprobe
+    except RuntimeError:
+        return faiss.SearchParameters(sel=selector)
+    return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+
+def filtered_search(
+    vectorstore: FAISS,
+    query_vector: List[float],
+    positions: np.ndarray,
+    k: int = TOP_K_RESULTS,
+    scan_max: int = FILTER_SCAN_MAX
+) -> np.ndarray:
+    """
+    Find the nearest chunks to a query among the allowed index positions.
+    
+    Small scopes are scanned directly, which costs time proportional to the
+    scope rather than the corpus. Larger scopes, and IVF indexes without a
+    direct map, are searched with an ID selector applied inside FAISS, so
+    disallowed chunks are never ranked.
+    
+    Args:
+        vectorstore: FAISS vector store
+        query_vector: Query embedding
+        positions: Sorted index positions allowed by the filter
+        k: Number of results
+        scan_max: Largest scope searched by a direct scan
+        
+    Returns:
+        Index positions of the nearest allowed chunks
+    """
+    if len(positions) == 0:
+        return positions
+    
+    vector = np.asarray([query_vector], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vector)
+    index = vectorstore.index
+    
+    if len(positions) <= scan_max:
+        try:
+            return _scan_subset(index, vector[0], positions, k)
+        except RuntimeError:
+            pass
+    
+    ranges = to_ranges(positions)
+    if len(ranges) == 1:
+        selector = faiss.IDSelectorRange(ranges[0][0], ranges[0][1])
+    else:
+        selector = faiss.IDSelectorBatch(len(positions), faiss.swig_ptr(np.ascontiguousarray(positions, dtype=np.int64)))
+    
+    _, indices = index.search(vector, k, params=_search_parameters(index, selector))
+    return indices[0][indices[0] != -1]
+
+class FilteredRetriever(BaseRetriever):
+    """
+    Retriever restricted to the chunks allowed by a metadata filter.
+    """
+    
+    vectorstore: Any
+    positions: Any
+    k: int = TOP_K_RESULTS
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Built before the first query, so concurrent queries never modify the index
+        ensure_direct_map(self.vectorstore.index)
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        query_vector = self.vectorstore.embeddings.embed_query(query)
+        with metrics.span("filtered_search"):
+            positions = filtered_search(self.vectorstore, query_vector, self.positions, self.k)
+        return documents_for_positions(self.vectorstore, positions)
@@ -0,0 +1,294 @@
+import os
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+
+from src.document_processing.pipeline import iter_processed_chunks, batched
+from src.document_processing.dedup import ChunkDeduplicator, load_deduplicator
+from src.rag.bm25 import BM25Index, load_keyword_index
+from src.rag.faiss_index import get_index_type
+from src.rag.vectorstore import (
+    save_vectorstore,
+    load_vectorstore,
+    load_manifest,
+    is_embedding_stale,
+    reembed_vectorstore,
+    write_to_vectorstore,
+    add_documents_to_vectorstore,
+    apply_index_type,
+    delete_documents_from_vectorstore
+)
+from src.utils import metrics
+from src.config import VECTOR_STORE_PATH, INGEST_BATCH_SIZE, DEDUP_ENABLED
+
+def compute_file_hash(file_path: str) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Hex digest used as the document ID
+    """
+    sha256 = hashlib.sha256()
+    
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    
+    return sha256.hexdigest()
+
+def reindex_if_stale(directory: str = VECTOR_STORE_PATH) -> bool:
+    """
+    Re-embed the saved vector store if it was built with another embedding model.
+    
+    Switching EMBEDDING_PROVIDER (or its model) changes the embedding space
+    and usually the dimension, so old vectors cannot be searched or extended.
+    The store is re-embedded from its stored chunks and saved atomically.
+    
+    Args:
+        directory: Directory containing the vector store
+    
+    Returns:
+        True if the store was re-embedded
+    """
+    manifest = load_manifest(directory)
+    if not manifest["documents"] or not is_embedding_stale(manifest):
+        return False
+    
+    print(f"Re-embedding vector store in {directory} built with {manifest.get('embedding', 'the legacy model')}")
+    vectorstore = load_vectorstore(directory)
+    keyword_index = load_keyword_index(directory, vectorstore)
+    deduplicator = load_deduplicator(directory, vectorstore) if DEDUP_ENABLED else None
+    
+    with metrics.span("reindex"):
+        vectorstore = reembed_vectorstore(vectorstore)
+    if vectorstore is None:
+        return False
+    
+    manifest["version"] += 1
+    save_vectorstore(vectorstore, directory, manifest, keyword_index, deduplicator)
+    return True
+
+def _load_existing(directory: str) -> Tuple[Optional[FAISS], Dict[str, Any], BM25Index, Optional[ChunkDeduplicator]]:
+    reindex_if_stale(directory)
+    manifest = load_manifest(directory)
+    
+    # A stale store that held no chunks to re-embed is replaced by the next save
+    if is_embedding_stale(manifest):
+        return None, {"version": manifest["version"], "documents": {}}, BM25Index(), _new_deduplicator()
+    
+    if os.path.isdir(directory) and os.path.exists(os.path.join(directory, "index.faiss")):
+        vectorstore = load_vectorstore(directory)
+        deduplicator = load_deduplicator(directory, vectorstore) if DEDUP_ENABLED else None
+        return vectorstore, manifest, load_keyword_index(directory, vectorstore), deduplicator
+    
+    return None, {"version": 0, "documents": {}}, BM25Index(), _new_deduplicator()
+
+def _new_deduplicator() -> Optional[ChunkDeduplicator]:
+    return ChunkDeduplicator() if DEDUP_ENABLED else None
+
+def _update_duplicate_sources(vectorstore: FAISS, deduplicator: ChunkDeduplicator, chunk_ids) -> None:
+    # Docstore documents are updated in place and written out with the next save
+    for chunk_id in chunk_ids:
+        doc = vectorstore.docstore.search(chunk_id)
+        if isinstance(doc, str):
+            continue
+        if chunk_id in deduplicator.duplicates:
+            doc.metadata.update(deduplicator.source_metadata(chunk_id))
+        else:
+            doc.metadata.pop("duplicate_sources", None)
+            doc.metadata.pop("duplicate_count", None)
+
+def _remove_chunks(
+    vectorstore: FAISS,
+    manifest: Dict[str, Any],
+    keyword_index: BM25Index,
+    deduplicator: Optional[ChunkDeduplicator],
+    doc_id: str,
+    chunk_ids: List[str]
+) -> None:
+    orphaned, changed = {}, []
+    if deduplicator is not None:
+        orphaned, changed = deduplicator.remove_document(doc_id, chunk_ids)
+    texts = {chunk_id: vectorstore.docstore.search(chunk_id).page_content for chunk_id in orphaned}
+    
+    delete_documents_from_vectorstore(vectorstore, chunk_ids)
+    keyword_index.remove(chunk_ids)
+    _update_duplicate_sources(vectorstore, deduplicator, changed)
+    
+    # Duplicates from other documents take over the chunks that were stored only once
+    ids, documents = [], []
+    for canonical_id, entries in orphaned.items():
+        chunk_id, text, metadata = deduplicator.promote(canonical_id, texts[canonical_id], entries)
+        ids.append(chunk_id)
+        documents.append(Document(page_content=text, metadata=metadata))
+        keyword_index.add(chunk_id, text)
+        if metadata.get("doc_id") in manifest["documents"]:
+            manifest["documents"][metadata["doc_id"]]["chunk_ids"].append(chunk_id)
+    
+    if documents:
+        add_documents_to_vectorstore(vectorstore, documents, ids=ids)
+
+def _add_files(
+    vectorstore: Optional[FAISS],
+    manifest: Dict[str, Any],
+    keyword_index: BM25Index,
+    deduplicator: Optional[ChunkDeduplicator],
+    file_paths: List[str],
+    names: Dict[str, str]
+) -> Tuple[Optional[FAISS], Dict[str, Any]]:
+    summary = {"added": [], "skipped": [], "failed": [], "chunks": 0, "duplicates": 0}
+    new_files = {}
+    
+    for file_path in file_paths:
+        name = names.get(file_path, os.path.basename(file_path))
+        if not os.path.exists(file_path):
+            summary["failed"].append(name)
+            continue
+        
+        doc_id = compute_file_hash(file_path)
+        if doc_id in manifest["documents"] or doc_id in new_files.values():
+            summary["skipped"].append(name)
+            continue
+        
+        new_files[file_path] = doc_id
+    
+    if not new_files:
+        return vectorstore, summary
+    
+    chunk_ids = {file_path: [] for file_path in new_files}
+    chunk_counts = {file_path: 0 for file_path in new_files}
+    canonical_ids = set()
+    failed_files = set()
+    
+    def identified_chunks():
+        # Page ranges arrive in input order, so chunk IDs are deterministic
+        for (file_path, _), chunks in iter_processed_chunks(list(new_files)):
+            if chunks is None:
+                failed_files.add(file_path)
+            if file_path in failed_files:
+                continue
+            doc_id = new_files[file_path]
+            for chunk in chunks:
+                chunk.metadata["doc_id"] = doc_id
+                chunk.metadata["chunk_index"] = chunk_counts[file_path]
+                chunk_counts[file_path] += 1
+                chunk_id = f"{doc_id}:{chunk.metadata['chunk_index']}"
+                
+                # Duplicates are recorded against their canonical chunk instead of being embedded
+                if deduplicator is not None:
+                    canonical_id = deduplicator.check(chunk_id, chunk.page_content, chunk.metadata)
+                    if canonical_id is not None:
+                        canonical_ids.add(canonical_id)
+                        summary["duplicates"] += 1
+                        continue
+                
+                chunk_ids[file_path].append(chunk_id)
+                keyword_index.add(chunk_id, chunk.page_content)
+                yield chunk_id, chunk
+    
+    # Stream chunks from the process pool into the index in bounded batches
+    vectorstore = write_to_vectorstore(batched(identified_chunks(), INGEST_BATCH_SIZE), vectorstore)
+    if canonical_ids:
+        _update_duplicate_sources(vectorstore, deduplicator, canonical_ids)
+    metrics.increment("duplicate_chunks_total", summary["duplicates"])
+    
+    for file_path, doc_id in new_files.items():
+        if file_path in failed_files or not chunk_counts[file_path]:
+            continue
+        
+        manifest["documents"][doc_id] = {
+            "name": names.get(file_path, os.path.basename(file_path)),
+            "source": file_path,
+            "chunk_ids": chunk_ids[file_path],
+            "chunks": chunk_counts[file_path],
+            "added_at": datetime.now().isoformat(timespec="seconds")
+        }
+    
+    # Pages indexed before a file failed are taken out again, so no document is left partially indexed
+    if vectorstore is not None:
+        for file_path in failed_files:
+            _remove_chunks(vectorstore, manifest, keyword_index, deduplicator, new_files[file_path], chunk_ids[file_path])
+    
+    for file_path, doc_id in new_files.items():
+        name = names.get(file_path, os.path.basename(file_path))
+        if doc_id not in manifest["documents"]:
+            summary["failed"].append(name)
+            continue
+        
+        summary["added"].append(name)
+        summary["chunks"] += len(manifest["documents"][doc_id]["chunk_ids"])
+    
+    return vectorstore, summary
+
+def index_files(
+    file_paths: List[str],
+    directory: str = VECTOR_STORE_PATH,
+    names: Optional[Dict[str, str]] = None
+) -> Tuple[Optional[FAISS], Dict[str, Any]]:
+    """
+    Incrementally add PDF files to the on-disk vector store.
+    
+    Files whose content hash is already indexed are skipped, so only new
+    pages are embedded. Chunks duplicating an indexed chunk are not embedded
+    again; the canonical chunk lists their sources instead. The BM25 keyword
+    index is updated in the same pass and the updated store is saved atomically.
+    
+    Args:
+        file_paths: Paths to PDF files
+        directory: Directory containing the vector store
+        names: Optional mapping of file path to display name
+        
+    Returns:
+        Tuple of (vector store, summary of added, skipped and failed files)
+    """
+    vectorstore, manifest, keyword_index, deduplicator = _load_existing(directory)
+    with metrics.span("index_files"):
+        vectorstore, summary = _add_files(vectorstore, manifest, keyword_index, deduplicator, file_paths, names or {})
+    metrics.increment("chunks_indexed_total", summary["chunks"])
+    
+    if summary["added"]:
+        apply_index_type(vectorstore)
+        manifest["version"] += 1
+        with metrics.span("save_index"):
+            save_vectorstore(vectorstore, directory, manifest, keyword_index, deduplicator)
+
+    return vectorstore, summary
+
+def delete_document(doc_id: str, directory: str = VECTOR_STORE_PATH) -> FAISS:
+    """
+    Remove a document and all of its chunks from the on-disk vector store.
+    
+    Chunks of other documents that were deduplicated against the removed
+    chunks are stored in their place. Stores saved as HNSW indexes do not
+    support removal.
+    
+    Args:
+        doc_id: Document ID (content hash) to delete
+        directory: Directory containing the vector store
+        
+    Returns:
+        Updated FAISS vector store
+    """
+    vectorstore, manifest, keyword_index, deduplicator = _load_existing(directory)
+    
+    if vectorstore is None or doc_id not in manifest["documents"]:
+        raise KeyError(f"Document {doc_id} is not indexed")
+    if get_index_type(vectorstore.index) == "hnsw":
+        raise ValueError(
+            "Documents cannot be removed from an HNSW index; "
+            "rebuild the vector store with another FAISS_INDEX_TYPE to remove documents"
+        )
+    
+    entry = manifest["documents"].pop(doc_id)
+    _remove_chunks(vectorstore, manifest, keyword_index, deduplicator, doc_id, entry["chunk_ids"])
+    
+    manifest["version"] += 1
+    save_vectorstore(vectorstore, directory, manifest, keyword_index, deduplicator)
+    
+    return vectorstore
@@ -0,0 +1,207 @@
+import os
+import json
+import hashlib
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator, Union
+
+import faiss
+import numpy as np
+from langchain.docstore.base import Docstore
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.schema import Document
+
+INDEX_FILENAME = "index.faiss"
+DOCS_FILENAME = "docs.bin"
+DOCS_OFFSETS_FILENAME = "docs.offsets.npy"
+ID_HASHES_FILENAME = "ids.hashes.npy"
+ID_POSITIONS_FILENAME = "ids.positions.npy"
+
+def _hash_id(doc_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+def has_mmap_layout(directory: str) -> bool:
+    """
+    Check whether a directory contains a vector store in the memory-mapped layout.
+    
+    Args:
+        directory: Directory containing the vector store
+        
+    Returns:
+        True if the chunk record files are present
+    """
+    return os.path.exists(os.path.join(directory, DOCS_OFFSETS_FILENAME))
+
+def write_mmap_layout(index: faiss.Index, docstore, index_to_docstore_id: Dict[int, str], directory: str) -> None:
+    """
+    Write an index and its chunks in the memory-mapped layout.
+    
+    Chunks are stored as JSON records in one data file, addressed by an
+    offsets array in index position order. A sorted table of ID hashes maps
+    docstore IDs back to positions.
+    
+    Args:
+        index: FAISS index
+        docstore: Docstore holding the chunk documents
+        index_to_docstore_id: Mapping of index position to docstore ID
+        directory: Directory to write to
+    """
+    faiss.write_index(index, os.path.join(directory, INDEX_FILENAME))
+    
+    num_docs = len(index_to_docstore_id)
+    offsets = np.zeros(num_docs + 1, dtype=np.int64)
+    hashes = np.zeros(num_docs, dtype=np.uint64)
+    
+    with open(os.path.join(directory, DOCS_FILENAME), "wb") as f:
+        for position in range(num_docs):
+            doc_id = index_to_docstore_id[position]
+            doc = docstore.search(doc_id)
+            record = json.dumps(
+                {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False
+            ).encode("utf-8")
+            f.write(record)
+            offsets[position + 1] = offsets[position] + len(record)
+            hashes[position] = _hash_id(doc_id)
+            
+    order = np.argsort(hashes, kind="stable")
+    np.save(os.path.join(directory, DOCS_OFFSETS_FILENAME), offsets)
+    np.save(os.path.join(directory, ID_HASHES_FILENAME), hashes[order])
+    np.save(os.path.join(directory, ID_POSITIONS_FILENAME), order.astype(np.int64))
+
+def read_index_mmap(directory: str) -> faiss.Index:
+    """
+    Open a FAISS index memory-mapped and read-only.
+    
+    Pages of the mapped file live in the OS page cache and are shared by all
+    processes that open the same index. Without IO_FLAG_MMAP_IFC (faiss < 1.11)
+    only the inverted lists of IVF indexes are mapped, and flat and HNSW
+    indexes are read fully into memory. Index types that cannot be mapped are
+    read into memory as usual.
+    
+    Args:
+        directory: Directory containing the index
+        
+    Returns:
+        FAISS index
+    """
+    path = os.path.join(directory, INDEX_FILENAME)
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        flags |= faiss.IO_FLAG_MMAP_IFC
+    else:
+        print(f"Warning: faiss {faiss.__version__} cannot memory-map flat or HNSW indexes; only IVF inverted lists are mapped")
+    
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+class ChunkRecords:
+    """
+    Random access to the chunk records of a memory-mapped vector store.
+    """
+    
+    def __init__(self, directory: str):
+        self.offsets = np.load(os.path.join(directory, DOCS_OFFSETS_FILENAME), mmap_mode="r")
+        self.id_hashes = np.load(os.path.join(directory, ID_HASHES_FILENAME), mmap_mode="r")
+        self.id_positions = np.load(os.path.join(directory, ID_POSITIONS_FILENAME), mmap_mode="r")
+        
+        # np.memmap cannot map an empty file
+        if self.offsets[-1] > 0:
+            self.data = np.memmap(os.path.join(directory, DOCS_FILENAME), dtype=np.uint8, mode="r")
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+            
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+        
+    def record(self, position: int) -> Dict[str, Any]:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self.data[start:end].tobytes().decode("utf-8"))
+        
+    def document(self, position: int) -> Document:
+        record = self.record(position)
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+        
+    def position(self, doc_id: str) -> int:
+        """
+        Find the index position of a docstore ID, or -1 if it is not stored.
+        """
+        target = np.uint64(_hash_id(doc_id))
+        i = int(np.searchsorted(self.id_hashes, target))
+        
+        # Walk the (rare) run of equal hashes and confirm the full ID
+        while i < len(self.id_hashes) and self.id_hashes[i] == target:
+            position = int(self.id_positions[i])
+            if self.record(position)["id"] == doc_id:
+                return position
+            i += 1
+            
+        return -1
+
+class LazyDocstore(Docstore):
+    """
+    Read-only docstore that reads chunk records from disk on demand.
+    """
+    
+    def __init__(self, records: ChunkRecords):
+        self.records = records
+        
+    def search(self, search: str) -> Union[str, Document]:
+        position = self.records.position(search)
+        if position < 0:
+            return f"ID {search} not found."
+        return self.records.document(position)
+        
+    def get_by_position(self, position: int) -> Document:
+        return self.records.document(position)
+
+class LazyIndexToDocstoreId(Mapping):
+    """
+    Read-only mapping of index position to docstore ID backed by the chunk records.
+    """
+    
+    def __init__(self, records: ChunkRecords):
+        self.records = records
+        
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self.records):
+            raise KeyError(position)
+        return self.records.record(position)["id"]
+        
+    def __len__(self) -> int:
+        return len(self.records)
+        
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.records)))
+
+def load_mmap_components(directory: str, read_only: bool = True):
+    """
+    Load the index, docstore and ID mapping of a memory-mapped vector store.
+    
+    Read-only loads map the index and read chunks lazily, so start-up time
+    does not depend on corpus size. Writable loads read everything into
+    memory so documents can be added and deleted.
+    
+    Args:
+        directory: Directory containing the vector store
+        read_only: Whether to open the store lazily and read-only
+        
+    Returns:
+        Tuple of (index, docstore, index_to_docstore_id)
+    """
+    records = ChunkRecords(directory)
+    
+    if read_only:
+        return read_index_mmap(directory), LazyDocstore(records), LazyIndexToDocstoreId(records)
+        
+    index = faiss.read_index(os.path.join(directory, INDEX_FILENAME))
+    index_to_docstore_id = {}
+    documents = {}
+    
+    for position in range(len(records)):
+        record = records.record(position)
+        index_to_docstore_id[position] = record["id"]
+        documents[record["id"]] = Document(page_content=record["page_content"], metadata=record["metadata"])
+        
+    return index, InMemoryDocstore(documents), index_to_docstore_id
@@ -0,0 +1,195 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.rag.bm25 import tokenize
+from src.utils import metrics
+from src.config import (
+    RERANKER,
+    RERANK_MODEL,
+    RERANK_TOP_N,
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_MAX_ENTRIES
+)
+
+# Saturation of repeated query terms in a chunk, as in BM25
+_TERM_FREQUENCY_K = 1.2
+
+class LexicalScorer:
+    """
+    Model-free relevance scorer based on query term coverage and phrase matches.
+    
+    A chunk scores higher the more distinct query terms it contains, the
+    more query bigrams it contains in order, and (with diminishing returns)
+    the more often the terms occur. Scores depend only on the query and the
+    chunk, so they can be cached per pair.
+    """
+    
+    name = "lexical"
+    
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        query_terms = tokenize(query)
+        if not query_terms:
+            return np.zeros(len(texts), dtype=np.float32)
+        
+        distinct_terms = set(query_terms)
+        query_bigrams = set(zip(query_terms, query_terms[1:]))
+        scores = np.zeros(len(texts), dtype=np.float32)
+        
+        for i, text in enumerate(texts):
+            terms = tokenize(text)
+            counts: Dict[str, int] = {}
+            for term in terms:
+                if term in distinct_terms:
+                    counts[term] = counts.get(term, 0) + 1
+            if not counts:
+                continue
+            
+            coverage = len(counts) / len(distinct_terms)
+            saturation = sum(count / (count + _TERM_FREQUENCY_K) for count in counts.values()) / len(distinct_terms)
+            phrases = len(query_bigrams & set(zip(terms, terms[1:]))) / len(query_bigrams) if query_bigrams else 0.0
+            scores[i] = coverage + 0.5 * phrases + 0.25 * saturation
+        
+        return scores
+
+class CrossEncoderScorer:
+    """
+    Cross-encoder relevance model run locally on the CPU.
+    
+    The model is loaded once when the scorer is created; requires the
+    optional sentence-transformers package.
+    """
+    
+    def __init__(self, model: str = RERANK_MODEL, batch_size: int = RERANK_BATCH_SIZE):
+        from sentence_transformers import CrossEncoder
+        
+        self.name = model
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model, device="cpu")
+    
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        scores = self.model.predict([(query, text) for text in texts], batch_size=self.batch_size)
+        return np.asarray(scores, dtype=np.float32)
+
+class ScoreCache:
+    """
+    Thread-safe LRU cache of relevance scores per (query, chunk) pair.
+    """
+    
+    def __init__(self, max_entries: int = RERANK_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys: List[Tuple[str, str]]) -> List[Optional[float]]:
+        with self._lock:
+            scores = []
+            for key in keys:
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                scores.append(score)
+            found = sum(score is not None for score in scores)
+            self.hits += found
+            self.misses += len(keys) - found
+        return scores
+    
+    def put_many(self, entries: Dict[Tuple[str, str], float]) -> None:
+        with self._lock:
+            self._entries.update(entries)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+def _chunk_key(doc) -> str:
+    # Indexed chunks have stable IDs; anything else is keyed by its content
+    doc_id, chunk_index = doc.metadata.get("doc_id"), doc.metadata.get("chunk_index")
+    if doc_id is not None and chunk_index is not None:
+        return f"{doc_id}:{chunk_index}"
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+class Reranker:
+    """
+    Re-score retrieved chunks against the query and keep the best few.
+    
+    Chunks without a cached score are scored in batches of batch_size;
+    ties keep the retrieval order.
+    """
+    
+    def __init__(self, scorer, batch_size: int = RERANK_BATCH_SIZE, cache: Optional[ScoreCache] = None):
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else ScoreCache()
+    
+    def score(self, query: str, docs: List) -> np.ndarray:
+        """
+        Score documents against a query, using cached scores where available.
+        
+        Args:
+            query: User query
+            docs: Candidate documents
+            
+        Returns:
+            Relevance score of each document
+        """
+        query_key = f"{self.scorer.name}\0{' '.join(query.lower().split())}"
+        keys = [(query_key, _chunk_key(doc)) for doc in docs]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, score in enumerate(cached) if score is None]
+        metrics.increment("rerank_cache_total", len(docs) - len(missing), result="hit")
+        metrics.increment("rerank_cache_total", len(missing), result="miss")
+        
+        scores = np.array([0.0 if score is None else score for score in cached], dtype=np.float32)
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            scores[batch] = self.scorer.score(query, [docs[i].page_content for i in batch])
+        
+        if missing:
+            self.cache.put_many({keys[i]: float(scores[i]) for i in missing})
+        
+        return scores
+    
+    def rerank(self, query: str, docs: List, top_n: int = RERANK_TOP_N) -> List:
+        """
+        Order documents by relevance to the query and keep the top_n best.
+        
+        Args:
+            query: User query
+            docs: Candidate documents in retrieval order
+            top_n: Number of documents to keep
+            
+        Returns:
+            The top_n most relevant documents, best first
+        """
+        if not docs:
+            return docs
+        
+        with metrics.span("rerank"):
+            scores = self.score(query, docs)
+            order = np.argsort(-scores, kind="stable")[:top_n]
+        
+        return [docs[i] for i in order]
+
+def create_reranker(kind: str = RERANKER) -> Reranker:
+    """
+    Create the re-ranker selected in the configuration.
+    
+    Args:
+        kind: "cross_encoder" or "lexical"
+        
+    Returns:
+        Re-ranker (lexical if the cross-encoder cannot be loaded)
+    """
+    if kind == "cross_encoder":
+        try:
+            return Reranker(CrossEncoderScorer())
+        except Exception as e:
+            print(f"Could not load cross-encoder {RERANK_MODEL}, using lexical re-ranking: {str(e)}")
+    elif kind != "lexical":
+        raise ValueError(f"Unknown reranker: {kind}")
+    
+    return Reranker(LexicalScorer())
@@ -1,21 +1,47 @@
+import time
+import asyncio
+import threading
+from collections import defaultdict
 from typing import List, Dict, Any
+
+import faiss
+import numpy as np
+from langchain.schema import BaseRetriever
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
 from langchain_community.vectorstores import FAISS
 
-from src.config import TOP_K_RESULTS
+from src.rag.batching import MicroBatchSearcher, MicroBatchRetriever, documents_for_positions
+from src.rag.bm25 import HybridRetriever, KeywordRetriever
+from src.rag.faiss_index import ensure_direct_map, reconstruct_positions
+from src.rag.reranker import create_reranker
+from src.utils import metrics
+from src.config import (
+    TOP_K_RESULTS,
+    RETRIEVER_TYPE,
+    RETRIEVAL_MICRO_BATCHING,
+    MMR_FETCH_K,
+    MMR_LAMBDA,
+    HYBRID_FETCH_K,
+    NEIGHBOR_WINDOW,
+    RERANK_ENABLED,
+    RERANK_FETCH_K,
+    RERANK_TOP_N
+)
 
-def create_retriever(vectorstore: FAISS):
+def create_retriever(vectorstore: FAISS, k: int = TOP_K_RESULTS):
     """
     Create a document retriever from a vector store.
     
     Args:
         vectorstore: FAISS vector store
-        
+        k: Number of documents to return
+    
     Returns:
         Document retriever
     """
     retriever = vectorstore.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": TOP_K_RESULTS}
+        search_kwargs={"k": k}
     )
     
     return retriever
@@ -56,23 +82,377 @@ def get_document_sources(documents: List) -> List[Dict[str, Any]]:
     
     return sources
 
-def create_mmr_retriever(vectorstore: FAISS):
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize the rows of a matrix.
+    
+    Args:
+        vectors: Matrix of vectors
+        
+    Returns:
+        float32 matrix of unit-length rows (zero rows stay zero)
+    """
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def rerank_by_similarity(query_vector: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Order candidates by exact cosine similarity to the query.
+    
+    Args:
+        query_vector: Normalized query vector
+        candidates: Normalized candidate vectors (one per row)
+        
+    Returns:
+        Candidate row indices, most similar first
+    """
+    return np.argsort(-(candidates @ query_vector), kind="stable")
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray,
+    candidates: np.ndarray,
+    k: int = TOP_K_RESULTS,
+    lambda_mult: float = MMR_LAMBDA
+) -> List[int]:
+    """
+    Select a relevant and diverse subset of candidates.
+    
+    Relevance is one matrix-vector product. Each greedy step computes the
+    similarities to the newly selected candidate only and folds them into a
+    running maximum, so the whole selection costs O(k * fetch_k * dimension)
+    instead of building the full fetch_k x fetch_k similarity matrix.
+    
+    Args:
+        query_vector: Normalized query vector
+        candidates: Normalized candidate vectors (one per row)
+        k: Number of candidates to select
+        lambda_mult: Trade-off between relevance (1) and diversity (0)
+        
+    Returns:
+        Selected candidate row indices in selection order
+    """
+    if len(candidates) == 0:
+        return []
+    
+    relevance = candidates @ query_vector
+    if lambda_mult >= 1.0:
+        return rerank_by_similarity(query_vector, candidates)[:k].tolist()
+    
+    selected = [int(np.argmax(relevance))]
+    max_similarity = candidates @ candidates[selected[0]]
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+    
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, candidates @ candidates[best], out=max_similarity)
+    
+    return selected
+
+class VectorMMRRetriever(BaseRetriever):
+    """
+    MMR retriever working on the vectors already stored in the index.
+    
+    Candidates are never re-embedded: only the fetch_k candidate vectors of
+    each query are reconstructed from the index, so memory does not grow
+    with the corpus. Per-stage timings are accumulated for diagnostics.
+    """
+    
+    vectorstore: Any
+    k: int = TOP_K_RESULTS
+    fetch_k: int = MMR_FETCH_K
+    lambda_mult: float = MMR_LAMBDA
+    timings: Dict[str, float] = {}
+    queries: int = 0
+    lock: Any = None
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.timings = defaultdict(float)
+        self.lock = threading.Lock()
+        # Built before the first query, so concurrent queries never modify the index
+        ensure_direct_map(self.vectorstore.index)
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        stage_seconds = {}
+        
+        t0 = time.perf_counter()
+        query_vector = np.asarray(self.vectorstore.embeddings.embed_query(query), dtype=np.float32)
+        stage_seconds["embed"] = time.perf_counter() - t0
+        
+        t0 = time.perf_counter()
+        search_vector = query_vector[np.newaxis, :].copy()
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(search_vector)
+        _, indices = self.vectorstore.index.search(search_vector, self.fetch_k)
+        positions = indices[0][indices[0] != -1]
+        stage_seconds["search"] = time.perf_counter() - t0
+        
+        t0 = time.perf_counter()
+        candidates = normalize_rows(reconstruct_positions(self.vectorstore.index, positions))
+        selected = maximal_marginal_relevance(normalize_rows(query_vector)[0], candidates, self.k, self.lambda_mult)
+        stage_seconds["mmr"] = time.perf_counter() - t0
+        
+        t0 = time.perf_counter()
+        documents = documents_for_positions(self.vectorstore, positions[selected])
+        stage_seconds["fetch"] = time.perf_counter() - t0
+        
+        with self.lock:
+            self.queries += 1
+            for stage, seconds in stage_seconds.items():
+                self.timings[stage] += seconds
+        metrics.record_stage("faiss_search", stage_seconds["search"])
+        metrics.record_stage("mmr", stage_seconds["mmr"])
+
+        return documents
+    
+    def timing_report(self) -> Dict[str, float]:
+        """
+        Return the mean milliseconds per query spent in each stage.
+        
+        Returns:
+            Dictionary of stage name (embed, search, mmr, fetch) to mean milliseconds
+        """
+        with self.lock:
+            if not self.queries:
+                return {}
+            return {stage: round(1000 * seconds / self.queries, 3) for stage, seconds in self.timings.items()}
+
+def create_mmr_retriever(vectorstore: FAISS, k: int = TOP_K_RESULTS):
     """
     Create a Maximum Marginal Relevance retriever for diversity in results.
     
     Args:
         vectorstore: FAISS vector store
-        
+        k: Number of documents to return
+    
     Returns:
         MMR retriever
     """
-    retriever = vectorstore.as_retriever(
-        search_type="mmr",
-        search_kwargs={
-            "k": TOP_K_RESULTS,
-            "fetch_k": TOP_K_RESULTS * 2,
-            "lambda_mult": 0.7  # Controls diversity (0 = max diversity, 1 = max relevance)
-        }
+    retriever = VectorMMRRetriever(
+        vectorstore=vectorstore,
+        k=k,
+        fetch_k=max(MMR_FETCH_K, k),
+        lambda_mult=MMR_LAMBDA  # Controls diversity (0 = max diversity, 1 = max relevance)
     )
     
-    return retriever
\ No newline at end of file
+    return retriever
+
+def create_micro_batch_retriever(vectorstore: FAISS, k: int = TOP_K_RESULTS):
+    """
+    Create a retriever that batches concurrent queries into one embedding call and one search.
+    
+    Args:
+        vectorstore: FAISS vector store
+        k: Number of documents to return
+    
+    Returns:
+        Micro-batching retriever
+    """
+    return MicroBatchRetriever(searcher=MicroBatchSearcher(vectorstore), k=k)
+
+def create_hybrid_retriever(vectorstore: FAISS, keyword_index, k: int = TOP_K_RESULTS):
+    """
+    Create a retriever fusing BM25 keyword and vector rankings.
+    
+    Args:
+        vectorstore: FAISS vector store
+        keyword_index: BM25 index over the same chunks
+        k: Number of documents to return
+    
+    Returns:
+        Hybrid retriever
+    """
+    return HybridRetriever(vectorstore=vectorstore, keyword_index=keyword_index, k=k, fetch_k=max(HYBRID_FETCH_K, k))
+
+def create_keyword_retriever(vectorstore: FAISS, keyword_index, k: int = TOP_K_RESULTS):
+    """
+    Create a BM25-only retriever that never calls the embedding API.
+    
+    Args:
+        vectorstore: FAISS vector store holding the chunk documents
+        keyword_index: BM25 index over the same chunks
+        k: Number of documents to return
+    
+    Returns:
+        Keyword retriever
+    """
+    return KeywordRetriever(vectorstore=vectorstore, keyword_index=keyword_index, k=k)
+
+def expand_with_neighbors(vectorstore: FAISS, docs: List, window: int = NEIGHBOR_WINDOW) -> List:
+    """
+    Add the chunks adjacent to each retrieved chunk of an indexed document.
+    
+    Chunk IDs are "<doc_id>:<chunk_index>", so neighbours are looked up by
+    ID in the docstore instead of being searched for. Each neighbour follows
+    the chunk that pulled it in, which keeps the result in relevance order
+    for context building.
+    
+    Args:
+        vectorstore: FAISS vector store
+        docs: Retrieved documents in relevance order
+        window: Number of neighbours to fetch on each side
+        
+    Returns:
+        Documents with their neighbours, without duplicates
+    """
+    if window <= 0:
+        return docs
+    
+    expanded = []
+    seen = set()
+    
+    for doc in docs:
+        doc_id, chunk_index = doc.metadata.get("doc_id"), doc.metadata.get("chunk_index")
+        if doc_id is None or chunk_index is None:
+            expanded.append(doc)
+            continue
+        
+        for offset in range(-window, window + 1):
+            neighbor_id = f"{doc_id}:{chunk_index + offset}"
+            if neighbor_id in seen or chunk_index + offset < 0:
+                continue
+            neighbor = doc if offset == 0 else vectorstore.docstore.search(neighbor_id)
+            # Docstores return a "not found" message for IDs past the document's ends
+            if not isinstance(neighbor, str):
+                seen.add(neighbor_id)
+                expanded.append(neighbor)
+    
+    return expanded
+
+class NeighborExpandingRetriever(BaseRetriever):
+    """
+    Retriever that adds the adjacent chunks of every chunk another retriever returns.
+    """
+    
+    retriever: Any
+    vectorstore: Any
+    window: int = NEIGHBOR_WINDOW
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        docs = self.retriever.get_relevant_documents(query, callbacks=run_manager.get_child())
+        return expand_with_neighbors(self.vectorstore, docs, self.window)
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List:
+        docs = await self.retriever.aget_relevant_documents(query, callbacks=run_manager.get_child())
+        return expand_with_neighbors(self.vectorstore, docs, self.window)
+    
+    def close(self) -> None:
+        if hasattr(self.retriever, "close"):
+            self.retriever.close()
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Retriever that re-scores a larger candidate pool from another retriever
+    and returns only the most relevant chunks.
+    """
+    
+    retriever: Any
+    reranker: Any
+    top_n: int = RERANK_TOP_N
+    
+    class Config:
+        arbitrary_types_allowed = True
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List:
+        docs = self.retriever.get_relevant_documents(query, callbacks=run_manager.get_child())
+        return self.reranker.rerank(query, docs, self.top_n)
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List:
+        docs = await self.retriever.aget_relevant_documents(query, callbacks=run_manager.get_child())
+        # Model scoring is CPU-bound, so it runs off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.reranker.rerank, query, docs, self.top_n)
+    
+    def close(self) -> None:
+        if hasattr(self.retriever, "close"):
+            self.retriever.close()
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """
+    Return the shared re-ranker, loading its model on first use.
+    
+    Returns:
+        Re-ranker
+    """
+    global _reranker
+    
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = create_reranker()
+    
+    return _reranker
+
+def candidate_count() -> int:
+    """
+    Return how many documents base retrievers should fetch.
+    
+    Returns:
+        RERANK_FETCH_K when re-ranking is enabled, otherwise TOP_K_RESULTS
+    """
+    return max(RERANK_FETCH_K, RERANK_TOP_N) if RERANK_ENABLED else TOP_K_RESULTS
+
+def wrap_retriever(retriever, vectorstore: FAISS):
+    """
+    Apply the configured re-ranking and neighbour expansion to a base retriever.
+    
+    Args:
+        retriever: Base retriever fetching candidate_count() documents
+        vectorstore: FAISS vector store
+    
+    Returns:
+        Wrapped retriever
+    """
+    if RERANK_ENABLED:
+        retriever = RerankingRetriever(retriever=retriever, reranker=get_reranker(), top_n=RERANK_TOP_N)
+    
+    if NEIGHBOR_WINDOW > 0:
+        retriever = NeighborExpandingRetriever(retriever=retriever, vectorstore=vectorstore, window=NEIGHBOR_WINDOW)
+    
+    return retriever
+
+def build_retriever(vectorstore: FAISS, retriever_type: str = RETRIEVER_TYPE, keyword_index=None):
+    """
+    Create the retriever selected in the configuration.
+    
+    Args:
+        vectorstore: FAISS vector store
+        retriever_type: Retrieval strategy (similarity, mmr, hybrid or keyword)
+        keyword_index: BM25 index, required for the hybrid and keyword strategies
+    
+    Returns:
+        Document retriever, wrapped to re-rank its candidates when RERANK_ENABLED
+        is set and to add neighbouring chunks when NEIGHBOR_WINDOW is set
+    """
+    k = candidate_count()
+    
+    if retriever_type in ("hybrid", "keyword"):
+        if keyword_index is None:
+            raise ValueError(f"The {retriever_type} retriever needs a keyword index")
+        if retriever_type == "hybrid":
+            retriever = create_hybrid_retriever(vectorstore, keyword_index, k)
+        else:
+            retriever = create_keyword_retriever(vectorstore, keyword_index, k)
+    elif retriever_type == "mmr":
+        retriever = create_mmr_retriever(vectorstore, k)
+    elif RETRIEVAL_MICRO_BATCHING:
+        retriever = create_micro_batch_retriever(vectorstore, k)
+    else:
+        retriever = create_retriever(vectorstore, k)
+    
+    return wrap_retriever(retriever, vectorstore)
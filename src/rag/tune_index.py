@@ -0,0 +1,175 @@
+"""
+Build candidate FAISS indexes and compare them against exact flat search.
+
+Usage:
+    python -m src.rag.tune_index --index-types ivf_flat hnsw ivf_pq --k 10
+"""
+import os
+import time
+import json
+import argparse
+from typing import List, Dict, Any
+
+import faiss
+import numpy as np
+
+from src.rag.faiss_index import (
+    INDEX_TYPES,
+    build_faiss_index,
+    get_all_vectors,
+    index_memory_per_vector,
+    set_search_params
+)
+from src.config import VECTOR_STORE_PATH, FAISS_NPROBE, FAISS_EF_SEARCH
+
+NPROBE_SWEEP = [1, 4, 8, 16, 32, 64, 128]
+EF_SEARCH_SWEEP = [16, 32, 64, 128, 256]
+
+def load_vectors(directory: str = VECTOR_STORE_PATH) -> np.ndarray:
+    """
+    Read all vectors from a saved index without loading the docstore.
+    
+    Args:
+        directory: Directory containing the vector store
+        
+    Returns:
+        Matrix of vectors
+    """
+    index = faiss.read_index(os.path.join(directory, "index.faiss"))
+    return get_all_vectors(index)
+
+def sample_queries(vectors: np.ndarray, num_queries: int, seed: int = 0) -> np.ndarray:
+    """
+    Draw query vectors by perturbing random corpus vectors.
+    
+    Args:
+        vectors: Corpus vectors
+        num_queries: Number of queries to draw
+        seed: Random seed
+        
+    Returns:
+        Matrix of query vectors
+    """
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)]
+    noise = rng.standard_normal(picks.shape).astype(np.float32) * vectors.std() * 0.1
+    return picks + noise
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """
+    Fraction of the exact top-k neighbours found by the approximate search.
+    
+    Args:
+        approximate: Neighbour IDs returned by the candidate index
+        exact: Neighbour IDs returned by flat search
+        
+    Returns:
+        Mean recall@k over all queries
+    """
+    k = exact.shape[1]
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approximate, exact))
+    return hits / (len(exact) * k)
+
+def evaluate_index(
+    index: faiss.Index,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    k: int
+) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - t0
+    
+    return {
+        "recall_at_k": round(recall_at_k(ids, ground_truth), 4),
+        "ms_per_query": round(1000 * elapsed / len(queries), 4)
+    }
+
+def tune(vectors: np.ndarray, index_types: List[str], k: int = 10, num_queries: int = 200) -> List[Dict[str, Any]]:
+    """
+    Report recall@k, latency and memory per vector for each index type.
+    
+    Each trainable type is evaluated across a sweep of its search-time
+    parameter (nprobe for IVF, efSearch for HNSW).
+    
+    Args:
+        vectors: Corpus vectors
+        index_types: Index types to evaluate
+        k: Number of neighbours
+        num_queries: Number of evaluation queries
+        
+    Returns:
+        List of result rows
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = sample_queries(vectors, num_queries)
+    
+    flat = build_faiss_index(vectors, "flat")
+    _, ground_truth = flat.search(queries, k)
+    
+    results = [{
+        "index_type": "flat",
+        "params": {},
+        "build_seconds": 0.0,
+        "bytes_per_vector": round(index_memory_per_vector(flat), 1),
+        **evaluate_index(flat, queries, ground_truth, k)
+    }]
+    
+    for index_type in index_types:
+        if index_type == "flat":
+            continue
+            
+        t0 = time.perf_counter()
+        index = build_faiss_index(vectors, index_type)
+        build_seconds = round(time.perf_counter() - t0, 3)
+        bytes_per_vector = round(index_memory_per_vector(index), 1)
+        
+        if index_type == "hnsw":
+            sweep = [{"ef_search": ef} for ef in EF_SEARCH_SWEEP]
+        else:
+            sweep = [{"nprobe": nprobe} for nprobe in NPROBE_SWEEP]
+            
+        for params in sweep:
+            set_search_params(
+                index,
+                nprobe=params.get("nprobe", FAISS_NPROBE),
+                ef_search=params.get("ef_search", FAISS_EF_SEARCH)
+            )
+            results.append({
+                "index_type": index_type,
+                "params": params,
+                "build_seconds": build_seconds,
+                "bytes_per_vector": bytes_per_vector,
+                **evaluate_index(index, queries, ground_truth, k)
+            })
+            
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against exact flat search")
+    parser.add_argument("--directory", default=VECTOR_STORE_PATH, help="Vector store directory to read vectors from")
+    parser.add_argument("--index-types", nargs="+", default=INDEX_TYPES[1:], choices=INDEX_TYPES)
+    parser.add_argument("--k", type=int, default=10, help="Number of neighbours for recall@k")
+    parser.add_argument("--queries", type=int, default=200, help="Number of evaluation queries")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    
+    vectors = load_vectors(args.directory)
+    print(f"Loaded {len(vectors)} vectors of dimension {vectors.shape[1]} from {args.directory}")
+    
+    results = tune(vectors, args.index_types, k=args.k, num_queries=args.queries)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    print(f"{'index':<12}{'params':<18}{'recall@' + str(args.k):>10}{'ms/query':>10}{'bytes/vec':>11}{'build s':>9}")
+    for row in results:
+        params = ",".join(f"{key}={value}" for key, value in row["params"].items())
+        print(
+            f"{row['index_type']:<12}{params:<18}{row['recall_at_k']:>10.4f}"
+            f"{row['ms_per_query']:>10.4f}{row['bytes_per_vector']:>11.1f}{row['build_seconds']:>9.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,361 @@
 import os
-from typing import List, Dict, Any
+import json
+import uuid
+import shutil
+import tempfile
+from typing import List, Dict, Any, Optional, Iterable, Tuple
 import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 
-from src.embeddings.gemini_embeddings import initialize_gemini_embeddings
-from src.config import VECTOR_STORE_PATH
+from src.embeddings.gemini_embeddings import get_embeddings_client, batch_embed_texts
+from src.embeddings.providers import embedding_signature
+from src.rag.faiss_index import get_index_type, min_training_size, rebuild_index, set_search_params, get_all_vectors
+from src.rag.mmap_store import has_mmap_layout, write_mmap_layout, load_mmap_components
+from src.rag.filters import MetadataFilterIndex
+from src.utils import metrics
+from src.config import VECTOR_STORE_PATH, VECTOR_STORE_LAYOUT, FAISS_INDEX_TYPE, GEMINI_EMBEDDING_MODEL, INGEST_BATCH_SIZE
 
-def create_vectorstore(documents: List) -> FAISS:
+MANIFEST_FILENAME = "manifest.json"
+
+# Manifests written before the embedding model was recorded were built with Gemini
+LEGACY_EMBEDDING_SIGNATURE = {"provider": "gemini", "model": GEMINI_EMBEDDING_MODEL}
+
+def create_vectorstore(documents: List, ids: Optional[List[str]] = None) -> FAISS:
     """
     Create a FAISS vector store from documents.
     
     Args:
         documents: List of document objects
+        ids: Optional docstore IDs for the documents
         
     Returns:
         FAISS vector store
     """
-    embeddings = initialize_gemini_embeddings()
+    embeddings = get_embeddings_client()
+    
+    # Embed all chunks through the batched, concurrent path
+    texts = [doc.page_content for doc in documents]
+    vectors = batch_embed_texts(texts, embeddings)
     
     # Create vector store
-    vectorstore = FAISS.from_documents(
-        documents=documents,
-        embedding=embeddings
+    vectorstore = FAISS.from_embeddings(
+        text_embeddings=list(zip(texts, vectors)),
+        embedding=embeddings,
+        metadatas=[doc.metadata for doc in documents],
+        ids=ids
     )
     
     return vectorstore
 
-def save_vectorstore(vectorstore: FAISS, directory: str = VECTOR_STORE_PATH) -> None:
+def load_manifest(directory: str = VECTOR_STORE_PATH) -> Dict[str, Any]:
+    """
+    Load the manifest describing which documents are in a saved vector store.
+    
+    Args:
+        directory: Directory containing the vector store
+        
+    Returns:
+        Manifest dictionary with a version counter and indexed documents
+    """
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    
+    if not os.path.exists(manifest_path):
+        return {"version": 0, "documents": {}}
+    
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_embedding_stale(manifest: Dict[str, Any]) -> bool:
+    """
+    Check whether a store was embedded with a different model than the configured one.
+    
+    Args:
+        manifest: Manifest of the saved vector store
+    
+    Returns:
+        True if the store must be re-embedded before it is searched or extended
+    """
+    stored = manifest.get("embedding") or LEGACY_EMBEDDING_SIGNATURE
+    current = embedding_signature()
+    return stored["provider"] != current["provider"] or stored["model"] != current["model"]
+
+def supports_deletion(manifest: Dict[str, Any]) -> bool:
+    """
+    Check whether documents can be removed from a saved store.
+    
+    HNSW graphs have no deletion; removing a document would mean rebuilding
+    the whole graph, so it is refused.
+    
+    Args:
+        manifest: Manifest of the saved vector store
+    
+    Returns:
+        True unless the store is saved as an HNSW index
+    """
+    return manifest.get("index_type") != "hnsw"
+
+def save_vectorstore(
+    vectorstore: FAISS,
+    directory: str = VECTOR_STORE_PATH,
+    manifest: Optional[Dict[str, Any]] = None,
+    keyword_index=None,
+    deduplicator=None
+) -> None:
     """
     Save the vector store to disk.
     
+    The store is written to a temporary sibling directory first and then
+    swapped into place, so a crash mid-save never leaves a half-written index.
+    Between the two renames of the swap no store exists; readers holding a
+    store wait for the new one instead of dropping theirs.
+    The metadata filter index is rebuilt from the chunks on every save, and
+    the manifest records the embedding model, dimension and type of the index.
+    
     Args:
         vectorstore: FAISS vector store
         directory: Directory to save the vector store
+        manifest: Optional manifest to save alongside the index
+        keyword_index: Optional BM25 index to save alongside the index
+        deduplicator: Optional chunk deduplicator to save alongside the index
     """
-    os.makedirs(directory, exist_ok=True)
-    vectorstore.save_local(directory)
+    directory = os.path.abspath(directory)
+    parent = os.path.dirname(directory)
+    
+    if manifest is not None:
+        manifest["embedding"] = {**embedding_signature(), "dimension": vectorstore.index.d}
+        manifest["index_type"] = get_index_type(vectorstore.index)
+    os.makedirs(parent, exist_ok=True)
+    
+    tmp_dir = tempfile.mkdtemp(prefix=".vectorstore-", dir=parent)
+    try:
+        if VECTOR_STORE_LAYOUT == "mmap":
+            write_mmap_layout(vectorstore.index, vectorstore.docstore, vectorstore.index_to_docstore_id, tmp_dir)
+        else:
+            vectorstore.save_local(tmp_dir)
+        if manifest is not None:
+            with open(os.path.join(tmp_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+        if keyword_index is not None:
+            keyword_index.save(tmp_dir)
+        if deduplicator is not None:
+            deduplicator.save(tmp_dir)
+        MetadataFilterIndex.build(vectorstore, deduplicator).save(tmp_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    
+    backup_dir = None
+    if os.path.exists(directory):
+        backup_dir = f"{directory}.old-{uuid.uuid4().hex}"
+        os.rename(directory, backup_dir)
+    
+    os.rename(tmp_dir, directory)
+    
+    if backup_dir:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+    
     print(f"Vector store saved to {directory}")
 
-def load_vectorstore(directory: str = VECTOR_STORE_PATH) -> FAISS:
+def load_vectorstore(directory: str = VECTOR_STORE_PATH, read_only: bool = False) -> FAISS:
     """
     Load a vector store from disk.
     
+    Stores saved in the memory-mapped layout can be opened read-only: the
+    index is mapped rather than copied into RAM and chunks are read lazily by
+    ID, so start-up does not scale with corpus size and worker processes
+    share the OS page cache.
+    
     Args:
         directory: Directory containing the vector store
+        read_only: Open the store lazily for searching only
         
     Returns:
         FAISS vector store
     """
-    embeddings = initialize_gemini_embeddings()
+    embeddings = get_embeddings_client()
     
     if not os.path.exists(directory):
         raise FileNotFoundError(f"Vector store directory {directory} not found")
     
-    vectorstore = FAISS.load_local(directory, embeddings)
+    if has_mmap_layout(directory):
+        index, docstore, index_to_docstore_id = load_mmap_components(directory, read_only=read_only)
+        vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    else:
+        vectorstore = FAISS.load_local(directory, embeddings)
+    
+    set_search_params(vectorstore.index)
     print(f"Vector store loaded from {directory}")
     
     return vectorstore
 
-def add_documents_to_vectorstore(vectorstore: FAISS, documents: List) -> FAISS:
+def add_documents_to_vectorstore(vectorstore: FAISS, documents: List, ids: Optional[List[str]] = None) -> FAISS:
     """
     Add documents to an existing vector store.
     
     Args:
         vectorstore: Existing FAISS vector store
         documents: New documents to add
+        ids: Optional docstore IDs for the documents
         
     Returns:
         Updated FAISS vector store
     """
-    vectorstore.add_documents(documents)
+    texts = [doc.page_content for doc in documents]
+    vectors = batch_embed_texts(texts, vectorstore.embeddings)
+    
+    if vectors and len(vectors[0]) != vectorstore.index.d:
+        raise ValueError(
+            f"Embedding dimension {len(vectors[0])} does not match the index dimension "
+            f"{vectorstore.index.d}; the vector store must be re-indexed"
+        )
+    
+    vectorstore.add_embeddings(
+        text_embeddings=list(zip(texts, vectors)),
+        metadatas=[doc.metadata for doc in documents],
+        ids=ids
+    )
     print(f"Added {len(documents)} documents to the vector store")
     
-    return vectorstore
\ No newline at end of file
+    return vectorstore
+
+def write_to_vectorstore(batches: Iterable[List[Tuple[str, Any]]], vectorstore: Optional[FAISS] = None) -> Optional[FAISS]:
+    """
+    Embed and add a stream of document batches to a vector store.
+    
+    Only one batch of chunks and embeddings is held in memory at a time.
+    
+    Args:
+        batches: Iterable of lists of (docstore ID, document) pairs
+        vectorstore: Existing FAISS vector store, or None to create one
+        
+    Returns:
+        Updated FAISS vector store, or None if no batches were written
+    """
+    for batch in batches:
+        ids = [doc_id for doc_id, _ in batch]
+        documents = [doc for _, doc in batch]
+        
+        if vectorstore is None:
+            vectorstore = create_vectorstore(documents, ids=ids)
+        else:
+            add_documents_to_vectorstore(vectorstore, documents, ids=ids)
+    
+    return vectorstore
+
+def reembed_vectorstore(vectorstore: FAISS, batch_size: int = INGEST_BATCH_SIZE) -> Optional[FAISS]:
+    """
+    Rebuild a vector store by re-embedding its chunks with the current embeddings model.
+    
+    Chunks are read back from the docstore, so the source files are not
+    needed, and keep their docstore IDs, so the manifest and keyword index
+    stay valid. The new index takes the dimension of the new model.
+    
+    Args:
+        vectorstore: FAISS vector store built with another embeddings model
+        batch_size: Number of chunks embedded and added per batch
+    
+    Returns:
+        Rebuilt FAISS vector store, or None if the store holds no chunks
+    """
+    ids = [vectorstore.index_to_docstore_id[position] for position in range(len(vectorstore.index_to_docstore_id))]
+    batches = (
+        [(doc_id, vectorstore.docstore.search(doc_id)) for doc_id in ids[i:i + batch_size]]
+        for i in range(0, len(ids), batch_size)
+    )
+    
+    rebuilt = write_to_vectorstore(batches)
+    return apply_index_type(rebuilt) if rebuilt is not None else None
+
+def apply_index_type(vectorstore: FAISS, index_type: str = FAISS_INDEX_TYPE) -> FAISS:
+    """
+    Convert the vector store's index to the configured FAISS index type.
+    
+    Stores start out flat; once they hold enough vectors to train the
+    configured type, the index is rebuilt once and later additions are
+    appended to the trained index.
+    
+    Args:
+        vectorstore: FAISS vector store
+        index_type: Target index type (flat, ivf_flat, hnsw, ivf_pq, opq_ivf_pq)
+        
+    Returns:
+        Updated FAISS vector store
+    """
+    current_type = get_index_type(vectorstore.index)
+    
+    if current_type != index_type and vectorstore.index.ntotal >= min_training_size(index_type):
+        vectorstore.index = rebuild_index(vectorstore.index, index_type)
+        print(f"Rebuilt {current_type} index as {index_type} ({vectorstore.index.ntotal} vectors)")
+    
+    return vectorstore
+
+def _delete_from_trained_index(vectorstore: FAISS, ids: List[str]) -> None:
+    # IVF indexes keep the labels of the remaining vectors after remove_ids and
+    # HNSW cannot remove at all, while the docstore mapping must stay 0..n-1.
+    # The kept vectors are re-added to the emptied index, which keeps its training.
+    removed = set(ids)
+    missing = removed.difference(vectorstore.index_to_docstore_id.values())
+    if missing:
+        raise ValueError(f"Some specified ids do not exist in the current store. Ids not found: {missing}")
+    
+    kept = [
+        position for position in range(len(vectorstore.index_to_docstore_id))
+        if vectorstore.index_to_docstore_id[position] not in removed
+    ]
+    vectors = get_all_vectors(vectorstore.index)[kept]
+    
+    vectorstore.index.reset()
+    if len(vectors):
+        vectorstore.index.add(vectors)
+    vectorstore.docstore.delete(ids)
+    vectorstore.index_to_docstore_id = {
+        new_position: vectorstore.index_to_docstore_id[position]
+        for new_position, position in enumerate(kept)
+    }
+
+def delete_documents_from_vectorstore(vectorstore: FAISS, ids: List[str]) -> FAISS:
+    """
+    Delete documents from a vector store by docstore ID.
+    
+    Flat indexes delete in place. Trained indexes are refilled with the
+    remaining vectors (approximate reconstructions for PQ), so positions
+    stay aligned with the docstore mapping.
+    
+    Args:
+        vectorstore: Existing FAISS vector store
+        ids: Docstore IDs of the documents to delete
+        
+    Returns:
+        Updated FAISS vector store
+    """
+    if not ids:
+        return vectorstore
+    
+    if get_index_type(vectorstore.index) == "flat":
+        vectorstore.delete(ids)
+    else:
+        _delete_from_trained_index(vectorstore, ids)
+    print(f"Deleted {len(ids)} documents from the vector store")
+    
+    return vectorstore
+
+def search_ids_by_vector(vectorstore: FAISS, query_vector: List[float], k: int) -> List[str]:
+    """
+    Return the docstore IDs of the nearest chunks to a query vector.
+    
+    Args:
+        vectorstore: FAISS vector store
+        query_vector: Query embedding
+        k: Number of neighbours
+        
+    Returns:
+        Docstore IDs, nearest first
+    """
+    vector = np.asarray([query_vector], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vector)
+    
+    with metrics.span("faiss_search"):
+        _, indices = vectorstore.index.search(vector, k)
+    return [vectorstore.index_to_docstore_id[int(position)] for position in indices[0] if position != -1]
@@ -0,0 +1,86 @@
+import json
+import urllib.request
+from typing import List, Dict, Any, Iterator, Optional
+
+from langchain.schema import Document
+
+from src.config import QA_SERVICE_URL, SERVICE_REQUEST_TIMEOUT
+
+def _post(path: str, payload: Dict[str, Any], service_url: str, timeout: float):
+    request = urllib.request.Request(
+        f"{service_url.rstrip('/')}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    return urllib.request.urlopen(request, timeout=timeout)
+
+def _deserialize_docs(docs) -> list:
+    return [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in docs]
+
+def stream_answer_remote(
+    question: str,
+    prompt_type: str = "standard",
+    service_url: str = QA_SERVICE_URL,
+    timeout: float = SERVICE_REQUEST_TIMEOUT,
+    chat_history: str = "",
+    doc_ids: Optional[List[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream an answer from the QA service.
+    
+    Yields the same events as the in-process stream_answer, so the UI can use
+    either interchangeably.
+    
+    Args:
+        question: User question
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        service_url: Base URL of the QA service
+        timeout: Socket timeout in seconds
+        chat_history: Earlier conversation to include in the prompt
+        doc_ids: Optional document IDs to restrict retrieval to
+        
+    Yields:
+        A {"type": "docs"} event followed by {"type": "token"} events
+    """
+    payload = {"question": question, "prompt_type": prompt_type, "chat_history": chat_history, "doc_ids": doc_ids}
+    with _post("/ask/stream", payload, service_url, timeout) as response:
+        for line in response:
+            if not line.strip():
+                continue
+            
+            event = json.loads(line)
+            if event["type"] == "error":
+                raise RuntimeError(event["error"])
+            if event["type"] == "docs":
+                event["docs"] = _deserialize_docs(event["docs"])
+            yield event
+
+def ask_remote(
+    question: str,
+    prompt_type: str = "standard",
+    service_url: str = QA_SERVICE_URL,
+    timeout: float = SERVICE_REQUEST_TIMEOUT,
+    chat_history: str = "",
+    doc_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Ask the QA service a question and wait for the full answer.
+    
+    Args:
+        question: User question
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        service_url: Base URL of the QA service
+        timeout: Socket timeout in seconds
+        chat_history: Earlier conversation to include in the prompt
+        doc_ids: Optional document IDs to restrict retrieval to
+        
+    Returns:
+        Dictionary with "answer" text and "docs"
+    """
+    payload = {"question": question, "prompt_type": prompt_type, "chat_history": chat_history, "doc_ids": doc_ids}
+    with _post("/ask", payload, service_url, timeout) as response:
+        result = json.loads(response.read())
+    
+    result["docs"] = _deserialize_docs(result["docs"])
+    return result
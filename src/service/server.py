@@ -0,0 +1,361 @@
+"""
+Asynchronous HTTP service exposing the retrieval and QA chains.
+
+Usage:
+    python -m src.service.server --host 127.0.0.1 --port 8502
+"""
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+
+from src.chains.qa_chain import get_prompt, format_docs_with_sources
+from src.chains.prompts import NO_HISTORY
+from src.utils import metrics
+from src.utils.resources import (
+    get_retriever,
+    get_scoped_retriever,
+    get_llm,
+    get_conversation_answer_cache,
+    answer_cache_namespace,
+    get_loaded_index_version
+)
+from src.config import (
+    VECTOR_STORE_PATH,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_MAX_CONCURRENCY,
+    SERVICE_REQUEST_TIMEOUT,
+    SERVICE_THREAD_POOL_SIZE
+)
+
+_ROUTES = ("/health", "/metrics", "/ask", "/ask/stream")
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+def serialize_docs(docs) -> list:
+    """
+    Convert documents to JSON-serializable dictionaries.
+    
+    Args:
+        docs: List of documents
+        
+    Returns:
+        List of {"page_content", "metadata"} dictionaries
+    """
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+class QAService:
+    """
+    Answers questions concurrently without letting one request block the others.
+    
+    Blocking work (index loading, FAISS search, embedding and cache lookups)
+    runs in a thread pool, LLM calls are awaited asynchronously, a semaphore
+    caps the number of requests being processed and each request has a deadline.
+    """
+    
+    def __init__(
+        self,
+        directory: str = VECTOR_STORE_PATH,
+        max_concurrency: int = SERVICE_MAX_CONCURRENCY,
+        request_timeout: float = SERVICE_REQUEST_TIMEOUT
+    ):
+        self.directory = directory
+        self.request_timeout = request_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    
+    async def _retrieve(
+        self,
+        question: str,
+        prompt_type: str,
+        chat_history: str,
+        doc_ids: Optional[List[str]]
+    ) -> Tuple[list, Any, Any]:
+        if doc_ids:
+            retriever = await self._run_blocking(get_scoped_retriever, doc_ids, self.directory)
+        else:
+            retriever = await self._run_blocking(get_retriever, self.directory)
+        if retriever is None:
+            raise LookupError("No vector store found. Please upload PDF documents to create one.")
+        
+        cache = get_conversation_answer_cache(chat_history)
+        vector = None
+        if cache is not None:
+            namespace = answer_cache_namespace(prompt_type, doc_ids, chat_history)
+            cached, vector = await self._run_blocking(cache.lookup, question, namespace, get_loaded_index_version())
+            if cached is not None:
+                return cached["docs"], cached["answer"], vector
+        
+        # Async query embedding, FAISS search in the executor
+        docs = await retriever.aget_relevant_documents(question, callbacks=metrics.get_callbacks())
+        return docs, None, vector
+    
+    async def stream(
+        self,
+        question: str,
+        prompt_type: str = "standard",
+        chat_history: str = "",
+        doc_ids: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the context documents and then the answer tokens for a question.
+        
+        Args:
+            question: User question
+            prompt_type: Type of prompt to use (standard, few_shot, structured)
+            chat_history: Earlier conversation to include in the prompt
+            doc_ids: Optional document IDs to restrict retrieval to
+            
+        Yields:
+            A {"type": "docs"} event followed by {"type": "token"} events
+        """
+        docs, cached_answer, vector = await self._retrieve(question, prompt_type, chat_history, doc_ids)
+        # Read after retrieval, which loads the index on the first request
+        index_version = get_loaded_index_version()
+        if cached_answer is not None:
+            yield {"type": "docs", "docs": serialize_docs(docs)}
+            yield {"type": "token", "text": getattr(cached_answer, "content", str(cached_answer))}
+            return
+        
+        # Only the documents that fit in the context are shown and cached
+        context, docs = format_docs_with_sources(docs)
+        yield {"type": "docs", "docs": serialize_docs(docs)}
+        
+        tokens = []
+        answer_chain = get_prompt(prompt_type) | get_llm()
+        inputs = {"context": context, "question": question, "chat_history": chat_history or NO_HISTORY}
+        async for chunk in answer_chain.astream(inputs):
+            text = getattr(chunk, "content", str(chunk))
+            if text:
+                tokens.append(text)
+                yield {"type": "token", "text": text}
+        
+        cache = get_conversation_answer_cache(chat_history)
+        if cache is not None and vector is not None:
+            namespace = answer_cache_namespace(prompt_type, doc_ids, chat_history)
+            cache.store(namespace, {"question": question, "docs": docs, "answer": "".join(tokens)}, vector, index_version)
+    
+    async def stream_with_limits(
+        self,
+        question: str,
+        prompt_type: str = "standard",
+        chat_history: str = "",
+        doc_ids: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an answer under the global concurrency limit and the request deadline.
+        
+        Time spent waiting for a free slot counts against the deadline.
+        
+        Raises:
+            asyncio.TimeoutError: If the request exceeds its deadline
+        """
+        deadline = time.monotonic() + self.request_timeout
+        
+        await asyncio.wait_for(self.semaphore.acquire(), timeout=self.request_timeout)
+        events = self.stream(question, prompt_type, chat_history, doc_ids)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                yield event
+        finally:
+            await events.aclose()
+            self.semaphore.release()
+    
+    async def answer(
+        self,
+        question: str,
+        prompt_type: str = "standard",
+        chat_history: str = "",
+        doc_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Answer a question under the concurrency limit and request deadline.
+        
+        Args:
+            question: User question
+            prompt_type: Type of prompt to use (standard, few_shot, structured)
+            chat_history: Earlier conversation to include in the prompt
+            doc_ids: Optional document IDs to restrict retrieval to
+            
+        Returns:
+            Dictionary with "answer" text and serialized "docs"
+        """
+        docs = []
+        tokens = []
+        async for event in self.stream_with_limits(question, prompt_type, chat_history, doc_ids):
+            if event["type"] == "docs":
+                docs = event["docs"]
+            else:
+                tokens.append(event["text"])
+        
+        return {"answer": "".join(tokens), "docs": docs}
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        raise ValueError("Empty request")
+    
+    method, path, _ = request_line.split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path.split("?", 1)[0], body
+
+def _write_head(writer: asyncio.StreamWriter, status: int, content_type: str, extra: str = "") -> None:
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n{extra}Connection: close\r\n\r\n".encode("latin-1")
+    )
+
+def _write_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    _write_head(writer, status, "application/json", f"Content-Length: {len(body)}\r\n")
+    writer.write(body)
+
+def _write_text(writer: asyncio.StreamWriter, status: int, content_type: str, text: str) -> None:
+    body = text.encode("utf-8")
+    _write_head(writer, status, content_type, f"Content-Length: {len(body)}\r\n")
+    writer.write(body)
+
+def _write_chunk(writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> None:
+    data = (json.dumps(payload) + "\n").encode("utf-8")
+    writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+
+async def _stream_response(
+    service: QAService,
+    writer: asyncio.StreamWriter,
+    question: str,
+    prompt_type: str,
+    chat_history: str,
+    doc_ids: Optional[List[str]]
+) -> None:
+    # Newline-delimited JSON events over chunked transfer encoding
+    _write_head(writer, 200, "application/x-ndjson", "Transfer-Encoding: chunked\r\n")
+    try:
+        async for event in service.stream_with_limits(question, prompt_type, chat_history, doc_ids):
+            _write_chunk(writer, event)
+            await writer.drain()
+    except asyncio.TimeoutError:
+        _write_chunk(writer, {"type": "error", "error": "Request timed out"})
+    except Exception as e:
+        _write_chunk(writer, {"type": "error", "error": str(e)})
+    writer.write(b"0\r\n\r\n")
+
+def make_handler(service: QAService):
+    """
+    Create the asyncio connection handler for the service.
+    
+    Args:
+        service: QA service instance
+        
+    Returns:
+        Coroutine function handling one HTTP connection
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await _read_request(reader)
+            started = time.perf_counter()
+            status = 200
+            
+            if method == "GET" and path == "/health":
+                _write_json(writer, 200, {"status": "ok"})
+            elif method == "GET" and path == "/metrics":
+                _write_text(writer, 200, "text/plain; version=0.0.4", metrics.render_prometheus())
+            elif method == "POST" and path in ("/ask", "/ask/stream"):
+                try:
+                    payload = json.loads(body or b"{}")
+                    question = payload["question"]
+                    prompt_type = payload.get("prompt_type", "standard")
+                    chat_history = payload.get("chat_history", "")
+                    doc_ids = payload.get("doc_ids")
+                except (ValueError, KeyError):
+                    status = 400
+                    _write_json(writer, status, {"error": "Expected a JSON body with a 'question' field"})
+                else:
+                    if path == "/ask/stream":
+                        await _stream_response(service, writer, question, prompt_type, chat_history, doc_ids)
+                    else:
+                        try:
+                            result = await service.answer(question, prompt_type, chat_history, doc_ids)
+                        except asyncio.TimeoutError:
+                            status, result = 504, {"error": "Request timed out"}
+                        except LookupError as e:
+                            status, result = 503, {"error": str(e)}
+                        except Exception as e:
+                            status, result = 500, {"error": str(e)}
+                        _write_json(writer, status, result)
+            else:
+                status = 404
+                _write_json(writer, status, {"error": f"No route for {method} {path}"})
+            
+            await writer.drain()
+            
+            route = path if path in _ROUTES else "other"
+            metrics.increment("http_requests_total", route=route, status=status)
+            if route != "/metrics":
+                metrics.observe("http_request_seconds", time.perf_counter() - started, route=route)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    return handle
+
+async def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, directory: str = VECTOR_STORE_PATH) -> None:
+    """
+    Run the QA service until cancelled.
+    
+    Args:
+        host: Interface to bind
+        port: Port to listen on
+        directory: Directory containing the vector store
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=SERVICE_THREAD_POOL_SIZE))
+    
+    # Load the index and LLM client before accepting traffic
+    await loop.run_in_executor(None, get_retriever, directory)
+    get_llm()
+    
+    server = await asyncio.start_server(make_handler(QAService(directory)), host, port)
+    print(f"QA service listening on http://{host}:{port}")
+    
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the diabetes QA chains over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--directory", default=VECTOR_STORE_PATH)
+    args = parser.parse_args()
+    
+    asyncio.run(serve(args.host, args.port, args.directory))
+
+if __name__ == "__main__":
+    main()
@@ -107,6 +107,88 @@ def extract_json_from_response(response: str) -> Dict[str, Any]:
     
     return {}
 
+class StructuredSectionParser:
+    """
+    Incrementally parse a streamed JSON object into completed top-level fields.
+    
+    Text can be fed in arbitrary pieces; each call returns the fields whose
+    values were completed by that piece, so structured sections can be shown
+    as soon as they finish instead of after the whole response.
+    """
+    
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member = []
+    
+    def _flush(self) -> Dict[str, Any]:
+        text = "".join(self.member).strip()
+        self.member = []
+        
+        if not text:
+            return {}
+        
+        try:
+            return json.loads("{" + text + "}")
+        except json.JSONDecodeError:
+            return {}
+    
+    def feed(self, text: str) -> Dict[str, Any]:
+        """
+        Consume the next piece of streamed text.
+        
+        Args:
+            text: Next piece of the LLM response
+            
+        Returns:
+            Dictionary of top-level fields completed by this piece
+        """
+        completed = {}
+        
+        for char in text:
+            if self.finished:
+                break
+            
+            if not self.started:
+                # Skip any preamble such as a ```json fence
+                if char == "{":
+                    self.started = True
+                    self.depth = 1
+                continue
+            
+            if self.in_string:
+                self.member.append(char)
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            
+            if char == '"':
+                self.in_string = True
+                self.member.append(char)
+            elif char in "{[":
+                self.depth += 1
+                self.member.append(char)
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.update(self._flush())
+                    self.finished = True
+                else:
+                    self.member.append(char)
+            elif char == "," and self.depth == 1:
+                completed.update(self._flush())
+            else:
+                self.member.append(char)
+        
+        return completed
+
 def get_chat_history(messages: List[Dict[str, str]]) -> str:
     """
     Format chat history for the LLM context.
@@ -117,15 +199,10 @@ def get_chat_history(messages: List[Dict[str, str]]) -> str:
     Returns:
         Formatted chat history string
     """
-    chat_history = ""
-    
-    for message in messages:
-        role = message.get("role", "")
-        content = message.get("content", "")
-        
-        if role == "user":
-            chat_history += f"User: {content}\n"
-        elif role == "assistant":
-            chat_history += f"Assistant: {content}\n"
+    labels = {"user": "User", "assistant": "Assistant"}
     
-    return chat_history
\ No newline at end of file
+    return "".join(
+        f"{labels[message['role']]}: {message.get('content', '')}\n"
+        for message in messages
+        if message.get("role") in labels
+    )
\ No newline at end of file
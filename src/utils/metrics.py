@@ -0,0 +1,328 @@
+import json
+import time
+import atexit
+import bisect
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+from src.chains.context import count_tokens
+from src.config import METRICS_ENABLED, METRICS_LOG_PATH, METRICS_LATENCY_BUCKETS
+
+METRICS_PREFIX = "rag_"
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: _LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters and latency histograms.
+    
+    Series are keyed by metric name and label values. Recording is a dict
+    lookup and an add under one lock, cheap enough for per-query use.
+    Span events can also be appended to a JSON lines log.
+    """
+    
+    def __init__(self, enabled: bool = METRICS_ENABLED, log_path: Optional[str] = METRICS_LOG_PATH):
+        self.enabled = enabled
+        self.counters: Dict[str, Dict[_LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[_LabelKey, _Histogram]] = {}
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", encoding="utf-8") if log_path else None
+        if self._log is not None:
+            atexit.register(self._log.close)
+    
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+    
+    def record_stage(self, stage: str, seconds: float, error: Optional[str] = None, **labels) -> None:
+        """
+        Record one execution of a pipeline stage.
+        
+        Args:
+            stage: Stage name
+            seconds: Duration of the stage
+            error: Exception type name if the stage failed
+            **labels: Extra label values for the series
+        """
+        if not self.enabled:
+            return
+        self.observe("stage_seconds", seconds, stage=stage, **labels)
+        if error is not None:
+            self.increment("stage_errors_total", stage=stage)
+        
+        if self._log is not None:
+            line = json.dumps(
+                {"ts": time.time(), "stage": stage, "ms": round(seconds * 1000, 3), "error": error, **labels},
+                default=str
+            )
+            with self._lock:
+                self._log.write(line + "\n")
+                self._log.flush()
+    
+    def span(self, stage: str, **labels):
+        """
+        Time a block of code as one pipeline stage.
+        
+        The duration is recorded in the stage_seconds histogram and, when a
+        log path is configured, written as a JSON event. Disabled registries
+        return a shared no-op context manager.
+        
+        Args:
+            stage: Stage name, e.g. "embed_query" or "faiss_search"
+            **labels: Extra label values for the series
+            
+        Returns:
+            Context manager
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, labels)
+    
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the current values of all series.
+        
+        Returns:
+            Dictionary with "counters" and "histograms" lists of series
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for name, series in self.counters.items()
+                for key, value in series.items()
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(key),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "buckets": dict(zip([*map(str, histogram.buckets), "+Inf"], histogram.counts))
+                }
+                for name, series in self.histograms.items()
+                for key, histogram in series.items()
+            ]
+        return {"counters": counters, "histograms": histograms}
+    
+    def render_prometheus(self) -> str:
+        """
+        Render all series in the Prometheus text exposition format.
+        
+        Returns:
+            Exposition text
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                metric = METRICS_PREFIX + name
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+            
+            for name, series in sorted(self.histograms.items()):
+                metric = METRICS_PREFIX + name
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                        cumulative += count
+                        le = 'le="' + bound + '"'
+                        lines.append(f"{metric}_bucket{_format_labels(key, le)} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        
+        return "\n".join(lines) + "\n"
+
+class _Span:
+    __slots__ = ("registry", "stage", "labels", "started")
+    
+    def __init__(self, registry: MetricsRegistry, stage: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        self.registry.record_stage(self.stage, seconds, exc_type.__name__ if exc_type else None, **self.labels)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+REGISTRY = MetricsRegistry()
+
+def span(stage: str, **labels):
+    """
+    Time a block of code as a pipeline stage in the shared registry.
+    """
+    return REGISTRY.span(stage, **labels)
+
+def record_stage(stage: str, seconds: float, **labels) -> None:
+    REGISTRY.record_stage(stage, seconds, **labels)
+
+def increment(name: str, value: float = 1, **labels) -> None:
+    REGISTRY.increment(name, value, **labels)
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS, **labels) -> None:
+    REGISTRY.observe(name, value, buckets, **labels)
+
+def set_enabled(enabled: bool) -> None:
+    REGISTRY.enabled = enabled
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+def snapshot() -> Dict[str, Any]:
+    return REGISTRY.snapshot()
+
+def _message_text(messages: List) -> str:
+    return "\n".join(str(getattr(message, "content", message)) for message in messages)
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler recording retrieval and LLM calls.
+    
+    Passed to the chat model and to retrieval calls, it times every
+    retrieval and generation however the chain invokes them (sync, async
+    or streaming) and counts requests, tokens and retrieved chunks.
+    """
+    
+    # Record synchronously in async chains instead of hopping to an executor
+    run_inline = True
+    
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.registry = registry
+        self._started: Dict[UUID, float] = {}
+        self._first_token: Dict[UUID, bool] = {}
+        self._retriever_runs = set()
+    
+    def _start(self, run_id: UUID) -> None:
+        self._started[run_id] = time.perf_counter()
+    
+    def _elapsed(self, run_id: UUID) -> Optional[float]:
+        started = self._started.pop(run_id, None)
+        return None if started is None else time.perf_counter() - started
+    
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs) -> None:
+        # Retrievers wrapped by another retriever are timed as part of the outer one
+        if parent_run_id in self._retriever_runs:
+            return
+        self._retriever_runs.add(run_id)
+        self._start(run_id)
+    
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        if run_id not in self._retriever_runs:
+            return
+        self._retriever_runs.discard(run_id)
+        seconds = self._elapsed(run_id)
+        if seconds is not None:
+            self.registry.record_stage("retrieve", seconds)
+        self.registry.increment("retrieved_chunks_total", len(documents))
+    
+    def on_retriever_error(self, error, *, run_id, **kwargs) -> None:
+        if run_id not in self._retriever_runs:
+            return
+        self._retriever_runs.discard(run_id)
+        seconds = self._elapsed(run_id)
+        if seconds is not None:
+            self.registry.record_stage("retrieve", seconds, type(error).__name__)
+    
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+        if self.registry.enabled:
+            self.registry.increment("llm_prompt_tokens_total", sum(count_tokens(_message_text(batch)) for batch in messages))
+    
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+        if self.registry.enabled:
+            self.registry.increment("llm_prompt_tokens_total", sum(count_tokens(prompt) for prompt in prompts))
+    
+    def on_llm_new_token(self, token, *, run_id, **kwargs) -> None:
+        if run_id in self._first_token or run_id not in self._started:
+            return
+        self._first_token[run_id] = True
+        self.registry.observe("llm_first_token_seconds", time.perf_counter() - self._started[run_id])
+    
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._first_token.pop(run_id, None)
+        seconds = self._elapsed(run_id)
+        if seconds is not None:
+            self.registry.record_stage("generate", seconds)
+        self.registry.increment("llm_requests_total", status="ok")
+        if self.registry.enabled:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            self.registry.increment("llm_completion_tokens_total", count_tokens(text))
+    
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._first_token.pop(run_id, None)
+        seconds = self._elapsed(run_id)
+        if seconds is not None:
+            self.registry.record_stage("generate", seconds, type(error).__name__)
+        self.registry.increment("llm_requests_total", status="error")
+
+_CALLBACK_HANDLER = MetricsCallbackHandler()
+
+def get_callbacks() -> List[BaseCallbackHandler]:
+    """
+    Return the callback handlers to pass to retrieval calls and chat models.
+    
+    Returns:
+        The shared metrics handler, or an empty list when metrics are disabled
+    """
+    return [_CALLBACK_HANDLER] if REGISTRY.enabled else []
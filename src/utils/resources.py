@@ -0,0 +1,348 @@
+import os
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+from langchain_community.vectorstores import FAISS
+
+from src.rag.vectorstore import load_vectorstore
+from src.rag.indexing import reindex_if_stale
+from src.rag.retriever import build_retriever, wrap_retriever, candidate_count
+from src.rag.bm25 import load_keyword_index
+from src.rag.filters import FilteredRetriever, load_filter_index
+from src.embeddings.gemini_embeddings import get_embeddings_client
+from src.chains.qa_chain import initialize_llm, create_qa_chain_with_sources, stream_answer_with_sources
+from src.chains.answer_cache import SemanticAnswerCache, invoke_with_cache
+from src.config import VECTOR_STORE_PATH, ANSWER_CACHE_ENABLED, ANSWER_CACHE_WITH_HISTORY, RETRIEVER_TYPE
+
+# Process-wide resources shared by every Streamlit session and rerun
+_lock = threading.RLock()
+_llm = None
+_vectorstore = None
+_vectorstore_version = None
+_retriever = None
+_filter_index = None
+_qa_chains: Dict[str, object] = {}
+_answer_cache = None
+
+# A save renames the old store away just before renaming the new one into
+# place; a reader polling in between waits this long before dropping its store
+_SWAP_RETRIES = 20
+_SWAP_RETRY_DELAY = 0.05
+
+def get_index_version(directory: str = VECTOR_STORE_PATH) -> Optional[Tuple[int, int]]:
+    """
+    Return a cheap fingerprint of the on-disk index.
+    
+    Saves swap in a freshly written directory, so the inode and modification
+    time of the index file change whenever the index is rewritten.
+    
+    Args:
+        directory: Directory containing the vector store
+        
+    Returns:
+        (inode, mtime) tuple, or None if no index exists
+    """
+    try:
+        stat = os.stat(os.path.join(directory, "index.faiss"))
+    except FileNotFoundError:
+        return None
+    
+    return (stat.st_ino, stat.st_mtime_ns)
+
+def _wait_for_index_version(directory: str) -> Optional[Tuple[int, int]]:
+    for _ in range(_SWAP_RETRIES):
+        time.sleep(_SWAP_RETRY_DELAY)
+        version = get_index_version(directory)
+        if version is not None:
+            return version
+    return None
+
+def get_loaded_index_version() -> Optional[Tuple[int, int]]:
+    """
+    Return the fingerprint of the index currently held in memory.
+    
+    Returns:
+        (inode, mtime) tuple, or None if no index is loaded
+    """
+    return _vectorstore_version
+
+def get_llm():
+    """
+    Return the shared LLM client, creating it on first use.
+    
+    Returns:
+        Configured LLM
+    """
+    global _llm
+    
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = initialize_llm()
+    
+    return _llm
+
+def _reset_retriever() -> None:
+    global _retriever, _filter_index
+    
+    _filter_index = None
+    # Stop background workers (e.g. the micro-batching thread) of the old retriever
+    if _retriever is not None and hasattr(_retriever, "close"):
+        _retriever.close()
+    _retriever = None
+    _qa_chains.clear()
+
+def get_vectorstore(directory: str = VECTOR_STORE_PATH) -> Optional[FAISS]:
+    """
+    Return the shared vector store, reloading it if the on-disk index changed.
+    
+    A store built with a different embedding model is re-embedded before it
+    is loaded. If the index is missing while a store is loaded, a save may be
+    swapping directories, so the index is polled briefly before the store is
+    dropped.
+    
+    Args:
+        directory: Directory containing the vector store
+        
+    Returns:
+        FAISS vector store, or None if no index exists
+    """
+    global _vectorstore, _vectorstore_version
+    
+    version = get_index_version(directory)
+    if version is None and _vectorstore is not None:
+        version = _wait_for_index_version(directory)
+    if version == _vectorstore_version:
+        return _vectorstore
+    
+    with _lock:
+        if version != _vectorstore_version:
+            if version is not None and reindex_if_stale(directory):
+                version = get_index_version(directory)
+            _vectorstore = load_vectorstore(directory, read_only=True) if version is not None else None
+            _vectorstore_version = version
+            _reset_retriever()
+    
+    return _vectorstore
+
+def publish_vectorstore(vectorstore: FAISS, directory: str = VECTOR_STORE_PATH) -> None:
+    """
+    Share a vector store that was just saved, without reading it back from disk.
+    
+    Args:
+        vectorstore: FAISS vector store that was saved to directory
+        directory: Directory the vector store was saved to
+    """
+    global _vectorstore, _vectorstore_version
+    
+    with _lock:
+        _vectorstore = vectorstore
+        _vectorstore_version = get_index_version(directory)
+        _reset_retriever()
+
+def get_retriever(directory: str = VECTOR_STORE_PATH):
+    """
+    Return the shared read-only retriever for the current index.
+    
+    Args:
+        directory: Directory containing the vector store
+        
+    Returns:
+        Document retriever, or None if no index exists
+    """
+    global _retriever
+    
+    vectorstore = get_vectorstore(directory)
+    if vectorstore is None:
+        return None
+    
+    with _lock:
+        if _retriever is None:
+            keyword_index = None
+            if RETRIEVER_TYPE in ("hybrid", "keyword"):
+                keyword_index = load_keyword_index(directory, vectorstore)
+            _retriever = build_retriever(vectorstore, RETRIEVER_TYPE, keyword_index)
+        return _retriever
+
+def get_scoped_retriever(doc_ids, directory: str = VECTOR_STORE_PATH):
+    """
+    Return a retriever restricted to the chunks of the given documents.
+    
+    The document scope is resolved through the metadata filter index saved
+    with the store, so the search only touches the selected chunks.
+    
+    Args:
+        doc_ids: Document IDs (content hashes) to search
+        directory: Directory containing the vector store
+        
+    Returns:
+        Filtered retriever, or None if no index exists
+    """
+    global _filter_index
+    
+    vectorstore = get_vectorstore(directory)
+    if vectorstore is None:
+        return None
+    
+    with _lock:
+        if _filter_index is None:
+            _filter_index = load_filter_index(directory, vectorstore)
+        filter_index = _filter_index
+    
+    retriever = FilteredRetriever(vectorstore=vectorstore, positions=filter_index.select(doc_ids=doc_ids), k=candidate_count())
+    return wrap_retriever(retriever, vectorstore)
+
+def get_qa_chain(prompt_type: str = "standard", directory: str = VECTOR_STORE_PATH):
+    """
+    Return the shared QA chain for a prompt type over the current index.
+    
+    Args:
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        directory: Directory containing the vector store
+        
+    Returns:
+        QA chain producing the answer and its context documents, or None if no index exists
+    """
+    retriever = get_retriever(directory)
+    if retriever is None:
+        return None
+    
+    with _lock:
+        if prompt_type not in _qa_chains:
+            _qa_chains[prompt_type] = create_qa_chain_with_sources(retriever, prompt_type, llm=get_llm())
+        return _qa_chains[prompt_type]
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Return the shared semantic answer cache, or None if it is disabled.
+    
+    Returns:
+        Semantic answer cache
+    """
+    global _answer_cache
+    
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache(get_embeddings_client())
+    
+    return _answer_cache
+
+def get_conversation_answer_cache(chat_history: str = "") -> Optional[SemanticAnswerCache]:
+    """
+    Return the answer cache for a question asked within a conversation.
+    
+    Args:
+        chat_history: Earlier conversation included in the prompt
+    
+    Returns:
+        Semantic answer cache, or None if it is disabled or the question has
+        history and ANSWER_CACHE_WITH_HISTORY is off
+    """
+    if chat_history and not ANSWER_CACHE_WITH_HISTORY:
+        return None
+    return get_answer_cache()
+
+def answer_cache_namespace(prompt_type: str, doc_ids: Optional[List[str]] = None, chat_history: str = "") -> str:
+    """
+    Return the cache namespace for answers of a prompt type, search scope and conversation.
+    
+    Answers scoped to some documents are only served for the same scope, and
+    answers to follow-up questions only for the same chat history, since a
+    question like "what are its side effects?" depends on what came before.
+    
+    Args:
+        prompt_type: Type of prompt the answer is generated with
+        doc_ids: Optional document IDs retrieval is restricted to
+        chat_history: Earlier conversation included in the prompt
+    
+    Returns:
+        Namespace passed to the cache as its prompt type
+    """
+    namespace = prompt_type
+    if doc_ids:
+        namespace += f":{','.join(sorted(doc_ids))}"
+    if chat_history:
+        namespace += f"@{hashlib.sha256(chat_history.encode('utf-8')).hexdigest()[:16]}"
+    return namespace
+
+def answer_question(question: str, prompt_type: str = "standard", directory: str = VECTOR_STORE_PATH) -> Optional[Dict[str, Any]]:
+    """
+    Answer a question with the shared QA chain, using the semantic answer cache.
+    
+    Cached answers are tied to the index version, so they are dropped as soon
+    as the on-disk index changes.
+    
+    Args:
+        question: User question
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        directory: Directory containing the vector store
+        
+    Returns:
+        Dict with "docs", "answer" and "cached" keys, or None if no index exists
+    """
+    qa_chain = get_qa_chain(prompt_type, directory)
+    if qa_chain is None:
+        return None
+    
+    return invoke_with_cache(get_answer_cache(), qa_chain, question, prompt_type, _vectorstore_version)
+
+
+def stream_answer(
+    question: str,
+    prompt_type: str = "standard",
+    directory: str = VECTOR_STORE_PATH,
+    chat_history: str = "",
+    doc_ids: Optional[List[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream an answer from the shared retriever and LLM, using the semantic answer cache.
+    
+    A cached answer is emitted as a single token event. A streamed answer is
+    stored in the cache once it is complete. Scoped questions are cached
+    per scope; questions asked with chat history are cached per history
+    when ANSWER_CACHE_WITH_HISTORY is on.
+    
+    Args:
+        question: User question
+        prompt_type: Type of prompt to use (standard, few_shot, structured)
+        directory: Directory containing the vector store
+        chat_history: Earlier conversation to include in the prompt
+        doc_ids: Optional document IDs to restrict retrieval to
+        
+    Yields:
+        A {"type": "docs"} event followed by {"type": "token"} events
+    """
+    retriever = get_scoped_retriever(doc_ids, directory) if doc_ids else get_retriever(directory)
+    if retriever is None:
+        return
+    
+    index_version = _vectorstore_version
+    cache = get_conversation_answer_cache(chat_history)
+    namespace = answer_cache_namespace(prompt_type, doc_ids, chat_history)
+    
+    if cache is not None:
+        cached, vector = cache.lookup(question, namespace, index_version)
+        if cached is not None:
+            answer = cached["answer"]
+            yield {"type": "docs", "docs": cached["docs"]}
+            yield {"type": "token", "text": answer.content if hasattr(answer, "content") else str(answer)}
+            return
+    
+    docs = []
+    tokens = []
+    for event in stream_answer_with_sources(retriever, question, prompt_type, llm=get_llm(), chat_history=chat_history):
+        if event["type"] == "docs":
+            docs = event["docs"]
+        else:
+            tokens.append(event["text"])
+        yield event
+    
+    if cache is not None:
+        cache.store(namespace, {"question": question, "docs": docs, "answer": "".join(tokens)}, vector, index_version)
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from benchmarks.corpus import make_corpus
+from benchmarks.pdf import write_pdf
+from src.embeddings import gemini_embeddings
+from src.embeddings.providers import HashingEmbeddings
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    """
+    Use the offline hashing embedder as the shared embeddings client.
+    """
+    client = HashingEmbeddings()
+    monkeypatch.setattr(gemini_embeddings, "_embeddings_client", client)
+    return client
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """
+    Write a PDF of generated pages (or the given page texts) into tmp_path.
+    """
+    def make(name, pages=4, seed=0):
+        path = os.path.join(tmp_path, name)
+        write_pdf(path, pages if isinstance(pages, list) else make_corpus(pages, seed=seed))
+        return path
+    
+    return make
@@ -0,0 +1,41 @@
+from typing import List
+
+from langchain.schema import BaseRetriever, Document
+
+from src.chains.context import build_context, count_tokens
+from src.chains.providers import EchoChatModel
+from src.chains.qa_chain import create_qa_chain_with_sources, stream_answer_with_sources
+
+class ListRetriever(BaseRetriever):
+    docs: List[Document]
+    
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.docs
+
+def make_docs():
+    # Distinct pages, so no two chunks are merged into one block
+    return [
+        Document(page_content=f"Passage {i} " + "word " * size, metadata={"source": "guide.pdf", "page": i})
+        for i, size in enumerate([40, 400, 30, 400])
+    ]
+
+def test_build_context_returns_only_docs_within_budget():
+    docs = make_docs()
+    budget = count_tokens(docs[0].page_content) + count_tokens(docs[2].page_content) + 10
+    
+    context, used = build_context(docs, token_budget=budget)
+    
+    assert used == [docs[0], docs[2]]
+    assert "Passage 1" not in context and "Passage 2" in context
+
+def test_answers_list_only_sources_in_context(monkeypatch):
+    docs = make_docs()
+    budget = count_tokens(docs[0].page_content) + count_tokens(docs[2].page_content) + 10
+    monkeypatch.setattr(build_context, "__defaults__", (budget, "\n\n"))
+    retriever = ListRetriever(docs=docs)
+    
+    events = list(stream_answer_with_sources(retriever, "dose?", llm=EchoChatModel()))
+    assert events[0] == {"type": "docs", "docs": [docs[0], docs[2]]}
+    
+    result = create_qa_chain_with_sources(retriever, llm=EchoChatModel()).invoke("dose?")
+    assert result["docs"] == [docs[0], docs[2]]
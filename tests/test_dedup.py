@@ -0,0 +1,47 @@
+import random
+
+from benchmarks.corpus import make_corpus, make_sentence
+from src.document_processing.dedup import ChunkDeduplicator
+from src.rag import indexing
+from src.rag.filters import load_filter_index
+from src.rag.vectorstore import load_manifest
+
+def make_text(seed):
+    rng = random.Random(seed)
+    return " ".join(make_sentence(rng, 20, 24) for _ in range(4))
+
+def test_near_duplicates_must_agree_on_numbers():
+    text = make_text(0) + " Aim for an HbA1c < 7% in most adults."
+    deduplicator = ChunkDeduplicator()
+    assert deduplicator.check("a:0", text, {"doc_id": "a"}) is None
+    
+    assert deduplicator.check("b:0", text.upper().replace(" ", "  "), {"doc_id": "b"}) == "a:0"
+    assert deduplicator.check("c:0", text.replace("Aim for", "Target"), {"doc_id": "c"}) == "a:0"
+    assert deduplicator.check("d:0", text.replace("< 7%", "≥ 7%"), {"doc_id": "d"}) is None
+    assert deduplicator.check("e:0", text.replace("7%", "8%"), {"doc_id": "e"}) is None
+    assert deduplicator.check("f:0", text.replace("7%", "7 mmol"), {"doc_id": "f"}) is None
+
+def test_promoted_duplicate_keeps_its_own_text():
+    text = make_text(1)
+    variant = text.replace(text.split()[3], "changed", 1)
+    deduplicator = ChunkDeduplicator()
+    deduplicator.check("a:0", text, {"doc_id": "a"})
+    assert deduplicator.check("b:0", variant, {"doc_id": "b"}) == "a:0"
+    
+    orphaned, _ = deduplicator.remove_document("a", ["a:0"])
+    chunk_id, promoted_text, metadata = deduplicator.promote("a:0", text, orphaned["a:0"])
+    
+    assert (chunk_id, promoted_text, metadata["doc_id"]) == ("b:0", variant, "b")
+
+def test_fully_duplicated_document_can_be_scoped(embeddings, make_pdf, tmp_path):
+    pages = make_corpus(6, seed=5)
+    directory = str(tmp_path / "store")
+    indexing.index_files([make_pdf("a.pdf", pages=pages), make_pdf("b.pdf", pages=pages[:3])], directory)
+    
+    manifest = load_manifest(directory)
+    doc_id = next(doc_id for doc_id, entry in manifest["documents"].items() if entry["name"] == "b.pdf")
+    assert manifest["documents"][doc_id]["chunk_ids"] == []
+    assert manifest["documents"][doc_id]["chunks"] > 0
+    
+    positions = load_filter_index(directory).select(doc_ids=[doc_id])
+    assert len(positions) == manifest["documents"][doc_id]["chunks"]
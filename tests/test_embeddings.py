@@ -0,0 +1,157 @@
+import time
+import threading
+
+import pytest
+from langchain.schema.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from src.embeddings.cache import CachedEmbeddings
+from src.embeddings.gemini_embeddings import batch_embed_texts, is_rate_limit_error
+from src.embeddings.providers import HashingEmbeddings
+from src.rag.batching import MicroBatchSearcher
+
+class ResourceExhausted(Exception):
+    """
+    Stand-in for the provider's throttling error (HTTP 429).
+    """
+
+class ThrottlingEmbeddings(Embeddings):
+    """
+    Fake provider with per-request latency that throttles its first requests.
+    
+    Each vector encodes the number at the end of its text, so the order of
+    the results can be checked.
+    """
+    
+    def __init__(self, latency=0.0, throttled_requests=0, error=None):
+        self.latency = latency
+        self.throttled_requests = throttled_requests
+        self.error = error
+        self.requests = 0
+        self.batches = []
+        self.lock = threading.Lock()
+    
+    def embed_documents(self, texts):
+        with self.lock:
+            self.requests += 1
+            request = self.requests
+        time.sleep(self.latency(texts) if callable(self.latency) else self.latency)
+        
+        if self.error is not None:
+            raise self.error
+        if request <= self.throttled_requests:
+            raise ResourceExhausted("429 Resource has been exhausted")
+        
+        with self.lock:
+            self.batches.append(list(texts))
+        return [[float(text.split()[-1]), 1.0] for text in texts]
+    
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def make_texts(count):
+    return [f"chunk {i}" for i in range(count)]
+
+def test_splits_texts_into_provider_sized_batches():
+    texts = make_texts(10)
+    embeddings = ThrottlingEmbeddings()
+    
+    batch_embed_texts(texts, embeddings, batch_size=3, max_concurrency=2)
+    
+    assert sorted(embeddings.batches) == [texts[0:3], texts[3:6], texts[6:9], texts[9:10]]
+
+def test_retries_throttled_batches():
+    texts = make_texts(8)
+    embeddings = ThrottlingEmbeddings(throttled_requests=3)
+    
+    vectors = batch_embed_texts(texts, embeddings, batch_size=4, max_concurrency=2, max_retries=3, retry_base_delay=0.001)
+    
+    assert [vector[0] for vector in vectors] == list(range(8))
+    assert embeddings.requests == 2 + 3
+
+def test_gives_up_after_max_retries():
+    embeddings = ThrottlingEmbeddings(throttled_requests=10)
+    
+    with pytest.raises(ResourceExhausted):
+        batch_embed_texts(make_texts(2), embeddings, max_retries=2, retry_base_delay=0.001)
+    assert embeddings.requests == 3
+
+def test_other_errors_are_not_retried():
+    embeddings = ThrottlingEmbeddings(error=ValueError("invalid input"))
+    
+    with pytest.raises(ValueError):
+        batch_embed_texts(make_texts(2), embeddings, max_retries=3, retry_base_delay=0.001)
+    assert embeddings.requests == 1
+
+def test_results_keep_input_order_when_batches_finish_out_of_order():
+    texts = make_texts(20)
+    # Later batches answer first
+    embeddings = ThrottlingEmbeddings(latency=lambda batch: 0.02 / (1 + float(batch[0].split()[-1])))
+    
+    vectors = batch_embed_texts(texts, embeddings, batch_size=2, max_concurrency=8)
+    
+    assert [vector[0] for vector in vectors] == list(range(20))
+    assert embeddings.batches != sorted(embeddings.batches, key=lambda batch: int(batch[0].split()[-1]))
+
+@pytest.mark.parametrize("error, expected", [
+    (ResourceExhausted("quota"), True),
+    (RuntimeError("HTTP 429 Too Many Requests"), True),
+    (RuntimeError("Rate limit exceeded"), True),
+    (RuntimeError("400 invalid argument"), False)
+])
+def test_is_rate_limit_error(error, expected):
+    assert is_rate_limit_error(error) is expected
+
+class TaskTypeEmbeddings(Embeddings):
+    """
+    Provider embedding queries differently from documents, like Gemini's task types.
+    """
+    
+    def __init__(self):
+        self.hashing = HashingEmbeddings()
+        self.calls = []
+    
+    def embed_documents(self, texts):
+        self.calls.append("documents")
+        return self.hashing.embed_documents(texts)
+    
+    def embed_query(self, text):
+        self.calls.append("query")
+        return self.hashing.embed_documents(["query: " + text])[0]
+
+def test_micro_batches_use_query_embeddings():
+    embeddings = TaskTypeEmbeddings()
+    vectorstore = FAISS.from_texts(make_texts(10), embeddings)
+    embeddings.calls.clear()
+    searcher = MicroBatchSearcher(vectorstore, max_wait_ms=1)
+    
+    try:
+        assert searcher.search("chunk 3", k=1)[0].page_content == "chunk 3"
+    finally:
+        searcher.close()
+    assert embeddings.calls == ["query"]
+
+def test_cache_keeps_query_and_document_vectors_apart(tmp_path):
+    embeddings = TaskTypeEmbeddings()
+    cache = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    
+    document = cache.embed_documents(["chunk 1"])[0]
+    assert cache.embed_queries(["chunk 1", "chunk 2"]) == [embeddings.embed_query("chunk 1"), embeddings.embed_query("chunk 2")]
+    assert cache.embed_query("chunk 2") != document
+    assert cache.hits == 1
+
+def test_cache_eviction_counts_entries_of_all_processes(tmp_path):
+    # Two connections to one file, as two worker processes would have
+    first = CachedEmbeddings(HashingEmbeddings(), cache_dir=str(tmp_path), max_entries=3)
+    second = CachedEmbeddings(HashingEmbeddings(), cache_dir=str(tmp_path), max_entries=3)
+    
+    first.embed_documents(["chunk 0"])
+    second.embed_documents(["chunk 1"])
+    first.embed_documents(["chunk 2"])
+    second.embed_documents(["chunk 0"])
+    first.embed_documents(["chunk 3"])
+    
+    assert first.stats()["entries"] == 3
+    # chunk 1 is the least recently used, since the other process read chunk 0 again
+    second.embed_documents(["chunk 0", "chunk 1", "chunk 2", "chunk 3"])
+    assert second.hits == 1 + 3
@@ -0,0 +1,36 @@
+import functools
+
+from benchmarks.corpus import make_corpus
+from src.document_processing import pipeline
+from src.rag import indexing
+from src.rag.vectorstore import load_manifest, load_vectorstore
+
+def test_failed_page_range_leaves_file_out_of_the_index(embeddings, make_pdf, tmp_path, monkeypatch):
+    text = make_corpus(40, seed=3)
+    pages = make_pdf("a.pdf", pages=text)
+    copy = make_pdf("b.pdf", pages=text[:16])
+    other = make_pdf("c.pdf", pages=5, seed=4)
+    process_page_range = pipeline._process_page_range
+    
+    def flaky(file_path, start, end):
+        if file_path == pages and start > 0:
+            raise RuntimeError("unreadable page")
+        return process_page_range(file_path, start, end)
+    
+    monkeypatch.setattr(pipeline, "_process_page_range", flaky)
+    monkeypatch.setattr(indexing, "iter_processed_chunks", functools.partial(pipeline.iter_processed_chunks, max_workers=1))
+    
+    directory = str(tmp_path / "store")
+    _, summary = indexing.index_files([pages, copy, other], directory)
+    
+    assert summary["failed"] == ["a.pdf"]
+    assert sorted(summary["added"]) == ["b.pdf", "c.pdf"]
+    assert summary["duplicates"]
+    
+    # The chunks of b.pdf that duplicated a.pdf's first pages are stored under b.pdf instead
+    manifest = load_manifest(directory)
+    vectorstore = load_vectorstore(directory)
+    stored = sorted(vectorstore.index_to_docstore_id.values())
+    indexed = sorted(chunk_id for entry in manifest["documents"].values() for chunk_id in entry["chunk_ids"])
+    assert stored == indexed
+    assert {vectorstore.docstore.search(chunk_id).metadata["doc_id"] for chunk_id in stored} == set(manifest["documents"])
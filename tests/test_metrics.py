@@ -0,0 +1,19 @@
+from src.embeddings import gemini_embeddings
+from src.utils import metrics
+
+def query_requests():
+    return metrics.REGISTRY.counters.get("embedding_requests_total", {}).get((("kind", "query"),), 0)
+
+def test_metrics_follow_the_runtime_switch(monkeypatch):
+    monkeypatch.setattr(gemini_embeddings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(metrics.REGISTRY, "enabled", False)
+    embeddings = gemini_embeddings.initialize_embeddings("hashing")
+    assert metrics.get_callbacks() == []
+    
+    # Enabled after the client was created
+    metrics.set_enabled(True)
+    before = query_requests()
+    embeddings.embed_query("insulin")
+    
+    assert metrics.get_callbacks() == [metrics._CALLBACK_HANDLER]
+    assert query_requests() == before + 1
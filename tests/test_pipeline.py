@@ -0,0 +1,12 @@
+from src.document_processing.pipeline import iter_processed_chunks
+
+def test_sections_carry_across_page_ranges(make_pdf):
+    path = make_pdf("a.pdf", pages=[
+        "2.1 Insulin Therapy\nBasal insulin is taken once a day.",
+        "The dose is adjusted to fasting glucose.",
+        "2.2 Metformin\nMetformin lowers hepatic glucose output."
+    ])
+    
+    for max_workers in (1, 2):
+        chunks = [chunk for _, range_chunks in iter_processed_chunks([path], max_workers=max_workers, pages_per_task=1) for chunk in range_chunks]
+        assert [chunk.metadata["section"] for chunk in chunks] == ["2.1 Insulin Therapy", "2.1 Insulin Therapy", "2.2 Metformin"]
@@ -0,0 +1,69 @@
+import os
+import threading
+
+import pytest
+
+from src.chains.providers import EchoChatModel
+from src.rag import indexing
+from src.utils import resources
+
+@pytest.fixture
+def shared(monkeypatch):
+    # Fresh process-wide resources, restored after the test
+    for name in ("_vectorstore", "_vectorstore_version", "_retriever", "_filter_index", "_answer_cache"):
+        monkeypatch.setattr(resources, name, None)
+    monkeypatch.setattr(resources, "_qa_chains", {})
+    monkeypatch.setattr(resources, "_llm", EchoChatModel())
+    return resources
+
+def ask(shared, directory, **kwargs):
+    events = list(shared.stream_answer("How is insulin dosed?", directory=directory, **kwargs))
+    return events[0]["docs"], "".join(event["text"] for event in events[1:])
+
+def test_follow_up_answers_are_cached_per_history(shared, embeddings, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(resources, "ANSWER_CACHE_WITH_HISTORY", True)
+    directory = str(tmp_path / "store")
+    indexing.index_files([make_pdf("a.pdf"), make_pdf("b.pdf", seed=1)], directory)
+    cache = shared.get_answer_cache()
+    
+    # The same question in another conversation must not get this conversation's answer
+    first = ask(shared, directory, chat_history="Human: tell me about metformin")
+    ask(shared, directory, chat_history="Human: tell me about insulin")
+    assert cache.hits == 0
+    
+    assert ask(shared, directory, chat_history="Human: tell me about metformin") == first
+    assert cache.hits == 1
+
+def test_scoped_questions_use_their_own_cache_entries(shared, embeddings, make_pdf, tmp_path):
+    directory = str(tmp_path / "store")
+    indexing.index_files([make_pdf("a.pdf"), make_pdf("b.pdf", seed=1)], directory)
+    doc_id = next(iter(indexing.load_manifest(directory)["documents"]))
+    cache = shared.get_answer_cache()
+    
+    ask(shared, directory)
+    scoped = ask(shared, directory, doc_ids=[doc_id])
+    assert cache.hits == 0
+    assert ask(shared, directory, doc_ids=[doc_id]) == scoped
+    assert cache.hits == 1
+
+def test_follow_up_questions_bypass_cache_by_default(shared, embeddings, make_pdf, tmp_path):
+    directory = str(tmp_path / "store")
+    indexing.index_files([make_pdf("a.pdf")], directory)
+    
+    ask(shared, directory, chat_history="Human: hello")
+    ask(shared, directory, chat_history="Human: hello")
+    assert shared.get_answer_cache().hits == 0
+
+def test_reader_keeps_store_while_save_swaps_directories(shared, embeddings, make_pdf, tmp_path):
+    directory = str(tmp_path / "store")
+    indexing.index_files([make_pdf("a.pdf")], directory)
+    vectorstore = shared.get_vectorstore(directory)
+    
+    # The old directory has been renamed away and the new one is not in place yet
+    os.rename(directory, directory + ".old")
+    swap = threading.Timer(0.1, os.rename, (directory + ".old", directory))
+    swap.start()
+    try:
+        assert shared.get_vectorstore(directory) is vectorstore
+    finally:
+        swap.join()
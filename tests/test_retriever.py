@@ -0,0 +1,40 @@
+import random
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+from benchmarks.corpus import make_sentence
+from src.rag.faiss_index import get_all_vectors, min_training_size
+from src.rag.filters import FilteredRetriever, filtered_search
+from src.rag.retriever import VectorMMRRetriever, maximal_marginal_relevance, normalize_rows
+from src.rag.vectorstore import create_vectorstore, apply_index_type
+
+def test_mmr_reconstructs_only_candidates_from_ivf_index(embeddings):
+    rng = random.Random(0)
+    documents = [Document(page_content=make_sentence(rng), metadata={"chunk": i}) for i in range(min_training_size("ivf_flat") + 50)]
+    vectorstore = apply_index_type(create_vectorstore(documents), "ivf_flat")
+    retriever = VectorMMRRetriever(vectorstore=vectorstore, k=4, fetch_k=20, lambda_mult=0.5)
+    
+    query = "insulin dose adjustment"
+    query_vector = normalize_rows(embeddings.embed_query(query))
+    _, indices = vectorstore.index.search(query_vector, 20)
+    candidates = normalize_rows(get_all_vectors(vectorstore.index))[indices[0]]
+    expected = indices[0][maximal_marginal_relevance(query_vector[0], candidates, 4, 0.5)]
+    
+    assert [doc.metadata["chunk"] for doc in retriever.invoke(query)] == [documents[i].metadata["chunk"] for i in expected]
+
+def test_filtered_retriever_builds_direct_map_before_queries(embeddings):
+    rng = random.Random(0)
+    documents = [Document(page_content=make_sentence(rng), metadata={"chunk": i}) for i in range(min_training_size("ivf_flat") + 50)]
+    vectorstore = apply_index_type(create_vectorstore(documents), "ivf_flat")
+    ivf = faiss.extract_index_ivf(vectorstore.index)
+    positions = np.arange(10, 30, dtype=np.int64)
+    
+    # Searching never builds the map; without one the scan falls back to a selector search
+    assert set(filtered_search(vectorstore, embeddings.embed_query("insulin"), positions, k=4)) <= set(positions)
+    assert ivf.direct_map.no()
+    
+    retriever = FilteredRetriever(vectorstore=vectorstore, positions=positions, k=4)
+    assert not ivf.direct_map.no()
+    assert {doc.metadata["chunk"] for doc in retriever.invoke("insulin")} <= set(range(10, 30))
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+from langchain.schema import Document
+
+from benchmarks.corpus import make_sentence
+from src.rag import indexing
+from src.rag.faiss_index import get_index_type, min_training_size
+from src.rag.vectorstore import (
+    create_vectorstore,
+    add_documents_to_vectorstore,
+    apply_index_type,
+    delete_documents_from_vectorstore,
+    save_vectorstore,
+    load_manifest,
+    supports_deletion
+)
+
+def make_documents(count, start=0):
+    rng = random.Random(start)
+    return [Document(page_content=f"{make_sentence(rng)} chunk {i}", metadata={"chunk": i}) for i in range(start, start + count)]
+
+def nearest_ids(vectorstore, embeddings, documents):
+    vectors = embeddings.embed_documents([doc.page_content for doc in documents])
+    return [vectorstore.similarity_search_by_vector(vector, k=1)[0].metadata["chunk"] for vector in vectors]
+
+def test_delete_from_ivf_index_keeps_search_aligned(embeddings):
+    index_type = "ivf_flat"
+    documents = make_documents(min_training_size(index_type) + 100)
+    vectorstore = create_vectorstore(documents, ids=[str(doc.metadata["chunk"]) for doc in documents])
+    apply_index_type(vectorstore, index_type)
+    assert get_index_type(vectorstore.index) == index_type
+    
+    removed = [str(i) for i in range(0, len(documents), 3)]
+    delete_documents_from_vectorstore(vectorstore, removed)
+    added = make_documents(50, start=len(documents))
+    add_documents_to_vectorstore(vectorstore, added, ids=[str(doc.metadata["chunk"]) for doc in added])
+    
+    assert vectorstore.index.ntotal == len(vectorstore.index_to_docstore_id) == len(documents) - len(removed) + len(added)
+    
+    # Every remaining chunk is still found by its own vector, and removed chunks never come back
+    kept = [doc for doc in documents if str(doc.metadata["chunk"]) not in set(removed)] + added
+    found = nearest_ids(vectorstore, embeddings, kept)
+    matches = sum(chunk == doc.metadata["chunk"] for chunk, doc in zip(found, kept))
+    assert matches / len(kept) > 0.99
+    assert not set(map(str, nearest_ids(vectorstore, embeddings, documents[::3]))) & set(removed)
+
+def test_hnsw_store_refuses_delete(embeddings, make_pdf, tmp_path):
+    directory = str(tmp_path / "store")
+    vectorstore, _ = indexing.index_files([make_pdf("a.pdf")], directory)
+    manifest = load_manifest(directory)
+    assert supports_deletion(manifest)
+    
+    save_vectorstore(apply_index_type(vectorstore, "hnsw"), directory, manifest)
+    assert not supports_deletion(load_manifest(directory))
+    
+    with pytest.raises(ValueError, match="HNSW"):
+        indexing.delete_document(next(iter(manifest["documents"])), directory)